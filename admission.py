@@ -0,0 +1,304 @@
+"""
+Token-Budget Admission Control
+Admits drafts against the provider's tokens-per-minute and requests-per-minute limits
+using each draft's estimated token cost, queueing the rest by priority class and, within
+a class, fairly between clients, so bursts wait their turn instead of ending in 429s.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+
+from concurrency import QueueFullError
+
+# Scheduling order: interactive requests first, then batch items, then background jobs
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}
+# Rough characters per token of English legal text, for prompt estimates
+CHARS_PER_TOKEN = 4
+# Weight of the newest draft in a template's typical output length
+OUTPUT_SMOOTHING = 0.2
+
+_client: ContextVar[Tuple[str, str]] = ContextVar("admission_client", default=("anonymous", "interactive"))
+
+
+class AdmissionRejected(QueueFullError):
+    """The token budget is committed for longer than a request may wait."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Provider token budget exhausted; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+@contextmanager
+def client_scope(client_id: str, priority: str = "interactive"):
+    """Attribute the drafts admitted inside the block to `client_id` at `priority`."""
+    token = _client.set((client_id or "anonymous", priority))
+    try:
+        yield
+    finally:
+        _client.reset(token)
+
+
+class TokenEstimator:
+    """Expected tokens of a draft: prompt characters / 4 per call, plus the template's typical output."""
+
+    def __init__(self, default_output_tokens: Dict[str, int]):
+        self._output = {template: float(tokens) for template, tokens in default_output_tokens.items()}
+
+    def estimate(self, template_type: str, prompt_chars: int, calls: int = 1) -> int:
+        prompt = prompt_chars / CHARS_PER_TOKEN * max(1, calls)
+        return int(prompt + self._output.get(template_type, 4000))
+
+    def observe(self, template_type: str, output_tokens: int):
+        previous = self._output.get(template_type)
+        self._output[template_type] = output_tokens if previous is None else (
+            previous + OUTPUT_SMOOTHING * (output_tokens - previous)
+        )
+
+    def typical_output(self) -> Dict[str, int]:
+        return {template: round(tokens) for template, tokens in self._output.items()}
+
+
+class _Bucket:
+    """Continuously refilled allowance of `per_minute` units; 0 = unlimited."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = max(0, per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def fits(self, amount: float) -> bool:
+        # A cost above the whole capacity is admitted once the bucket is full (and leaves it in debt)
+        return not self.capacity or self.available >= min(amount, self.capacity)
+
+    def seconds_until(self, amount: float) -> float:
+        if not self.capacity:
+            return 0.0
+        return max(0.0, (min(amount, self.capacity) - self.available) / self.rate)
+
+    def try_take(self, amount: float) -> bool:
+        """Take `amount` if it fits (after a refill); False leaves the bucket untouched."""
+        self.refill()
+        if not self.fits(amount):
+            return False
+        self.available -= amount
+        return True
+
+    def adjust(self, amount: float):
+        """Add (or, if negative, charge) `amount`, never above capacity."""
+        self.refill()
+        self.available = min(self.capacity, self.available + amount)
+
+    def drain(self):
+        self.refill()
+        self.available = min(self.available, 0.0)
+
+
+class Ticket:
+    """
+    An admitted draft. `settle` with its actual tokens corrects the budget for the estimate;
+    a draft that ends without usage (failed, cancelled, refused a slot) calls `release`.
+    """
+
+    def __init__(self, scheduler: "TokenScheduler", template_type: str, cost: int, calls: int = 1):
+        self._scheduler = scheduler
+        self.template_type = template_type
+        self.cost = cost
+        self.calls = calls
+        self.settled = False
+        self._rate_limited = scheduler.rate_limited
+
+    def settle(self, usage: Optional[dict], typical: bool = True):
+        """`typical=False` for partial work (e.g. a redraft) that should not move the output estimate."""
+        if self.settled:
+            return
+        self.settled = True
+        if not usage:
+            return  # usage unknown: the estimate stands
+        self._scheduler.settle(self, usage.get("input_tokens", 0), usage.get("output_tokens", 0), typical)
+
+    def charge(self, usage: Optional[dict]):
+        """Charge an LLM call made on the draft's behalf beyond its estimate (e.g. a clause block)."""
+        if usage:
+            self._scheduler.charge(usage.get("input_tokens", 0) + usage.get("output_tokens", 0), 1)
+
+    def release(self):
+        """Give the reservation back unless settled. No-op after a 429, which emptied the budget on purpose."""
+        if self.settled:
+            return
+        self.settled = True
+        if self._scheduler.rate_limited == self._rate_limited:
+            self._scheduler.release(self)
+
+
+class _Waiter:
+    def __init__(self, cost: int, calls: int, future: asyncio.Future):
+        self.cost = cost
+        self.calls = calls
+        self.future = future
+
+
+class TokenScheduler:
+    """
+    Weighted fair queue in front of the provider's rate limits.
+
+    Each draft is charged its estimated tokens (and LLM calls) up front; a draft that
+    does not fit waits. Waiters are served strictly by priority class and, within a
+    class, by start-time fair queuing on tokens, so a client sending a burst cannot
+    starve others. A request whose estimated wait exceeds `max_wait` seconds is rejected
+    at once with the time after which it would fit.
+
+    `buckets(name, per_minute)` creates the two allowances; the default keeps them in this
+    process, shared_state.SharedState.bucket puts them where every worker draws on them.
+    """
+
+    def __init__(self, estimator: TokenEstimator, tokens_per_minute: int = 0,
+                 requests_per_minute: int = 0, max_wait: float = 60.0,
+                 buckets: Optional[Callable[[str, int], _Bucket]] = None):
+        self.estimator = estimator
+        make_bucket = buckets or (lambda name, per_minute: _Bucket(per_minute))
+        self.tokens = make_bucket("tokens", tokens_per_minute)
+        self.requests = make_bucket("requests", requests_per_minute)
+        self.max_wait = max_wait
+        self._queue = []  # (priority, tag, seq, waiter)
+        self._sequence = itertools.count()
+        self._client_tags: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.admitted = 0
+        self.rejected = 0
+        self.rate_limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.tokens.capacity or self.requests.capacity)
+
+    async def admit(self, template_type: str, prompt_chars: int, calls: int = 1) -> Ticket:
+        """Wait until the draft's estimated tokens and calls fit the budget; raises AdmissionRejected."""
+        cost = self.estimator.estimate(template_type, prompt_chars, calls)
+        if not self.enabled:
+            self.admitted += 1
+            return Ticket(self, template_type, cost, calls)
+
+        client, priority_name = _client.get()
+        priority = PRIORITIES.get(priority_name, PRIORITIES["interactive"])
+        tag = max(self._virtual_time, self._client_tags.get(client, 0.0)) + cost
+        self._refill()
+        wait = self._estimated_wait((priority, tag), cost, calls)
+        if wait > self.max_wait:
+            self.rejected += 1
+            raise AdmissionRejected(wait)
+
+        previous_tag = self._client_tags.get(client)
+        self._client_tags[client] = tag
+        waiter = _Waiter(cost, calls, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (priority, tag, next(self._sequence), waiter))
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._refund(cost, calls)  # admitted in the same instant the caller gave up
+            elif self._client_tags.get(client) == tag:
+                # Never served: the client's fair share is not charged for it
+                if previous_tag is None:
+                    self._client_tags.pop(client, None)
+                else:
+                    self._client_tags[client] = previous_tag
+            raise
+        self.admitted += 1
+        return Ticket(self, template_type, cost, calls)
+
+    def settle(self, ticket: Ticket, input_tokens: int, output_tokens: int, typical: bool = True):
+        """Charge (or refund) the difference between a draft's estimate and its actual tokens."""
+        if typical:
+            self.estimator.observe(ticket.template_type, output_tokens)
+        if self.tokens.capacity:
+            self.tokens.adjust(ticket.cost - input_tokens - output_tokens)
+            self._dispatch()
+
+    def charge(self, tokens: int, calls: int):
+        """Take unreserved usage from the budget (it may go into debt; queued drafts wait it out)."""
+        if self.enabled:
+            self.tokens.adjust(-tokens)
+            self.requests.adjust(-calls)
+
+    def release(self, ticket: Ticket):
+        """Refund the whole estimate of a draft that ended without usage."""
+        if self.enabled:
+            self._refund(ticket.cost, ticket.calls)
+
+    def penalize(self):
+        """The provider answered 429 anyway: empty the budget so queued drafts back off."""
+        self.rate_limited += 1
+        self.tokens.drain()
+        self.requests.drain()
+
+    def _refill(self):
+        self.tokens.refill()
+        self.requests.refill()
+
+    def _refund(self, cost: int, calls: int):
+        self.tokens.adjust(cost)
+        self.requests.adjust(calls)
+        self._dispatch()
+
+    def _estimated_wait(self, position: Tuple[int, float], cost: int, calls: int) -> float:
+        """Seconds until a new request at (priority, tag) would fit behind those queued ahead of it."""
+        ahead = [entry[3] for entry in self._queue if entry[:2] <= position and not entry[3].future.done()]
+        tokens = sum(w.cost for w in ahead) + cost
+        requests = sum(w.calls for w in ahead) + calls
+        return max(self.tokens.seconds_until(tokens), self.requests.seconds_until(requests))
+
+    def _dispatch(self):
+        """Admit queued drafts in order while they fit; otherwise wake up when the head will."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._refill()
+        while self._queue:
+            _, tag, _, waiter = self._queue[0]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            # Take tokens then the call; give the tokens back if the call does not fit
+            if not self.tokens.try_take(waiter.cost):
+                self._wake_in(self.tokens.seconds_until(waiter.cost))
+                return
+            if not self.requests.try_take(waiter.calls):
+                self.tokens.adjust(waiter.cost)
+                self._wake_in(self.requests.seconds_until(waiter.calls))
+                return
+            heapq.heappop(self._queue)
+            self._virtual_time = tag
+            waiter.future.set_result(None)
+        if len(self._client_tags) > 1000:
+            self._client_tags = {c: t for c, t in self._client_tags.items() if t > self._virtual_time}
+
+    def _wake_in(self, delay: float):
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0.01), self._dispatch)
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "enabled": self.enabled,
+            "tokens_per_minute": self.tokens.capacity,
+            "requests_per_minute": self.requests.capacity,
+            "tokens_available": math.floor(self.tokens.available) if self.tokens.capacity else None,
+            "waiting": sum(1 for entry in self._queue if not entry[3].future.done()),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "rate_limited": self.rate_limited,
+            "typical_output_tokens": self.estimator.typical_output(),
+        }
@@ -4,62 +4,81 @@ HOCEBRANCH Modular Legal Engine
 """
 
 import os
-import re
+import json
+import logging
+import asyncio
+import time
+import math
+from contextlib import asynccontextmanager, suppress
 from datetime import datetime
 from typing import Optional, Union, List
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
-from pydantic import BaseModel, Field, field_validator
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError, field_serializer, field_validator, model_validator
 from dotenv import load_dotenv
 
 # Import the Prompt Library
-from prompts import PROMPT_MAP, CORE_LEGAL_BRAIN
-
-
-def clean_markdown_output(text: str) -> str:
-    """
-    Clean and format the markdown output from the AI.
-    Removes code block wrappers, normalizes whitespace, and ensures clean formatting.
-    """
-    if not text:
-        return text
-    
-    # Remove markdown code block wrappers if AI wrapped the entire document
-    # Handles cases like: ```markdown\n...\n``` or ```\n...\n```
-    text = text.strip()
-    
-    # Remove leading/trailing code block markers
-    if text.startswith("```"):
-        # Find the first newline after ```
-        first_newline = text.find("\n")
-        if first_newline != -1:
-            # Check if it says "markdown" or just ```
-            marker = text[:first_newline].lower()
-            if "markdown" in marker or marker == "```":
-                text = text[first_newline + 1:]
-    
-    if text.endswith("```"):
-        text = text[:-3]
-    
-    # Remove any remaining leading/trailing whitespace
-    text = text.strip()
-    
-    # Normalize multiple consecutive newlines to maximum of 2
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    # Ensure consistent line endings
-    text = text.replace('\r\n', '\n').replace('\r', '\n')
-    
-    return text
+from prompt_assembly import COMPILED_PROMPTS, GENERATE_CUE, INPUT_LABELS, fill_references
+from concurrency import GenerationLimiter, QueueFullError
+from markdown_cleaner import clean_markdown_output, StreamingMarkdownCleaner
+from draft_cache import DraftCache, make_cache_key
+from singleflight import SingleFlight
+from jobs import JobStore, RetryJob, run_workers
+from sections import TEMPLATE_STRUCTURES, generate_sectioned, redraft_sections, sum_usage
+from structure_check import check_structure, repair_structure
+from continuation import complete_with_continuation, stream_with_continuation
+from backends import HumanMessage, SystemMessage, create_backend
+from endpoint_pool import Endpoint, EndpointPool, failure_reason, parse_endpoints
+from admission import Ticket, TokenEstimator, TokenScheduler, client_scope
+from cancellation import ClientDisconnected, DeadlineExceeded, resolve_timeout, run_cancellable
+from clauses import ClauseLibrary, context_category, has_library_sections, is_library_heading, merge_clauses, omit_instruction, prefilled_sections
+from drafts import DraftStore, join_sections, split_sections
+from jurisdictions import address_text, load_gazetteer, resolve_signer
+from http_responses import RepresentationCache, dumps, immutable_response, json_response
+from shared_state import SharedState
+from metrics import (
+    IN_FLIGHT, REGISTRY, annotate, monitor_event_loop, observe_call_output, observe_stage, record_cancelled_call,
+    record_cancelled_request, record_structure, record_tokens, request_timing, timed_stage
+)
 
 # Load environment variables from .env file
 load_dotenv()
 
-app = FastAPI(title="HOCEBRANCH Modular Legal Engine", version="2.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the embedded job workers, event-loop monitor and shared-state heartbeat; hand jobs back on shutdown."""
+    stop = asyncio.Event()
+    loop_monitor = None
+    if EVENT_LOOP_MONITOR_INTERVAL_SECONDS > 0:
+        loop_monitor = asyncio.create_task(monitor_event_loop(stop, EVENT_LOOP_MONITOR_INTERVAL_SECONDS))
+    heartbeat = None
+    if shared_state is not None:
+        heartbeat = asyncio.create_task(publish_worker_state(stop))
+    workers = None
+    if JOB_WORKERS > 0:
+        workers = asyncio.create_task(run_workers(
+            job_store, process_job, JOB_WORKERS, stop,
+            name=f"web-{os.getpid()}", poll_interval=JOB_POLL_INTERVAL_SECONDS
+        ))
+    if LLM_WARMUP:
+        await warm_up_llm()
+    yield
+    stop.set()
+    await llm_pool.aclose()
+    if loop_monitor is not None:
+        loop_monitor.cancel()
+    if workers is not None:
+        workers.cancel()
+        with suppress(asyncio.CancelledError):
+            await workers
+    if heartbeat is not None:
+        await heartbeat
+
+
+app = FastAPI(title="HOCEBRANCH Modular Legal Engine", version="2.0.0", lifespan=lifespan)
 
 # Configure CORS
 # Allow requests from frontend applications
@@ -83,13 +102,181 @@ app.add_middleware(
 # Get configuration from environment variables
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
 OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.2"))
+# Optional: any OpenAI-compatible endpoint (proxy, gateway, or the benchmark stub server)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Optional: extra endpoints or models (comma-separated `model@base_url`, same OPENAI_API_KEY)
+# used for failover on 429/5xx/connection errors and for hedged requests
+LLM_FALLBACK_ENDPOINTS = parse_endpoints(os.getenv("LLM_FALLBACK_ENDPOINTS", ""), OPENAI_MODEL, OPENAI_BASE_URL)
+# Seconds without a first token before a duplicate (hedged) request is sent; 0 disables hedging
+HEDGE_AFTER_SECONDS = float(os.getenv("HEDGE_AFTER_SECONDS", "0"))
+# Seconds a failing endpoint is skipped (doubles with consecutive failures)
+ENDPOINT_COOLDOWN_SECONDS = float(os.getenv("ENDPOINT_COOLDOWN_SECONDS", "5"))
+
+# Provider rate limits drafts are admitted against, by estimated prompt + completion tokens and
+# LLM calls (0 = unlimited). Drafts that do not fit wait, interactive before batch before jobs.
+PROVIDER_TOKENS_PER_MINUTE = int(os.getenv("PROVIDER_TOKENS_PER_MINUTE", "0"))
+PROVIDER_REQUESTS_PER_MINUTE = int(os.getenv("PROVIDER_REQUESTS_PER_MINUTE", "0"))
+# Longest a draft may wait for budget; a longer expected wait is rejected up front with 503
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "60"))
+# Starting estimate of a draft's output tokens per template, refined from observed usage
+TYPICAL_OUTPUT_TOKENS = {
+    "nda": 3500, "employment": 4500, "service": 4500, "terms": 4500, "board": 2000, "shareholder": 3000
+}
+
+# Multi-process mode (see gunicorn.conf.py): SQLite file shared by the worker processes on this
+# host, holding the provider budget above, each worker's in-flight counts and its metrics, so
+# /metrics and /health report every worker. Empty = single process, state kept in memory.
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "")
+# Seconds between a worker's heartbeats; a worker silent for 5 heartbeats (15s at least) is gone
+SHARED_STATE_INTERVAL_SECONDS = float(os.getenv("SHARED_STATE_INTERVAL_SECONDS", "1.0"))
+
+shared_state = SharedState(
+    SHARED_STATE_PATH, stale_after=max(15.0, 5 * SHARED_STATE_INTERVAL_SECONDS)
+) if SHARED_STATE_PATH else None
+
+token_scheduler = TokenScheduler(
+    TokenEstimator(TYPICAL_OUTPUT_TOKENS), PROVIDER_TOKENS_PER_MINUTE, PROVIDER_REQUESTS_PER_MINUTE, ADMISSION_MAX_WAIT_SECONDS,
+    buckets=shared_state.bucket if shared_state is not None else None
+)
+
+# Generation backend: 'http' (thin OpenAI-compatible client on pooled keep-alive connections)
+# or 'langchain' (ChatOpenAI, imported only when selected)
+GENERATION_BACKEND = os.getenv("GENERATION_BACKEND", "http")
+# Pooled connections per endpoint, and the longest wait for the next streamed chunk (seconds)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+# Connect to the LLM endpoints during startup so the first request after a cold start skips the handshake
+LLM_WARMUP = os.getenv("LLM_WARMUP", "false").lower() == "true"
+
+
+def llm_backend(model: str, base_url: Optional[str], max_retries: int):
+    # Security: Use a low temperature for consistent, non-creative legal text
+    return create_backend(
+        GENERATION_BACKEND, model=model, api_key=os.getenv("OPENAI_API_KEY"), base_url=base_url,
+        temperature=OPENAI_TEMPERATURE, max_retries=max_retries, max_connections=LLM_MAX_CONNECTIONS,
+        timeout=LLM_TIMEOUT_SECONDS
+    )
+
+
+# With fallbacks, a 429/5xx moves on to the next endpoint instead of being retried in place
+llm = llm_backend(OPENAI_MODEL, OPENAI_BASE_URL, max_retries=0 if LLM_FALLBACK_ENDPOINTS else 2)
+llm_pool = EndpointPool(
+    [Endpoint("primary", llm)] + [
+        Endpoint(f"{model}@{base_url or 'default'}", llm_backend(model, base_url, max_retries=0))
+        for model, base_url in LLM_FALLBACK_ENDPOINTS
+    ],
+    hedge_after=HEDGE_AFTER_SECONDS,
+    cooldown=ENDPOINT_COOLDOWN_SECONDS,
+    # A 429 means the estimates ran ahead of the real limit: queued drafts back off
+    on_rate_limited=token_scheduler.penalize
+)
+
+# Concurrency: how many drafts may generate at once in this process, and how many may wait
+# (per worker process in multi-process mode)
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("MAX_CONCURRENT_GENERATIONS", "8"))
+MAX_QUEUED_GENERATIONS = int(os.getenv("MAX_QUEUED_GENERATIONS", "32"))
+QUEUE_RETRY_AFTER_SECONDS = int(os.getenv("QUEUE_RETRY_AFTER_SECONDS", "15"))
+
+generation_limiter = GenerationLimiter(MAX_CONCURRENT_GENERATIONS, MAX_QUEUED_GENERATIONS)
+
+# Draft cache: identical inputs (same model, temperature and day) reuse the previous draft
+DRAFT_CACHE_SIZE = int(os.getenv("DRAFT_CACHE_SIZE", "256"))
+DRAFT_CACHE_TTL_SECONDS = float(os.getenv("DRAFT_CACHE_TTL_SECONDS", "86400"))
+DRAFT_CACHE_SQLITE_PATH = os.getenv("DRAFT_CACHE_SQLITE_PATH", "")
+
+draft_cache = DraftCache(DRAFT_CACHE_SIZE, DRAFT_CACHE_TTL_SECONDS, DRAFT_CACHE_SQLITE_PATH)
+
+# Coalescing: concurrent requests with an identical resolved prompt share one LLM call
+generation_flights = SingleFlight()
+
+# Batch generation: items generated at once per batch, and the largest accepted batch
+BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", "3"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "24"))
+
+# Job queue: persistent submit/poll generation. Set JOB_WORKERS=0 when drafts are
+# processed by separate `python worker.py` processes sharing JOB_STORE_PATH.
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.0"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+# Retries of a job the provider keeps rate limiting (backing off 5s, 10s, 20s...) before it fails
+JOB_MAX_RATE_LIMIT_RETRIES = int(os.getenv("JOB_MAX_RATE_LIMIT_RETRIES", "6"))
+
+job_store = JobStore(JOB_STORE_PATH, lease_seconds=JOB_LEASE_SECONDS, max_retries=JOB_MAX_RATE_LIMIT_RETRIES)
+
+# Section-parallel mode (?mode=sections): section calls run at once per draft
+SECTION_PARALLELISM = int(os.getenv("SECTION_PARALLELISM", "4"))
+
+# Clause library: boilerplate and governing-law sections drafted once per template, jurisdiction
+# and business category, stored in CLAUSE_LIBRARY_PATH and merged into every later draft
+CLAUSE_LIBRARY_ENABLED = os.getenv("CLAUSE_LIBRARY_ENABLED", "true").lower() in ("1", "true", "yes")
+CLAUSE_LIBRARY_PATH = os.getenv("CLAUSE_LIBRARY_PATH", "clause_library.db")
+# Stored clause blocks are redrafted after this long (0 = kept until the model or endpoints change)
+CLAUSE_LIBRARY_TTL_SECONDS = float(os.getenv("CLAUSE_LIBRARY_TTL_SECONDS", "2592000"))
+
+clause_library = ClauseLibrary(
+    CLAUSE_LIBRARY_PATH,
+    # Blocks drafted by another model or endpoint set (e.g. a stub server) are not reused
+    version=make_cache_key({
+        "model": OPENAI_MODEL, "temperature": OPENAI_TEMPERATURE,
+        "base_url": OPENAI_BASE_URL, "fallbacks": LLM_FALLBACK_ENDPOINTS
+    }),
+    ttl_seconds=CLAUSE_LIBRARY_TTL_SECONDS
+)
+
+# Structure check: drafts are checked against the template's REQUIRED STRUCTURE and missing or
+# truncated sections are drafted on their own (up to this many per draft; 0 only reports them)
+STRUCTURE_REPAIR_MAX_SECTIONS = int(os.getenv("STRUCTURE_REPAIR_MAX_SECTIONS", "4"))
+
+# Output-token budget per draft (first call plus continuations), per template. A completion cut
+# off by the limit (finish_reason=length) is resumed up to MAX_CONTINUATIONS times within it.
+# Override as OUTPUT_TOKEN_BUDGETS="employment=14000,shareholder=9000" (0 = unlimited).
+OUTPUT_TOKEN_BUDGETS = {"nda": 10000, "employment": 12000, "service": 12000, "terms": 12000, "board": 6000, "shareholder": 8000}
+for _assignment in filter(None, os.getenv("OUTPUT_TOKEN_BUDGETS", "").split(",")):
+    _template, _, _budget = _assignment.partition("=")
+    OUTPUT_TOKEN_BUDGETS[_template.strip().lower()] = int(_budget)
+MAX_OUTPUT_TOKENS_PER_CALL = int(os.getenv("MAX_OUTPUT_TOKENS_PER_CALL", "16384"))
+MAX_CONTINUATIONS = int(os.getenv("MAX_CONTINUATIONS", "2"))
+
+# Draft store: every generated draft with its section index, for incremental redrafts
+DRAFT_STORE_PATH = os.getenv("DRAFT_STORE_PATH", "drafts.db")
+# Stored drafts are deleted (and can no longer be fetched or redrafted) after this long; 0 = keep forever
+DRAFT_STORE_TTL_SECONDS = float(os.getenv("DRAFT_STORE_TTL_SECONDS", "2592000"))
+
+draft_store = DraftStore(DRAFT_STORE_PATH, DRAFT_STORE_TTL_SECONDS)
+
+# Encoded (gzip/brotli) bodies of served drafts kept in memory; drafts never change under their id
+DRAFT_RESPONSE_CACHE_ENTRIES = int(os.getenv("DRAFT_RESPONSE_CACHE_ENTRIES", "256"))
+
+draft_responses = RepresentationCache(DRAFT_RESPONSE_CACHE_ENTRIES)
+
+# Request deadline applied when the client sends none (X-Request-Timeout header or
+# `timeout_seconds` field); generation is cancelled once it passes. 0 = no default deadline.
+DEFAULT_REQUEST_TIMEOUT_SECONDS = float(os.getenv("DEFAULT_REQUEST_TIMEOUT_SECONDS", "0"))
+
+# Event-loop lag sampling interval for /metrics (0 disables the monitor)
+EVENT_LOOP_MONITOR_INTERVAL_SECONDS = float(os.getenv("EVENT_LOOP_MONITOR_INTERVAL_SECONDS", "0.05"))
+
+# JSON file extending the built-in jurisdiction gazetteer (same shape as jurisdictions.GAZETTEER)
+JURISDICTION_GAZETTEER_PATH = os.getenv("JURISDICTION_GAZETTEER_PATH")
+
+gazetteer = load_gazetteer(JURISDICTION_GAZETTEER_PATH)
+
+SUPPORTED_TEMPLATES = ["nda", "employment", "service", "terms", "board", "shareholder"]
+TEMPLATE_TYPE_PATTERN = "^(nda|employment|service|terms|board|shareholder)$"
+GENERATION_MODE_PATTERN = "^(single|sections)$"
+
+# Jurisdictions reported as their own metric label; anything else is grouped as "other"
+METRIC_JURISDICTIONS = {"India", "USA", "UK", "Netherlands", "International Jurisdiction"}
+
+
+def metric_jurisdiction(country: str) -> str:
+    return country if country in METRIC_JURISDICTIONS else "other"
 
-# Security: Use a low temperature for consistent, non-creative legal text
-llm = ChatOpenAI(model=OPENAI_MODEL, temperature=OPENAI_TEMPERATURE)
 
 # --- 1. DATA MODELS (Strict Input Validation) ---
-class LegalRequest(BaseModel):
-    template_type: str = Field(..., pattern="^(nda|employment|service|terms|board|shareholder)$", description="Type of legal document to generate")
+class CompanyProfile(BaseModel):
     company_name: str = Field(..., description="Full legal name of the company")
     registration_number: str = Field(..., description="Company registration number")
     registered_address: Union[str, dict] = Field(..., description="Company registered address (string or object)")
@@ -97,14 +284,19 @@ class LegalRequest(BaseModel):
     country: Optional[str] = Field(None, description="Jurisdiction/Country (e.g., 'India', 'USA', 'UK')")
     corporate_context: Optional[str] = Field(None, description="Business context (e.g., 'SaaS Platform', 'Frozen Food Mfg', 'Construction Service'). Additional details can be included here.")
 
+    # The object form of registered_address, kept for jurisdiction resolution
+    _address_fields: Optional[dict] = PrivateAttr(default=None)
+
     # Validators to clean up data before AI sees it
     @field_validator('registered_address')
     def normalize_address(cls, v):
-        if isinstance(v, dict):
-            # Convert {"city": "Hyd", "country": "IN"} -> "Hyd, IN"
-            parts = [v.get('line'), v.get('city'), v.get('postal_code'), v.get('country')]
-            return ", ".join([p for p in parts if p])
-        return v
+        # Convert {"city": "Hyd", "country": "IN"} -> "Hyd, IN"
+        return address_text(v) if isinstance(v, dict) else v
+
+    @field_serializer('registered_address')
+    def serialize_address(self, v):
+        # Dumps (stored drafts, batch items, job payloads) keep the object form for re-validation
+        return self._address_fields or v
 
     @field_validator('directors')
     def normalize_directors(cls, v):
@@ -116,10 +308,590 @@ class LegalRequest(BaseModel):
             return [d.strip() for d in v.split(',') if d.strip()]
         return v if v else []
 
+    @model_validator(mode='wrap')
+    @classmethod
+    def time_validation(cls, data, handler):
+        # Report request validation (including the normalizers above) as its own stage
+        started = time.perf_counter()
+        try:
+            model = handler(data)
+            if isinstance(data, dict) and isinstance(data.get("registered_address"), dict):
+                model._address_fields = data["registered_address"]
+            return model
+        finally:
+            observe_stage("validation", time.perf_counter() - started)
+
+
+class LegalRequest(CompanyProfile):
+    template_type: str = Field(..., pattern=TEMPLATE_TYPE_PATTERN, description="Type of legal document to generate")
+    timeout_seconds: Optional[float] = Field(None, gt=0, exclude=True, description="Abort generation if the draft is not ready within this many seconds (same as the X-Request-Timeout header)")
+
+
+class RedraftRequest(BaseModel):
+    """Changed inputs for a stored draft; omitted fields keep their previous values."""
+    company_name: Optional[str] = Field(None, description="Full legal name of the company")
+    registration_number: Optional[str] = Field(None, description="Company registration number")
+    registered_address: Optional[Union[str, dict]] = Field(None, description="Company registered address (string or object)")
+    directors: Optional[Union[str, List[str], List[dict]]] = Field(None, description="Directors list (string, list of strings, or list of objects)")
+    country: Optional[str] = Field(None, description="Jurisdiction/Country (e.g., 'India', 'USA', 'UK')")
+    corporate_context: Optional[str] = Field(None, description="Business context")
+
+
+class BatchRequest(BaseModel):
+    """Either explicit `requests`, or one `company` profile plus the `template_types` to draft for it."""
+    requests: Optional[List[LegalRequest]] = Field(None, description="Independent draft requests")
+    company: Optional[CompanyProfile] = Field(None, description="Company profile shared by every template in `template_types`")
+    template_types: Optional[List[str]] = Field(None, description="Templates to generate for `company` (e.g. all six for onboarding)")
+    parallelism: Optional[int] = Field(None, ge=1, description="Items generated at once (capped by BATCH_MAX_PARALLELISM)")
+
+    @model_validator(mode='after')
+    def check_shape(self):
+        if self.requests is None and (self.company is None or not self.template_types):
+            raise ValueError("Provide either 'requests' or both 'company' and 'template_types'")
+        if self.requests is not None and (self.company is not None or self.template_types):
+            raise ValueError("Provide either 'requests' or 'company'/'template_types', not both")
+        invalid = [t for t in (self.template_types or []) if t not in SUPPORTED_TEMPLATES]
+        if invalid:
+            raise ValueError(f"Invalid template types: {', '.join(invalid)}")
+        return self
+
+    def items(self) -> List[LegalRequest]:
+        """The batch expanded into individual draft requests, in submission order."""
+        if self.requests is not None:
+            return list(self.requests)
+        profile = self.company.model_dump()
+        return [LegalRequest(**profile, template_type=t) for t in self.template_types]
+
 
 # Prompt templates are now imported from prompts.py
 
 
+# --- 2. DRAFT PREPARATION (shared by all generation endpoints) ---
+def validate_request(request: LegalRequest):
+    """Raise HTTPException for configuration problems or an unknown template, before any drafting work."""
+    # Check if OpenAI API key is set
+    if not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(
+            status_code=500,
+            detail="OPENAI_API_KEY environment variable is not set. Please set it in your .env file or as an environment variable."
+        )
+    if request.template_type.lower() not in COMPILED_PROMPTS:
+        raise HTTPException(status_code=400, detail=f"Invalid template type: {request.template_type}")
+
+
+def prepare_draft(
+    request: LegalRequest,
+    mode: str = "single",
+    use_clause_library: bool = True,
+    date_today: Optional[str] = None
+) -> dict:
+    """
+    Resolve signer, jurisdiction and context for a request and assemble its prompt.
+
+    Returns a dict with the resolved values, the template's static `system_prompt`
+    and the per-request `user_prompt` carrying the input values. `mode` is 'single' (one
+    LLM call for the whole document) or 'sections' (section-parallel generation). With
+    `use_clause_library` the template's boilerplate sections come from the clause library
+    and the prompt asks the LLM to leave them out. `date_today` overrides the document
+    date (a redraft keeps its parent's).
+    Raises HTTPException for configuration or input problems.
+    """
+    validate_request(request)
+
+    # A. Logic Processing
+    # 1. Signer Logic
+    signer = resolve_signer(request.directors)
+
+    # 2. Country Logic (Priority: Input > Address > Default)
+    with timed_stage("country_inference"):
+        jurisdiction = gazetteer.resolve(request.country, request._address_fields or request.registered_address)
+        country = jurisdiction.country
+
+    # 3. Context Logic
+    context = request.corporate_context or "General Business"
+
+    # B. Select the Correct Prompt Template
+    template_type_lower = request.template_type.lower()
+    template_upper = request.template_type.upper()
+    compiled_prompt = COMPILED_PROMPTS[template_type_lower]
+    annotate(template_type=template_type_lower, jurisdiction=metric_jurisdiction(country), mode=mode)
+
+    # C. Assemble the Prompt
+    # The system prompt is the template's precompiled, byte-identical prefix (cacheable by the provider);
+    # the user data travels in a trailing INPUTS message that the prefix refers to.
+    # Note: We ONLY pass the core fields. AI will extract details from corporate_context or use placeholders
+    date_today = date_today or datetime.now().strftime("%B %d, %Y")
+    with timed_stage("prompt_assembly"):
+        input_values = {
+            "company_name": request.company_name,
+            "registration_number": request.registration_number,
+            "registered_address": request.registered_address,
+            "signer": signer,
+            "country": country,
+            "corporate_context": context,
+            "date_today": date_today
+        }
+        inputs = compiled_prompt.render_inputs(input_values)
+        clause_library_used = CLAUSE_LIBRARY_ENABLED and use_clause_library and has_library_sections(template_type_lower)
+        user_prompt = inputs + "\n\n"
+        if clause_library_used:
+            user_prompt += omit_instruction(template_type_lower) + "\n\n"
+        user_prompt += GENERATE_CUE
+
+    return {
+        "template_type": template_type_lower,
+        "template_upper": template_upper,
+        "signer": signer,
+        "country": country,
+        "context": context,
+        "date_today": date_today,
+        "system_prompt": compiled_prompt.system_prompt,
+        "mode": mode,
+        "input_values": input_values,
+        "jurisdiction": jurisdiction.as_dict(),
+        "inputs": inputs,
+        "clause_library": clause_library_used,
+        "user_prompt": user_prompt
+    }
+
+
+def draft_cache_key(request: LegalRequest, draft: dict) -> str:
+    """
+    Cache key for a prepared draft: the validated request fields, the resolved
+    jurisdiction and signer, the model settings and the date the prompt carries.
+    """
+    return make_cache_key({
+        "template_type": draft["template_type"],
+        "company_name": request.company_name,
+        "registration_number": request.registration_number,
+        "registered_address": request.registered_address,
+        "directors": request.directors,
+        "country": draft["country"],
+        "signer": draft["signer"],
+        "corporate_context": draft["context"],
+        "model": OPENAI_MODEL,
+        "temperature": OPENAI_TEMPERATURE,
+        "date_bucket": draft["date_today"],
+        "mode": draft["mode"],
+        "clause_library": draft["clause_library"]
+    })
+
+
+def draft_messages(draft: dict) -> list:
+    """Chat messages for a prepared draft: static system prefix first, inputs last."""
+    return [
+        SystemMessage(content=draft["system_prompt"]),
+        HumanMessage(content=draft["user_prompt"])
+    ]
+
+
+def usage_summary(usage_metadata: Optional[dict]) -> Optional[dict]:
+    """Token usage of one LLM call, including prompt tokens served from the provider's prefix cache."""
+    if not usage_metadata:
+        return None
+    input_details = usage_metadata.get("input_token_details") or {}
+    return {
+        "input_tokens": usage_metadata.get("input_tokens", 0),
+        "cached_input_tokens": input_details.get("cache_read", 0),
+        "output_tokens": usage_metadata.get("output_tokens", 0)
+    }
+
+
+def prompt_key(draft: dict) -> str:
+    """Identity of the exact LLM call a draft will make (prompt and model settings)."""
+    return make_cache_key({
+        "system_prompt": draft["system_prompt"],
+        "user_prompt": draft["user_prompt"],
+        "model": OPENAI_MODEL,
+        "temperature": OPENAI_TEMPERATURE,
+        "mode": draft["mode"]
+    })
+
+
+async def warm_up_llm():
+    """Startup hook: open backend connections; a failure only costs the first request its handshake."""
+    try:
+        await asyncio.wait_for(llm_pool.warm_up(), timeout=10)
+    except Exception as e:
+        logging.getLogger("uvicorn.error").warning("LLM warm-up failed: %s", e)
+
+
+def stream_llm(messages: list, max_tokens: Optional[int] = None):
+    """Stream chat chunks from the endpoint pool (hedged, with failover), optionally capping this call's output tokens."""
+    return llm_pool.astream(messages, **({"max_tokens": max_tokens} if max_tokens else {}))
+
+
+async def complete(messages: list, max_tokens: Optional[int] = None):
+    """
+    One LLM completion, streamed internally so time-to-first-token can be measured.
+
+    Returns the merged message (content, usage_metadata and response_metadata).
+    """
+    started = time.perf_counter()
+    message = None
+    received = 0
+    try:
+        async for chunk in stream_llm(messages, max_tokens):
+            if message is None:
+                observe_stage("llm_first_token", time.perf_counter() - started)
+                message = chunk
+            else:
+                message = message + chunk
+            received += 1 if chunk.content else 0
+    except asyncio.CancelledError:
+        # Client gone or deadline passed: closing the stream stops the provider generating
+        record_cancelled_call(received)
+        raise
+    observe_stage("llm_total", time.perf_counter() - started)
+    observe_call_output((message.usage_metadata or {}).get("output_tokens", received))
+    return message
+
+
+async def library_clauses(draft: dict, ticket: Optional[Ticket] = None) -> str:
+    """
+    The draft's boilerplate sections from the clause library (drafted on first use), with this
+    request's values filled in. Returns "" when the library has no usable block (the caller
+    drafts those sections itself), including when drafting the block failed.
+    """
+    async def complete_and_record(messages: list):
+        # Clause blocks are shared by later drafts; their tokens are counted once, here,
+        # and charged to the draft that drafted them
+        message = await complete(messages)
+        usage = usage_summary(message.usage_metadata)
+        record_tokens(draft["template_type"], metric_jurisdiction(draft["country"]), usage)
+        if ticket is not None:
+            ticket.charge(usage)
+        return message
+
+    try:
+        with timed_stage("clause_library"):
+            library = await clause_library.get(draft, complete_and_record)
+    except Exception as e:
+        logging.getLogger("uvicorn.error").warning("Clause library block failed: %s", e)
+        annotate(clause_library="failed")
+        return ""
+    annotate(clause_library="generated" if library["generated"] else "hit")
+    return fill_references(library["text"], draft["input_values"])
+
+
+def expected_calls(draft: dict) -> int:
+    """LLM calls a draft is expected to make: one, or one per section plus the brief."""
+    if draft["mode"] == "sections":
+        return len(TEMPLATE_STRUCTURES.get(draft["template_type"]) or []) + 1
+    return 1
+
+
+async def admit_draft(draft: dict, calls: int = 1, extra_chars: int = 0):
+    """Wait for the draft's estimated tokens under the provider limits; returns a Ticket to settle."""
+    queued_at = time.perf_counter()
+    prompt_chars = sum(len(message.content) for message in draft_messages(draft)) + extra_chars
+    ticket = await token_scheduler.admit(draft["template_type"], prompt_chars, calls)
+    observe_stage("admission_wait", time.perf_counter() - queued_at)
+    return ticket
+
+
+async def generate_and_cache(draft: dict, cache_key: str) -> dict:
+    """
+    Run one LLM generation under the concurrency limit, clean it, repair missing or
+    truncated sections and store it in the cache.
+
+    Library clauses are fetched (or drafted) alongside the main generation; when the
+    library yields nothing, the document is generated again with those sections included.
+
+    Returns {"content": cleaned markdown, "usage": usage_summary(...), "structure": check report
+    including the number of length-limit `continuations`}.
+    """
+    # D. Send to AI
+    # Await the LLM asynchronously so the event loop keeps serving other requests.
+    # Requests beyond the concurrency limit wait for a slot; beyond the queue limit QueueFullError is raised.
+    # A section-parallel draft holds one slot; its section calls share it.
+    ticket = await admit_draft(draft, expected_calls(draft))
+    # A draft that fails, is cancelled or is refused a slot gives its reserved tokens back
+    try:
+        queued_at = time.perf_counter()
+        continuations = 0
+        async with generation_limiter.slot():
+            observe_stage("queue_wait", time.perf_counter() - queued_at)
+            clauses_task = asyncio.ensure_future(library_clauses(draft, ticket)) if draft["clause_library"] else None
+            try:
+                if draft["mode"] == "sections":
+                    async def library_prefill():
+                        clauses = await clauses_task
+                        return prefilled_sections(draft["template_type"], clauses) if clauses else None
+
+                    generation = await generate_sectioned(
+                        draft, complete, parallelism=SECTION_PARALLELISM,
+                        prefilled=library_prefill() if clauses_task else None
+                    )
+                    content, usage_metadata = generation["content"], generation["usage"]
+                else:
+                    # A completion cut off by the token limit is resumed rather than returned half-written
+                    generation = await complete_with_continuation(
+                        complete, draft_messages(draft), OUTPUT_TOKEN_BUDGETS.get(draft["template_type"], 0),
+                        MAX_OUTPUT_TOKENS_PER_CALL, MAX_CONTINUATIONS
+                    )
+                    usages = generation["usage"]
+                    clauses = await clauses_task if clauses_task else None
+                    if clauses_task and not clauses:
+                        # The draft left the library sections out and the library has none: draft them too
+                        full = {**draft, "clause_library": False, "user_prompt": draft["inputs"] + "\n\n" + GENERATE_CUE}
+                        generation = await complete_with_continuation(
+                            complete, draft_messages(full), OUTPUT_TOKEN_BUDGETS.get(draft["template_type"], 0),
+                            MAX_OUTPUT_TOKENS_PER_CALL, MAX_CONTINUATIONS
+                        )
+                        usages = usages + generation["usage"]
+                    content, usage_metadata = generation["content"], sum_usage(usages)
+                    continuations = generation["continuations"]
+                    if clauses:
+                        content = merge_clauses(content, draft["template_type"], clauses)
+            finally:
+                if clauses_task and not clauses_task.done():
+                    clauses_task.cancel()
+
+            # Clean the markdown output for better readability
+            with timed_stage("markdown_cleanup"):
+                cleaned_result = clean_markdown_output(content)
+
+            # Skipped or cut-off sections are drafted on their own instead of regenerating the document
+            with timed_stage("structure_repair"):
+                repair = await repair_structure(
+                    draft, cleaned_result, complete,
+                    parallelism=SECTION_PARALLELISM, max_sections=STRUCTURE_REPAIR_MAX_SECTIONS
+                )
+            cleaned_result = repair["content"]
+            record_structure(draft["template_type"], repair["structure"])
+
+        if cleaned_result:
+            await draft_cache.aset(cache_key, cleaned_result)
+
+        usage = usage_summary(sum_usage([usage_metadata, repair["usage"]]))
+        ticket.settle(usage)
+    except BaseException:
+        ticket.release()
+        raise
+    record_tokens(draft["template_type"], metric_jurisdiction(draft["country"]), usage)
+    repair["structure"]["continuations"] = continuations
+    return {"content": cleaned_result, "usage": usage, "structure": repair["structure"]}
+
+
+def draft_metadata(
+    request: LegalRequest,
+    draft: dict,
+    cached: bool = False,
+    usage: Optional[dict] = None,
+    draft_id: Optional[str] = None,
+    structure: Optional[dict] = None
+) -> dict:
+    """Response metadata describing how a draft was resolved."""
+    return {
+        "draft_id": draft_id,
+        "template_type": draft["template_upper"],
+        "applied_law": draft["country"],
+        "jurisdiction": draft["jurisdiction"],
+        "applied_context": draft["context"],
+        "company": request.company_name,
+        "signer": draft["signer"],
+        "cached": cached,
+        "usage": usage,
+        "structure": structure
+    }
+
+
+async def produce_draft(request: LegalRequest, no_cache: bool = False, mode: str = "single") -> dict:
+    """
+    Prepare, generate (or fetch from cache) and describe one draft.
+
+    Returns {"draft": prepared draft, "content": cleaned markdown, "metadata": response metadata}.
+    Raises HTTPException for input/configuration problems and QueueFullError when at capacity.
+    """
+    draft = prepare_draft(request, mode=mode)
+
+    # Identical inputs already generated today? Serve the cached draft.
+    with timed_stage("cache_lookup"):
+        cache_key = draft_cache_key(request, draft)
+        cleaned_result = None if no_cache else await draft_cache.aget(cache_key)
+    cached = cleaned_result is not None
+    annotate(cached=cached)
+    usage = None
+
+    if cached:
+        structure = check_structure(draft["template_type"], cleaned_result)
+    else:
+        # Join an identical generation already in flight (double-clicks, retries) or start one
+        generation = await generation_flights.run(
+            prompt_key(draft), lambda: generate_and_cache(draft, cache_key)
+        )
+        cleaned_result = generation["content"]
+        usage = generation["usage"]
+        structure = generation["structure"]
+
+    # Keep the draft and its section index so it can be incrementally redrafted
+    draft_id = await asyncio.to_thread(
+        draft_store.save, draft["template_type"], mode, request.model_dump(), draft["input_values"], cleaned_result
+    )
+
+    return {
+        "draft": draft,
+        "content": cleaned_result,
+        "metadata": draft_metadata(request, draft, cached=cached, usage=usage, draft_id=draft_id, structure=structure)
+    }
+
+
+def describe_changes(previous_values: dict, changed: List[str]) -> str:
+    """The CHANGED INPUTS block of a redraft prompt: each changed reference and its previous value."""
+    return "\n".join(f"- <<{INPUT_LABELS[field]}>> (previously: {previous_values.get(field)})" for field in changed)
+
+
+async def produce_redraft(previous: dict, changes: dict, no_cache: bool = False) -> dict:
+    """
+    Redraft a stored draft for changed inputs, regenerating only the affected sections.
+
+    Sections whose recorded dependencies include a changed input are rewritten (library
+    sections are refilled from the clause library); the rest are reused verbatim. A new
+    jurisdiction or business category changes every section, so the draft is generated
+    in full. Returns the same shape as `produce_draft`, with `metadata.redraft` details.
+    """
+    request = LegalRequest(**{**previous["request"], **changes})
+    previous_values = previous["input_values"]
+    # The document keeps its date: a redraft on a later day only rewrites what the caller changed
+    draft = prepare_draft(request, mode=previous["mode"], date_today=previous_values.get("date_today"))
+    changed = sorted(f for f, v in draft["input_values"].items() if str(v) != str(previous_values.get(f)))
+    annotate(changed_inputs=changed)
+
+    if "country" in changed or context_category(draft["context"]) != context_category(previous_values.get("corporate_context")):
+        result = await produce_draft(request, no_cache=no_cache, mode=previous["mode"])
+        result["metadata"]["redraft"] = {
+            "parent_id": previous["id"], "changed_inputs": changed, "full_redraft": True,
+            "regenerated_sections": len(split_sections(result["content"])), "reused_sections": 0,
+            "failed_sections": []
+        }
+        return result
+
+    sections = previous["sections"]
+    affected = [i for i, section in enumerate(sections) if set(section["depends_on"]) & set(changed)]
+    # Library sections are refilled together from the clause library rather than rewritten
+    library_sections = [
+        i for i, section in enumerate(sections)
+        if draft["clause_library"] and is_library_heading(draft["template_type"], section["heading"])
+    ]
+    library = library_sections if set(library_sections) & set(affected) else []
+    rewrite = [i for i in affected if i not in library_sections]
+    usage = None
+
+    if affected:
+        # Every rewrite call carries the whole previous document
+        ticket = await admit_draft(draft, max(1, len(rewrite)), extra_chars=len(previous["content"]))
+        try:
+            queued_at = time.perf_counter()
+            async with generation_limiter.slot():
+                observe_stage("queue_wait", time.perf_counter() - queued_at)
+                changes_text = describe_changes(previous_values, changed)
+                clauses, generation = await asyncio.gather(
+                    library_clauses(draft, ticket) if library else asyncio.sleep(0),
+                    redraft_sections(
+                        draft, previous["content"], [sections[i]["heading"] for i in rewrite],
+                        changes_text, complete, parallelism=SECTION_PARALLELISM
+                    )
+                )
+                if library and not clauses:
+                    # The library has nothing for these sections: rewrite them like the others
+                    library_generation = await redraft_sections(
+                        draft, previous["content"], [sections[i]["heading"] for i in library],
+                        changes_text, complete, parallelism=SECTION_PARALLELISM
+                    )
+                    rewrite += library
+                    generation = {
+                        "sections": generation["sections"] + library_generation["sections"],
+                        "usage": sum_usage([generation["usage"], library_generation["usage"]])
+                    }
+                    library = []
+            usage = usage_summary(generation["usage"])
+            # A partial rewrite says nothing about the template's typical draft length
+            ticket.settle(usage, typical=False)
+        except BaseException:
+            ticket.release()
+            raise
+        record_tokens(draft["template_type"], metric_jurisdiction(draft["country"]), usage)
+
+        # A section that comes back empty keeps its previous text (reported as `failed_sections`)
+        rewritten = {i: text for i, text in zip(rewrite, generation["sections"]) if text.strip()}
+        failed = [sections[i]["heading"] for i in rewrite if i not in rewritten]
+        parts = []
+        for i, section in enumerate(sections):
+            if i in rewritten:
+                parts.append({"text": rewritten[i]})
+            elif library and i == library[0]:
+                parts.extend(split_sections(clauses))
+            elif i not in library:
+                parts.append(section)
+        with timed_stage("markdown_cleanup"):
+            content = clean_markdown_output(join_sections(parts))
+    else:
+        content = previous["content"]
+        failed = []
+
+    draft_id = await asyncio.to_thread(
+        draft_store.save, draft["template_type"], previous["mode"], request.model_dump(), draft["input_values"],
+        content, previous["id"]
+    )
+    metadata = draft_metadata(
+        request, draft, usage=usage, draft_id=draft_id, structure=check_structure(draft["template_type"], content)
+    )
+    metadata["redraft"] = {
+        "parent_id": previous["id"], "changed_inputs": changed, "full_redraft": False,
+        "regenerated_sections": len(affected) - len(failed), "reused_sections": len(sections) - len(affected),
+        "failed_sections": failed
+    }
+    return {"draft": draft, "content": content, "metadata": metadata}
+
+
+async def process_job(payload: dict) -> dict:
+    """Job handler: generate the draft described by a queued job payload."""
+    request = LegalRequest(**payload["request"])
+    try:
+        with request_timing("job"), client_scope(payload.get("client_id", "jobs"), "background"):
+            result = await produce_draft(
+                request, no_cache=payload.get("no_cache", False), mode=payload.get("mode", "single")
+            )
+    except QueueFullError:
+        raise RetryJob()
+    except Exception as e:
+        if failure_reason(e) == "429":
+            # Counted: a provider that keeps rate limiting eventually fails the job
+            raise RetryJob(counted=True, detail="LLM provider rate limit persisted")
+        raise
+    return {"success": True, "draft_content": result["content"], "metadata": result["metadata"]}
+
+
+def deadline_exceeded(error: DeadlineExceeded) -> HTTPException:
+    """504 returned when a request's deadline passes before its draft is ready."""
+    return HTTPException(status_code=504, detail=f"{error}. Generation was cancelled.")
+
+
+def capacity_exceeded(error: Optional[QueueFullError] = None) -> HTTPException:
+    """503 returned when the generation queue is full or the provider token budget is committed."""
+    retry_after = getattr(error, "retry_after", None) or QUEUE_RETRY_AFTER_SECONDS
+    return HTTPException(
+        status_code=503,
+        detail="Server is at capacity generating other documents. Please retry shortly.",
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+
+def provider_rate_limited() -> HTTPException:
+    """503 returned when the AI provider still answers 429 after failover."""
+    return HTTPException(
+        status_code=503,
+        detail="The AI provider's rate limit was reached. Please retry shortly.",
+        headers={"Retry-After": str(QUEUE_RETRY_AFTER_SECONDS)}
+    )
+
+
+def client_id(http_request: Request) -> str:
+    """Fair-share identity of a caller: the X-Client-Id header, else the client address."""
+    return http_request.headers.get("x-client-id") or (http_request.client.host if http_request.client else "anonymous")
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -128,22 +900,133 @@ async def root():
         "version": "2.0.0",
         "endpoints": {
             "generate": "/api/generate-legal-draft",
-            "health": "/health"
+            "generate_stream": "/api/generate-legal-draft/stream",
+            "generate_batch": "/api/generate-legal-draft/batch",
+            "submit_job": "/api/jobs",
+            "job_status": "/api/jobs/{job_id}",
+            "draft": "/api/drafts/{draft_id}",
+            "redraft": "/api/drafts/{draft_id}/redraft",
+            "cache_stats": "/api/cache/stats",
+            "health": "/health",
+            "metrics": "/metrics"
         },
-        "supported_templates": ["nda", "employment", "service", "terms", "board", "shareholder"]
+        "supported_templates": SUPPORTED_TEMPLATES
     }
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "legal-document-generator"}
+    health = {
+        "status": "healthy",
+        "service": "legal-document-generator",
+        "generation": generation_limiter.stats(),
+        "coalescing": generation_flights.stats(),
+        "clause_library": clause_library.stats(),
+        "llm_endpoints": llm_pool.stats(),
+        "admission": token_scheduler.stats(),
+        "jobs": await asyncio.to_thread(job_store.counts)
+    }
+    if shared_state is not None:
+        health["workers"] = workers_summary(await asyncio.to_thread(shared_state.workers))
+    return health
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, token usage, in-flight requests and errors"""
+    if shared_state is None:
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+    text = await asyncio.to_thread(render_all_workers, worker_state(), REGISTRY.snapshot())
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+def worker_state() -> dict:
+    """This worker's in-flight counts, as published to the other workers."""
+    limiter = generation_limiter.stats()
+    return {
+        "pid": os.getpid(),
+        "in_flight": sum(IN_FLIGHT.values().values()),
+        "generations_active": limiter["active"],
+        "generations_waiting": limiter["waiting"],
+        "admission_waiting": token_scheduler.stats()["waiting"],
+    }
+
+
+def workers_summary(workers: List[dict]) -> dict:
+    totals = {field: sum(worker[field] for worker in workers)
+              for field in ("in_flight", "generations_active", "generations_waiting", "admission_waiting")}
+    return {"count": len(workers), **totals, "processes": workers}
+
+
+def render_all_workers(state: dict, snapshot: dict) -> str:
+    """/metrics merged over every worker, after publishing this one's current `snapshot`."""
+    shared_state.publish(state, snapshot)
+    snapshots = shared_state.metrics_snapshots(lambda stopped: REGISTRY.merge(stopped, gauges=False))
+    return REGISTRY.render(snapshots)
+
+
+async def publish_worker_state(stop: asyncio.Event):
+    """Heartbeat into shared_state until `stop` is set, then hand the final counters over and retire."""
+    while not stop.is_set():
+        try:
+            await asyncio.to_thread(shared_state.publish, worker_state(), REGISTRY.snapshot())
+        except Exception as e:
+            logging.getLogger("uvicorn.error").warning("Shared state heartbeat failed: %s", e)
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stop.wait(), SHARED_STATE_INTERVAL_SECONDS)
+    with suppress(Exception):
+        await asyncio.to_thread(shared_state.publish, worker_state(), REGISTRY.snapshot())
+        await asyncio.to_thread(shared_state.retire)
+
+
+def after_fork():
+    """
+    Reopen SQLite connections in a worker forked from a preloaded app (gunicorn.conf.py
+    post_fork): a connection opened in the master must not be used from the children.
+    """
+    for store in (job_store, draft_store, clause_library, draft_cache, shared_state):
+        if store is not None:
+            store.reconnect()
+
+
+def _collect_runtime_gauges():
+    """Scrape-time gauges for the limiter, admission, caches and coalescing."""
+    limiter = generation_limiter.stats()
+    cache = draft_cache.stats()
+    flights = generation_flights.stats()
+    yield "legal_draft_generations_active", "LLM generations currently running.", limiter["active"]
+    yield "legal_draft_generations_waiting", "Generations waiting for a concurrency slot.", limiter["waiting"]
+    yield "legal_draft_generations_rejected", "Generations rejected with 503 since start.", limiter["rejected"]
+    admission = token_scheduler.stats()
+    yield "legal_draft_admission_waiting", "Drafts waiting for provider token budget.", admission["waiting"]
+    yield "legal_draft_admission_rejected", "Drafts rejected with 503 because the token budget was committed.", admission["rejected"]
+    yield "legal_draft_admission_rate_limited", "Provider 429 responses that emptied the token budget.", admission["rate_limited"]
+    yield "legal_draft_cache_hits", "Draft cache hits since start.", cache["hits"]
+    yield "legal_draft_cache_misses", "Draft cache misses since start.", cache["misses"]
+    yield "legal_draft_coalesced_requests", "Requests that joined an in-flight identical generation.", flights["coalesced"]
+    library = clause_library.stats()
+    yield "legal_draft_clause_library_hits", "Drafts whose boilerplate came from the clause library.", library["hits"]
+    yield "legal_draft_clause_library_generated", "Clause blocks drafted by the LLM since start.", library["generated"]
+
+
+REGISTRY.add_collector(_collect_runtime_gauges)
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Draft cache hit/miss statistics"""
+    return draft_cache.stats()
 
 
 @app.post("/api/generate-legal-draft")
 async def generate_draft(
     request: LegalRequest,
-    format: Optional[str] = Query(default="json", description="Response format: 'json' (default) or 'text' for plain markdown")
+    http_request: Request,
+    format: Optional[str] = Query(default="json", description="Response format: 'json' (default) or 'text' for plain markdown"),
+    mode: str = Query(default="single", pattern=GENERATION_MODE_PATTERN, description="'single' (default) generates in one LLM call, 'sections' drafts the REQUIRED STRUCTURE sections in parallel"),
+    no_cache: bool = Query(default=False, description="Skip the draft cache lookup and generate a fresh document"),
+    x_request_timeout: Optional[str] = Header(default=None, description="Deadline in seconds; generation is cancelled (504) once it passes")
 ):
     """
     Generate a legal document based on the provided parameters.
@@ -152,104 +1035,381 @@ async def generate_draft(
     
     Query Parameters:
     - format: 'json' (default) returns JSON with metadata, 'text' returns plain markdown only
+    - mode: 'single' (default) or 'sections' to generate the document's sections concurrently (lower latency for long documents)
+    - no_cache: 'true' regenerates even if an identical draft is cached (the fresh draft replaces it)
+
+    Generation is cancelled if the client disconnects or the deadline (`X-Request-Timeout`
+    header or `timeout_seconds` field) passes.
     """
+    timeout = resolve_timeout(x_request_timeout, request.timeout_seconds, DEFAULT_REQUEST_TIMEOUT_SECONDS)
     try:
-        # Check if OpenAI API key is set
-        if not os.getenv("OPENAI_API_KEY"):
-            raise HTTPException(
-                status_code=500,
-                detail="OPENAI_API_KEY environment variable is not set. Please set it in your .env file or as an environment variable."
+        with request_timing("generate"):
+            try:
+                with client_scope(client_id(http_request)):
+                    result = await run_cancellable(
+                        http_request, produce_draft(request, no_cache=no_cache, mode=mode), timeout, "generate"
+                    )
+            except QueueFullError as e:
+                raise capacity_exceeded(e)
+            except DeadlineExceeded as e:
+                raise deadline_exceeded(e)
+
+        # If format=text, return plain markdown (easier to read in Postman/browser)
+        if format and format.lower() == "text":
+            return PlainTextResponse(
+                content=result["content"],
+                media_type="text/markdown",
+                headers={"Content-Disposition": f'inline; filename="{result["draft"]["template_type"]}_draft.md"'}
             )
 
-        # A. Logic Processing
-        # 1. Signer Logic
-        if isinstance(request.directors, list) and len(request.directors) > 0:
-            signer = request.directors[0]
-            directors_str = ", ".join(request.directors)
-        else:
-            signer = "Authorized Signatory"
-            directors_str = "[Directors Listed in Registry]"
-
-        # 2. Country Logic (Priority: Input > Address > Default)
-        country = request.country
-        if not country:
-            # Try to infer from address
-            address_str = str(request.registered_address).lower()
-            if "india" in address_str or "bangalore" in address_str or "mumbai" in address_str or "delhi" in address_str:
-                country = "India"
-            elif "usa" in address_str or "united states" in address_str or "california" in address_str or "new york" in address_str:
-                country = "USA"
-            elif "uk" in address_str or "united kingdom" in address_str or "london" in address_str:
-                country = "UK"
-            elif "netherlands" in address_str or "amsterdam" in address_str:
-                country = "Netherlands"
-        
-        if not country:
-            country = "International Jurisdiction"
-
-        # 3. Context Logic
-        context = request.corporate_context or "General Business"
-
-        # B. Select the Correct Prompt Template
-        template_type_lower = request.template_type.lower()
-        template_upper = request.template_type.upper()
-        raw_prompt_template = PROMPT_MAP.get(template_type_lower)
-        if not raw_prompt_template:
-            raise HTTPException(status_code=400, detail=f"Invalid template type: {request.template_type}")
-
-        # C. Inject User Data directly into the Prompt String using .format()
-        # This makes the instructions to the AI incredibly clear and reduces hallucination
-        # Note: We ONLY pass the core fields. AI will extract details from corporate_context or use placeholders
-        formatted_system_prompt = raw_prompt_template.format(
-            core_instructions=CORE_LEGAL_BRAIN,
-            company_name=request.company_name,
-            registration_number=request.registration_number,
-            registered_address=request.registered_address,
-            signer=signer,
-            country=country,
-            corporate_context=context,
-            date_today=datetime.now().strftime("%B %d, %Y")
+        # Default: return JSON with metadata
+        return json_response({
+            "success": True,
+            "draft_content": result["content"],
+            "metadata": result["metadata"]
+        })
+
+    except HTTPException:
+        raise
+    except ClientDisconnected:
+        # Nobody is listening; 499 (client closed request) only shows up in access logs
+        return Response(status_code=499)
+    except Exception as e:
+        if failure_reason(e) == "429":
+            raise provider_rate_limited()
+        raise HTTPException(status_code=500, detail=f"Error generating document: {str(e)}")
+
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/generate-legal-draft/stream")
+async def generate_draft_stream(
+    request: LegalRequest,
+    http_request: Request,
+    format: Optional[str] = Query(default="sse", description="Stream format: 'sse' (default) for Server-Sent Events or 'text' for chunked plain markdown"),
+    no_cache: bool = Query(default=False, description="Skip the draft cache lookup and generate a fresh document"),
+    x_request_timeout: Optional[str] = Header(default=None, description="Deadline in seconds; generation stops with an `error` event once it passes")
+):
+    """
+    Stream a legal document as it is generated.
+
+    Tokens are cleaned incrementally (code fences stripped, blank lines collapsed) and
+    forwarded as soon as they arrive, so the first words reach the client in seconds.
+
+    Query Parameters:
+    - format: 'sse' (default) sends `metadata`, `delta` and `done` events,
+      'text' sends raw markdown chunks with `text/markdown` content type
+    - no_cache: 'true' regenerates even if an identical draft is cached
+
+    A client disconnect stops the upstream LLM stream; past the deadline (`X-Request-Timeout`
+    header or `timeout_seconds` field) generation stops with an `error` event.
+    """
+    # Streamed tokens go straight to the client, so the whole document is generated here
+    draft = prepare_draft(request, use_clause_library=False)
+    timeout = resolve_timeout(x_request_timeout, request.timeout_seconds, DEFAULT_REQUEST_TIMEOUT_SECONDS)
+    as_text = bool(format) and format.lower() == "text"
+    cache_key = draft_cache_key(request, draft)
+    cached_result = None if no_cache else await draft_cache.aget(cache_key)
+    metadata = draft_metadata(request, draft, cached=cached_result is not None)
+
+    ticket = None
+    if cached_result is not None:
+        release_slot = lambda: None  # Cached drafts need no generation slot
+    else:
+        # Admit and reserve the slot before responding so a full queue still yields a proper 503
+        try:
+            with client_scope(client_id(http_request)):
+                ticket = await admit_draft(draft)
+            try:
+                release_slot = await generation_limiter.acquire()
+            except BaseException:
+                ticket.release()
+                raise
+        except QueueFullError as e:
+            raise capacity_exceeded(e)
+
+    async def stream_chunks():
+        cleaner = StreamingMarkdownCleaner()
+        usage = None
+        received = 0
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            with request_timing("stream"):
+                try:
+                    annotate(template_type=draft["template_type"], jurisdiction=metric_jurisdiction(draft["country"]), cached=cached_result is not None)
+                    if not as_text:
+                        yield _sse_event("metadata", metadata)
+                    if cached_result is not None:
+                        yield cached_result if as_text else _sse_event("delta", {"text": cached_result})
+                    else:
+                        parts = []
+                        generation = {}
+                        started = time.perf_counter()
+                        first_token = True
+                        # Continuations after a length cut-off flow through the same cleaner
+                        texts = stream_with_continuation(
+                            stream_llm, draft_messages(draft), OUTPUT_TOKEN_BUDGETS.get(draft["template_type"], 0),
+                            MAX_OUTPUT_TOKENS_PER_CALL, MAX_CONTINUATIONS, generation
+                        )
+                        while True:
+                            try:
+                                # The deadline bounds each wait, so a stalled upstream cannot outlive it
+                                text = await asyncio.wait_for(anext(texts), None if deadline is None else deadline - time.monotonic())
+                            except StopAsyncIteration:
+                                break
+                            except asyncio.TimeoutError:
+                                record_cancelled_call(received)
+                                record_cancelled_request("stream", "deadline")
+                                raise DeadlineExceeded(timeout)
+                            received += 1
+                            if first_token:
+                                observe_stage("llm_first_token", time.perf_counter() - started)
+                                first_token = False
+                            piece = cleaner.feed(text)
+                            if piece:
+                                parts.append(piece)
+                                yield piece if as_text else _sse_event("delta", {"text": piece})
+                        observe_stage("llm_total", time.perf_counter() - started)
+                        usage = usage_summary(sum_usage(generation["usage"]))
+                        ticket.settle(usage)
+                        piece = cleaner.finish()
+                        if piece:
+                            parts.append(piece)
+                            yield piece if as_text else _sse_event("delta", {"text": piece})
+                        if parts:
+                            await draft_cache.aset(cache_key, "".join(parts))
+                        record_tokens(draft["template_type"], metric_jurisdiction(draft["country"]), usage)
+                    content = cached_result if cached_result is not None else "".join(parts)
+                    draft_id = await asyncio.to_thread(
+                        draft_store.save, draft["template_type"], draft["mode"], request.model_dump(), draft["input_values"], content
+                    )
+                    if not as_text:
+                        # Streamed text is already with the client, so the structure is reported, not repaired
+                        structure = check_structure(draft["template_type"], content)
+                        structure["continuations"] = generation["continuations"] if cached_result is None else 0
+                        yield _sse_event("done", {"success": True, "usage": usage, "draft_id": draft_id, "structure": structure})
+                except (asyncio.CancelledError, GeneratorExit):
+                    # Client disconnected: cancelling here closes the upstream LLM stream
+                    if cached_result is None:
+                        record_cancelled_call(received)
+                    record_cancelled_request("stream", "disconnect")
+                    raise
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            if not as_text:
+                yield _sse_event("error", {"detail": f"Error generating document: {str(e)}"})
+            else:
+                raise
+        finally:
+            if ticket is not None:
+                # Unsettled when generation failed or the client left: give the reservation back
+                ticket.release()
+            release_slot()
+
+    if as_text:
+        return StreamingResponse(
+            stream_chunks(),
+            media_type="text/markdown",
+            headers={"Content-Disposition": f'inline; filename="{draft["template_type"]}_draft.md"'},
+            background=BackgroundTask(release_slot)
         )
+    return StreamingResponse(
+        stream_chunks(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_slot)
+    )
 
-        # D. Send to AI
-        # Since we pre-formatted the prompt with data, we don't need complex variable inputs here
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", formatted_system_prompt),
-            ("human", "Generate the document now.")
-        ])
 
-        chain = prompt | llm | StrOutputParser()
-        result = chain.invoke({})  # No variables needed, already baked into the prompt!
+@app.post("/api/generate-legal-draft/batch")
+async def generate_draft_batch(
+    batch: BatchRequest,
+    http_request: Request,
+    mode: str = Query(default="single", pattern=GENERATION_MODE_PATTERN, description="'single' (default) generates in one LLM call, 'sections' drafts the REQUIRED STRUCTURE sections in parallel"),
+    no_cache: bool = Query(default=False, description="Skip the draft cache lookup for every item")
+):
+    """
+    Generate several legal documents concurrently, streaming each result as it finishes.
 
-        # Clean the markdown output for better readability
-        cleaned_result = clean_markdown_output(result)
+    The response is NDJSON (`application/x-ndjson`): one line per item, in completion order,
+    carrying its `index` in the submitted batch. A failed item yields a line with
+    `success: false` and an `error`; the rest of the batch carries on.
+    """
+    items = batch.items()
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {len(items)} items (maximum {BATCH_MAX_ITEMS})")
+
+    parallelism = min(batch.parallelism or BATCH_MAX_PARALLELISM, BATCH_MAX_PARALLELISM)
+    gate = asyncio.Semaphore(parallelism)
+    client = client_id(http_request)
+
+    async def run_item(index: int, item: LegalRequest) -> dict:
+        line = {"index": index, "template_type": item.template_type.upper()}
+        try:
+            async with gate:
+                # Batch items queue for token budget behind interactive requests
+                with request_timing("batch_item"), client_scope(client, "batch"):
+                    result = await produce_draft(item, no_cache=no_cache, mode=mode)
+            line.update({"success": True, "draft_content": result["content"], "metadata": result["metadata"]})
+        except QueueFullError as e:
+            error = capacity_exceeded(e)
+            line.update({"success": False, "error": {"status_code": error.status_code, "detail": error.detail}})
+        except HTTPException as e:
+            line.update({"success": False, "error": {"status_code": e.status_code, "detail": e.detail}})
+        except Exception as e:
+            line.update({"success": False, "error": {"status_code": 500, "detail": f"Error generating document: {str(e)}"}})
+        return line
+
+    async def stream_lines():
+        tasks = [asyncio.ensure_future(run_item(i, item)) for i, item in enumerate(items)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished) + "\n"
+        finally:
+            # Client went away mid-batch: stop generating the remaining items
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_lines(), media_type="application/x-ndjson")
+
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    request: LegalRequest,
+    mode: str = Query(default="single", pattern=GENERATION_MODE_PATTERN, description="'single' (default) generates in one LLM call, 'sections' drafts the REQUIRED STRUCTURE sections in parallel"),
+    no_cache: bool = Query(default=False, description="Skip the draft cache lookup when the job runs")
+):
+    """
+    Queue a legal document for background generation and return immediately.
+
+    Poll `GET /api/jobs/{job_id}` until `status` is `succeeded` (the result carries the
+    same `draft_content` and `metadata` as `/api/generate-legal-draft`) or `failed`.
+    """
+    # Fail fast on configuration problems instead of queueing jobs that cannot run
+    validate_request(request)
+    job_id = await asyncio.to_thread(job_store.submit, {"request": request.model_dump(), "no_cache": no_cache, "mode": mode})
+    return {"job_id": job_id, "status": "queued", "status_url": f"/api/jobs/{job_id}"}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a queued draft job, with its result once finished."""
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+def stored_draft_body(draft: dict) -> dict:
+    """JSON representation of a stored draft, shaped like the generate response."""
+    return {
+        "success": True,
+        "draft_content": draft["content"],
+        "metadata": {
+            "draft_id": draft["id"],
+            "parent_id": draft["parent_id"],
+            "template_type": draft["template_type"].upper(),
+            "mode": draft["mode"],
+            "applied_law": draft["input_values"].get("country"),
+            "company": draft["input_values"].get("company_name"),
+            "signer": draft["input_values"].get("signer"),
+            "created_at": datetime.fromtimestamp(draft["created_at"]).isoformat(timespec="seconds"),
+            "sections": [{"heading": s["heading"], "depends_on": s["depends_on"]} for s in draft["sections"]]
+        }
+    }
+
+
+@app.get("/api/drafts/{draft_id}")
+async def get_draft(
+    draft_id: str,
+    http_request: Request,
+    format: Optional[str] = Query(default="json", description="Response format: 'json' (default) or 'text' for plain markdown")
+):
+    """
+    A stored draft, by the `draft_id` returned when it was generated.
+
+    Drafts never change under their id, so responses carry a strong `ETag` (answered with
+    `304` on a matching `If-None-Match`) and may be cached until the draft expires from
+    the store. Bodies are compressed with brotli or gzip according to `Accept-Encoding`.
+    """
+    draft = await asyncio.to_thread(draft_store.get, draft_id)
+    if draft is None:
+        raise HTTPException(status_code=404, detail=f"Draft not found: {draft_id}")
+    max_age = draft["created_at"] + DRAFT_STORE_TTL_SECONDS - time.time() if DRAFT_STORE_TTL_SECONDS else None
+
+    if format and format.lower() == "text":
+        return immutable_response(
+            http_request, f"{draft_id}-text", lambda: draft["content"].encode("utf-8"),
+            "text/markdown; charset=utf-8", cache=draft_responses,
+            headers={"Content-Disposition": f'inline; filename="{draft["template_type"]}_draft.md"'}, max_age=max_age
+        )
+    return immutable_response(
+        http_request, f"{draft_id}-json", lambda: dumps(stored_draft_body(draft)),
+        "application/json", cache=draft_responses, max_age=max_age
+    )
+
+
+@app.post("/api/drafts/{draft_id}/redraft")
+async def redraft(
+    draft_id: str,
+    changes: RedraftRequest,
+    http_request: Request,
+    format: Optional[str] = Query(default="json", description="Response format: 'json' (default) or 'text' for plain markdown"),
+    no_cache: bool = Query(default=False, description="Skip the draft cache if the change requires a full redraft"),
+    x_request_timeout: Optional[str] = Header(default=None, description="Deadline in seconds; generation is cancelled (504) once it passes")
+):
+    """
+    Regenerate a stored draft with changed inputs, rewriting only the affected sections.
+
+    The body carries only the changed fields (e.g. `registered_address`, `directors`,
+    `corporate_context`). Sections that do not depend on them are reused verbatim; a change
+    of jurisdiction or business category regenerates the whole document. The response has
+    the same shape as `/api/generate-legal-draft`, with a new `draft_id` and
+    `metadata.redraft` listing what was regenerated.
+    """
+    previous = await asyncio.to_thread(draft_store.get, draft_id)
+    if previous is None:
+        raise HTTPException(status_code=404, detail=f"Draft not found: {draft_id}")
+
+    timeout = resolve_timeout(x_request_timeout, None, DEFAULT_REQUEST_TIMEOUT_SECONDS)
+    try:
+        with request_timing("redraft"):
+            try:
+                with client_scope(client_id(http_request)):
+                    result = await run_cancellable(
+                        http_request, produce_redraft(previous, changes.model_dump(exclude_unset=True), no_cache=no_cache),
+                        timeout, "redraft"
+                    )
+            except QueueFullError as e:
+                raise capacity_exceeded(e)
+            except DeadlineExceeded as e:
+                raise deadline_exceeded(e)
 
-        # If format=text, return plain markdown (easier to read in Postman/browser)
         if format and format.lower() == "text":
             return PlainTextResponse(
-                content=cleaned_result,
+                content=result["content"],
                 media_type="text/markdown",
-                headers={"Content-Disposition": f'inline; filename="{template_upper.lower()}_draft.md"'}
+                headers={"Content-Disposition": f'inline; filename="{result["draft"]["template_type"]}_draft.md"'}
             )
-
-        # Default: return JSON with metadata
-        return {
+        return json_response({
             "success": True,
-            "draft_content": cleaned_result,
-            "metadata": {
-                "template_type": template_upper,
-                "applied_law": country,
-                "applied_context": context,
-                "company": request.company_name,
-                "signer": signer
-            }
-        }
+            "draft_content": result["content"],
+            "metadata": result["metadata"]
+        })
 
     except HTTPException:
         raise
+    except ClientDisconnected:
+        return Response(status_code=499)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating document: {str(e)}")
-
+        if failure_reason(e) == "429":
+            raise provider_rate_limited()
+        raise HTTPException(status_code=500, detail=f"Error redrafting document: {str(e)}")
 
 if __name__ == "__main__":
     import uvicorn
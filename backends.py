@@ -0,0 +1,251 @@
+"""
+Generation Backends
+Chat messages and streamed chunks shared by the generation code, plus the backends that
+stream them: a thin OpenAI-compatible client on one pooled keep-alive `httpx` connection
+pool (the default) and a LangChain `ChatOpenAI` adapter imported only when selected.
+"""
+
+import asyncio
+import json
+import random
+from typing import AsyncIterator, Dict, List, Optional, Protocol
+
+import httpx
+
+# Statuses worth retrying on the same endpoint before any text has streamed
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Longest Retry-After honoured between attempts (seconds)
+MAX_RETRY_DELAY = 8.0
+
+
+class ChatMessage:
+    """A chat message as sent to the model."""
+
+    role = "user"
+
+    def __init__(self, content: str):
+        self.content = content
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(content={self.content[:40]!r})"
+
+
+class SystemMessage(ChatMessage):
+    role = "system"
+
+
+class HumanMessage(ChatMessage):
+    role = "user"
+
+
+class AIMessage(ChatMessage):
+    role = "assistant"
+
+
+class ChatChunk:
+    """
+    A streamed piece of a completion. Chunks add up (`a + b`) to the whole message:
+    content is concatenated, metadata merged and usage summed.
+    """
+
+    def __init__(self, content: str = "", usage_metadata: Optional[dict] = None,
+                 response_metadata: Optional[dict] = None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+        self.response_metadata = response_metadata or {}
+
+    def __add__(self, other: "ChatChunk") -> "ChatChunk":
+        usage = self.usage_metadata
+        if other.usage_metadata:
+            usage = _add_usage(usage, other.usage_metadata) if usage else other.usage_metadata
+        metadata = dict(self.response_metadata)
+        metadata.update({k: v for k, v in other.response_metadata.items() if v is not None})
+        return ChatChunk(self.content + other.content, usage, metadata)
+
+
+def _add_usage(a: dict, b: dict) -> dict:
+    cached = (a.get("input_token_details") or {}).get("cache_read", 0) + (b.get("input_token_details") or {}).get("cache_read", 0)
+    return {
+        "input_tokens": a.get("input_tokens", 0) + b.get("input_tokens", 0),
+        "output_tokens": a.get("output_tokens", 0) + b.get("output_tokens", 0),
+        "total_tokens": a.get("total_tokens", 0) + b.get("total_tokens", 0),
+        "input_token_details": {"cache_read": cached},
+    }
+
+
+def usage_metadata(usage: dict) -> dict:
+    """OpenAI `usage` block -> the usage metadata shape used across the code."""
+    return {
+        "input_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+        "input_token_details": {"cache_read": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)},
+    }
+
+
+class BackendHTTPError(Exception):
+    """Non-2xx answer from the provider; `status_code` drives retries and failover."""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class GenerationBackend(Protocol):
+    """What the generation code needs from a model: streamed chunks for a message list."""
+
+    def astream(self, messages: List[ChatMessage], **kwargs) -> AsyncIterator[ChatChunk]: ...
+
+    async def warm_up(self) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+class OpenAICompatibleBackend:
+    """
+    Streams /chat/completions over a shared keep-alive `httpx.AsyncClient`.
+
+    The client (and its connection pool) is created on first use and reused by every
+    call. Failures before the first byte of a response (connection errors and
+    RETRY_STATUS answers) are retried up to `max_retries` times with jittered backoff.
+    """
+
+    def __init__(self, model: str, api_key: Optional[str], base_url: Optional[str] = None,
+                 temperature: Optional[float] = None, max_retries: int = 2, max_connections: int = 100,
+                 timeout: float = 120.0):
+        self.model = model
+        self.temperature = temperature
+        self.max_retries = max_retries
+        self.base_url = (base_url or "https://api.openai.com/v1").rstrip("/")
+        self._headers = {"Authorization": f"Bearer {api_key or ''}", "Content-Type": "application/json"}
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        # `read` bounds the gap between streamed chunks, not the whole completion
+        self._timeout = httpx.Timeout(timeout, connect=10.0)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, headers=self._headers, limits=self._limits, timeout=self._timeout
+            )
+        return self._client
+
+    def payload(self, messages: List[ChatMessage], max_tokens: Optional[int] = None) -> dict:
+        body = {
+            "model": self.model,
+            "messages": [{"role": message.role, "content": message.content} for message in messages],
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        if self.temperature is not None:
+            body["temperature"] = self.temperature
+        if max_tokens:
+            body["max_tokens"] = max_tokens
+        return body
+
+    async def astream(self, messages: List[ChatMessage], max_tokens: Optional[int] = None) -> AsyncIterator[ChatChunk]:
+        body = json.dumps(self.payload(messages, max_tokens))
+        attempt = 0
+        while True:
+            try:
+                async with self.client.stream("POST", "/chat/completions", content=body) as response:
+                    if response.status_code >= 400:
+                        raise await _http_error(response)
+                    # Committed to this response: errors from here on propagate
+                    attempt = self.max_retries
+                    async for chunk in _parse_events(response):
+                        yield chunk
+                    return
+            except (BackendHTTPError, httpx.TransportError) as e:
+                status = getattr(e, "status_code", None)
+                if attempt >= self.max_retries or (status is not None and status not in RETRY_STATUS):
+                    raise
+                attempt += 1
+                delay = getattr(e, "retry_after", None) or 0.5 * 2 ** (attempt - 1)
+                await asyncio.sleep(min(delay, MAX_RETRY_DELAY) * (0.75 + random.random() / 2))
+
+    async def warm_up(self) -> None:
+        """Open a pooled connection (DNS, TCP and TLS) before the first real request."""
+        await self.client.get("/models")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async def _http_error(response: httpx.Response) -> BackendHTTPError:
+    text = (await response.aread()).decode("utf-8", "replace")
+    try:
+        message = json.loads(text)["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        message = text[:200]
+    retry_after = response.headers.get("retry-after")
+    try:
+        retry_after = float(retry_after) if retry_after else None
+    except ValueError:
+        retry_after = None
+    return BackendHTTPError(response.status_code, message, retry_after)
+
+
+async def _parse_events(response: httpx.Response) -> AsyncIterator[ChatChunk]:
+    """Server-sent `data:` events of a streamed completion -> chunks."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        event = json.loads(data)
+        if "error" in event:
+            raise BackendHTTPError(500, str(event["error"].get("message", event["error"])))
+        usage = usage_metadata(event["usage"]) if event.get("usage") else None
+        for choice in event.get("choices") or []:
+            delta = choice.get("delta") or {}
+            metadata = {"finish_reason": choice["finish_reason"]} if choice.get("finish_reason") else {}
+            yield ChatChunk(delta.get("content") or "", usage, metadata)
+            usage = None
+        if usage:
+            yield ChatChunk("", usage, {"model_name": event.get("model")})
+
+
+class LangChainBackend:
+    """`ChatOpenAI` behind the backend interface; langchain_openai is imported on first use."""
+
+    def __init__(self, model: str, api_key: Optional[str], base_url: Optional[str] = None,
+                 temperature: Optional[float] = None, max_retries: int = 2, **_):
+        self._settings: Dict[str, object] = {
+            "model": model, "api_key": api_key, "base_url": base_url, "temperature": temperature,
+            "max_retries": max_retries, "stream_usage": True,
+        }
+        self._llm = None
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from langchain_openai import ChatOpenAI
+            self._llm = ChatOpenAI(**self._settings)
+        return self._llm
+
+    async def astream(self, messages: List[ChatMessage], **kwargs) -> AsyncIterator[ChatChunk]:
+        async for chunk in self.llm.astream([(message.role, message.content) for message in messages], **kwargs):
+            yield ChatChunk(chunk.content, chunk.usage_metadata, dict(chunk.response_metadata or {}))
+
+    async def warm_up(self) -> None:
+        self.llm
+
+    async def aclose(self) -> None:
+        pass
+
+
+BACKENDS = {"http": OpenAICompatibleBackend, "langchain": LangChainBackend}
+
+
+def create_backend(kind: str, **settings) -> GenerationBackend:
+    """Backend `kind` ('http' or 'langchain') configured with model, api_key, base_url, ..."""
+    try:
+        return BACKENDS[kind](**settings)
+    except KeyError:
+        raise ValueError(f"Unknown GENERATION_BACKEND '{kind}'. Use one of: {', '.join(BACKENDS)}")
@@ -0,0 +1,122 @@
+"""
+Generation Backend Overhead Benchmark
+Measures what the API costs on top of the LLM itself: process cold start (`import api`)
+and per-call client overhead of `api.stream_llm` against the stub server answering
+instantly, so nearly all of the measured time is client-side.
+
+Usage:
+    python benchmarks/backend_overhead.py --imports 5 --calls 300
+    GENERATION_BACKEND=langchain python benchmarks/backend_overhead.py   # compare backends
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from loadtest import free_port, store_environment, wait_until_ready
+
+
+def stub_environment(stub_port: int, workdir: str) -> dict:
+    env = dict(os.environ)
+    env.update(store_environment(workdir))
+    env.update({
+        "OPENAI_API_KEY": "stub-key",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "JOB_WORKERS": "0",
+    })
+    return env
+
+
+def measure_imports(env: dict, runs: int) -> dict:
+    """Wall-clock seconds of `python -c "import api"` in fresh processes."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import api"], cwd=ROOT, env=env, check=True)
+        timings.append(time.perf_counter() - started)
+    baseline = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], cwd=ROOT, env=env, check=True)
+        baseline.append(time.perf_counter() - started)
+    return {
+        "import_api_seconds": round(statistics.median(timings), 3),
+        "interpreter_seconds": round(statistics.median(baseline), 3),
+    }
+
+
+async def measure_calls(calls: int, concurrency: int) -> dict:
+    """Latency and CPU time per streamed call, after a warm-up call."""
+    import api
+
+    messages = api.draft_messages({"system_prompt": "You draft legal documents.", "user_prompt": "Draft a short clause."})
+
+    async def call():
+        started = time.perf_counter()
+        async for _ in api.stream_llm(messages):
+            pass
+        return time.perf_counter() - started
+
+    await call()
+    gate = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with gate:
+            return await call()
+
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    latencies = await asyncio.gather(*[limited() for _ in range(calls)])
+    cpu, wall = time.process_time() - cpu_started, time.perf_counter() - wall_started
+    latencies = sorted(latencies)
+    return {
+        "calls": calls,
+        "concurrency": concurrency,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+        "cpu_ms_per_call": round(cpu / calls * 1000, 3),
+        "calls_per_second": round(calls / wall, 1),
+    }
+
+
+def main(args):
+    stub_port = free_port()
+    workdir = tempfile.mkdtemp(prefix="legal-drafts-backend-")
+    stub = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "benchmarks", "stub_openai.py"), "--port", str(stub_port),
+        "--ttft", "0", "--tokens-per-second", "1000000", "--completion-tokens", str(args.completion_tokens),
+    ], cwd=ROOT)
+    try:
+        wait_until_ready(f"http://127.0.0.1:{stub_port}/health", stub)
+        env = stub_environment(stub_port, workdir)
+        results = {"backend": os.getenv("GENERATION_BACKEND", "default")}
+        results.update(measure_imports(env, args.imports))
+        os.environ.update(env)
+        os.chdir(ROOT)
+        results.update(asyncio.run(measure_calls(args.calls, args.concurrency)))
+        print(json.dumps(results, indent=2))
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imports", type=int, default=5, help="Fresh-process `import api` runs (median reported)")
+    parser.add_argument("--calls", type=int, default=300, help="Streamed calls to time")
+    parser.add_argument("--concurrency", type=int, default=8, help="Calls in flight at once")
+    parser.add_argument("--completion-tokens", type=int, default=64, help="Tokens the stub streams per call")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    main(parser.parse_args())
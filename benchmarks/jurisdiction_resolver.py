@@ -0,0 +1,156 @@
+"""
+Jurisdiction Resolver Benchmark
+Accuracy and per-call cost of `jurisdictions.Gazetteer.resolve` against the substring
+chain it replaced, on the addresses of SAMPLE_INPUTS.md (labelled by their `country`
+field) plus a corpus of known-hard addresses: words containing "uk"/"usa", street names
+that are place names, region codes next to postcodes and colliding ISO codes. Also times
+both as the gazetteer grows by thousands of synthetic places.
+
+Usage:
+    python benchmarks/jurisdiction_resolver.py --iterations 20000
+    python benchmarks/jurisdiction_resolver.py --gazetteer extra_places.json --verbose
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from jurisdictions import DEFAULT_JURISDICTION, GAZETTEER, Gazetteer, address_text, load_gazetteer
+
+# (registered_address, expected jurisdiction)
+HARD_CASES = [
+    ("12 Duke Street, Bukit Timah, Singapore 259772", "Singapore"),
+    ("Pusa Road, Karol Bagh, New Delhi 110005", "India"),
+    ("Plot 7, Sukhumvit Tower, Hyderabad 500081", "India"),
+    ("Unit 5, Usaka Plaza, Dubai", "UAE"),
+    ("Cambridge, MA 02139", "USA"),
+    ("1 Main Street, Dublin, Ohio 43017", "USA"),
+    ("200 Victoria Street, London SW1E 5NE", "UK"),
+    ("789 London Street, Toronto, ON M5V 2T6", "Canada"),
+    ("Level 3, 1 Martin Place, Sydney NSW 2000", "Australia"),
+    ("Herengracht 182, 1016 BR Amsterdam", "Netherlands"),
+    ("Maximilianstraße 5, 80539 München, Germany", "Germany"),
+    ("1209 Orange Street, Wilmington, DE 19801", "USA"),
+    ("Hyd, IN", "India"),
+    ({"line": "Plot 4", "city": "Hyd", "state": "Telangana", "country": "in"}, "India"),
+    ({"line": "1 Infinite Loop", "city": "Cupertino", "state": "CA", "postal_code": "95014", "country": "US"}, "USA"),
+    ("3 Rue de Rivoli, 75001 Paris, France", "France"),
+    ("Grand Canal Dock, Dublin 2, Ireland", "Ireland"),
+    ("5 Bukit Street, Lagos", DEFAULT_JURISDICTION),
+    ("123 Main Street, City, Country 12345", DEFAULT_JURISDICTION),
+]
+
+
+def legacy_infer(address) -> str:
+    """The substring chain that lived in api.prepare_draft before the gazetteer."""
+    address_str = str(address_text(address)).lower()
+    if "india" in address_str or "bangalore" in address_str or "mumbai" in address_str or "delhi" in address_str:
+        return "India"
+    elif "usa" in address_str or "united states" in address_str or "california" in address_str or "new york" in address_str:
+        return "USA"
+    elif "uk" in address_str or "united kingdom" in address_str or "london" in address_str:
+        return "UK"
+    elif "netherlands" in address_str or "amsterdam" in address_str:
+        return "Netherlands"
+    return DEFAULT_JURISDICTION
+
+
+def sample_corpus(path: str):
+    """(registered_address, country) of every SAMPLE_INPUTS.md example that states its country."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    cases = []
+    for block in re.findall(r"```json\n(.*?)```", text, re.S):
+        try:
+            example = json.loads(block)
+        except ValueError:
+            continue
+        items = example.get("requests") or [example.get("company") or example]
+        for item in items:
+            if item.get("registered_address") and item.get("country"):
+                cases.append((item["registered_address"], item["country"]))
+    return cases
+
+
+def accuracy(corpus, resolve, verbose: bool) -> float:
+    correct = 0
+    for address, expected in corpus:
+        got = resolve(address)
+        correct += got == expected
+        if verbose and got != expected:
+            print(f"  miss: {address!r} -> {got} (expected {expected})")
+    return round(correct / len(corpus), 3) if corpus else 0.0
+
+
+def per_call_us(corpus, resolve, iterations: int) -> float:
+    addresses = [address for address, _ in corpus]
+    started = time.perf_counter()
+    for i in range(iterations):
+        resolve(addresses[i % len(addresses)])
+    return round((time.perf_counter() - started) / iterations * 1e6, 2)
+
+
+def scaling(corpus, sizes, iterations: int) -> dict:
+    """Per-call cost as the gazetteer grows by `size` synthetic cities, for both approaches."""
+    results = {}
+    for size in sizes:
+        places = [f"placeville {i:05d}" for i in range(size)]
+        data = dict(GAZETTEER, Elsewhere={"names": [], "codes": [], "regions": [], "cities": places})
+        gazetteer = Gazetteer(data)
+
+        def chain(address):
+            # The substring chain extended the way it would have grown: one more `in` per place
+            address_str = address_text(address).lower()
+            for place in places:
+                if place in address_str:
+                    return "Elsewhere"
+            return legacy_infer(address)
+
+        results[str(size)] = {
+            "legacy_us_per_call": per_call_us(corpus, chain, max(100, iterations // max(1, size // 100))),
+            "resolver_us_per_call": per_call_us(corpus, lambda address: gazetteer.resolve(None, address).country, iterations),
+        }
+    return results
+
+
+def main(args):
+    gazetteer = load_gazetteer(args.gazetteer)
+    resolver = lambda address: gazetteer.resolve(None, address).country
+    corpora = {"sample_inputs": sample_corpus(os.path.join(ROOT, "SAMPLE_INPUTS.md")), "hard_cases": HARD_CASES}
+
+    results = {}
+    for name, corpus in corpora.items():
+        if args.verbose:
+            print(f"{name} (resolver):")
+        results[name] = {
+            "cases": len(corpus),
+            "legacy_accuracy": accuracy(corpus, legacy_infer, False),
+            "resolver_accuracy": accuracy(corpus, resolver, args.verbose),
+        }
+    everything = corpora["sample_inputs"] + corpora["hard_cases"]
+    results["legacy_us_per_call"] = per_call_us(everything, legacy_infer, args.iterations)
+    results["resolver_us_per_call"] = per_call_us(everything, resolver, args.iterations)
+    results["extra_places"] = scaling(everything, args.scale, args.iterations)
+    started = time.perf_counter()
+    load_gazetteer(args.gazetteer)
+    results["compile_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000, help="Resolutions timed per implementation")
+    parser.add_argument("--scale", type=int, nargs="*", default=[0, 1000, 10000], help="Synthetic places added to the gazetteer for the scaling runs")
+    parser.add_argument("--gazetteer", help="JSON file extending the built-in gazetteer")
+    parser.add_argument("--verbose", action="store_true", help="Print each address the resolver gets wrong")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    main(parser.parse_args())
@@ -0,0 +1,231 @@
+"""
+Load Test & Benchmark Harness
+Starts the stub OpenAI-compatible server and the API (`uvicorn api:app`) pointed at it,
+replays the request payloads from SAMPLE_INPUTS.md against /api/generate-legal-draft at
+each concurrency level, and reports latency percentiles, throughput and event-loop
+blocking time (from the API's own /metrics). No OpenAI calls are made.
+
+Usage:
+    python benchmarks/loadtest.py --levels 1,4,16 --requests 32 --ttft 0.5 --tokens-per-second 200
+    python benchmarks/loadtest.py --json results.json      # machine-readable results for regression tracking
+    python benchmarks/loadtest.py --stubs 2 --stall-rate 0.05 --api-env HEDGE_AFTER_SECONDS=2   # hedging / failover
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import List
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_openai import add_stub_arguments
+
+_JSON_BLOCK = re.compile(r'```json\n(.*?)\n```', re.DOTALL)
+
+
+def load_sample_payloads(path: str = os.path.join(ROOT, "SAMPLE_INPUTS.md")) -> List[dict]:
+    """Every complete JSON request body in the SAMPLE_INPUTS.md code blocks."""
+    with open(path, encoding="utf-8") as f:
+        blocks = _JSON_BLOCK.findall(f.read())
+    payloads = []
+    for block in blocks:
+        try:
+            payload = json.loads(block)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(payload, dict) and "template_type" in payload:
+            payloads.append(payload)
+    return payloads
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process serving {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def start_stub(args, port: int, seed: int) -> subprocess.Popen:
+    command = [
+        sys.executable, os.path.join(ROOT, "benchmarks", "stub_openai.py"), "--port", str(port),
+        "--ttft", str(args.ttft), "--tokens-per-second", str(args.tokens_per_second),
+        "--completion-tokens", str(args.completion_tokens), "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate), "--seed", str(seed),
+        "--stall-rate", str(args.stall_rate), "--stall-seconds", str(args.stall_seconds),
+    ]
+    return subprocess.Popen(command, cwd=ROOT)
+
+
+def store_environment(workdir: str) -> dict:
+    """
+    Every SQLite file the API writes, placed in `workdir`: runs start cold and stub output
+    never reaches the stores in the repository root. The draft cache's disk tier and the
+    shared state stay off unless the environment turned them on.
+    """
+    env = {
+        "JOB_STORE_PATH": os.path.join(workdir, "jobs.db"),
+        "DRAFT_STORE_PATH": os.path.join(workdir, "drafts.db"),
+        "CLAUSE_LIBRARY_PATH": os.path.join(workdir, "clause_library.db"),
+    }
+    if os.getenv("DRAFT_CACHE_SQLITE_PATH"):
+        env["DRAFT_CACHE_SQLITE_PATH"] = os.path.join(workdir, "draft_cache.db")
+    if os.getenv("SHARED_STATE_PATH"):
+        env["SHARED_STATE_PATH"] = os.path.join(workdir, "shared_state.db")
+    return env
+
+
+def start_api(args, port: int, stub_ports: List[int], workdir: str) -> subprocess.Popen:
+    """The API pointed at the first stub, with any further stubs as fallback endpoints."""
+    env = dict(os.environ)
+    env.update(store_environment(workdir))
+    env.update({
+        "OPENAI_API_KEY": "stub-key",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_ports[0]}/v1",
+        "LLM_FALLBACK_ENDPOINTS": ",".join(f"http://127.0.0.1:{port}/v1" for port in stub_ports[1:]),
+        "JOB_WORKERS": "0",
+    })
+    for assignment in args.api_env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+    command = [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--workers", str(args.workers)]
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def scrape_metric(metrics_text: str, name: str) -> float:
+    """Sum every sample of `name` in a Prometheus text payload."""
+    total = 0.0
+    for line in metrics_text.splitlines():
+        if line.startswith(name + " ") or line.startswith(name + "{"):
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+async def run_level(client: httpx.AsyncClient, payloads: List[dict], concurrency: int, total: int, unique: bool) -> dict:
+    """Send `total` requests with at most `concurrency` in flight, cycling through `payloads`."""
+    latencies, statuses = [], {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            payload = dict(payloads[next_index % len(payloads)])
+            next_index += 1
+            if unique:
+                # Defeat request coalescing so every request costs a generation
+                payload["corporate_context"] = f"{payload.get('corporate_context') or 'General Business'} (run {uuid.uuid4().hex[:8]})"
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/generate-legal-draft", params={"no_cache": "true"}, json=payload)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    before = (await client.get("/metrics")).text
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    after = (await client.get("/metrics")).text
+
+    blocked = "legal_draft_event_loop_blocked_seconds_total"
+    delta = lambda name: scrape_metric(after, name) - scrape_metric(before, name)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 3),
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "loop_blocked_seconds": round(delta(blocked), 4),
+        "hedges": int(delta("legal_draft_llm_hedges_total")),
+        "endpoint_failures": int(delta("legal_draft_llm_endpoint_failures_total")),
+        "statuses": {str(k): v for k, v in statuses.items()},
+    }
+
+
+async def main(args):
+    payloads = load_sample_payloads()
+    stub_ports, api_port = [free_port() for _ in range(args.stubs)], free_port()
+    workdir = tempfile.mkdtemp(prefix="legal-drafts-bench-")
+    # Each stub gets its own seed, so injected errors and stalls differ between endpoints
+    stubs = [start_stub(args, port, args.seed + i) for i, port in enumerate(stub_ports)]
+    api = None
+    try:
+        for port, stub in zip(stub_ports, stubs):
+            wait_until_ready(f"http://127.0.0.1:{port}/health", stub)
+        api = start_api(args, api_port, stub_ports, workdir)
+        wait_until_ready(f"http://127.0.0.1:{api_port}/health", api)
+
+        print(f"{len(payloads)} payloads from SAMPLE_INPUTS.md | {args.stubs} stub(s) ttft={args.ttft}s "
+              f"rate={args.tokens_per_second} tok/s tokens={args.completion_tokens} | api workers={args.workers}")
+        print(f"{'conc':>5} {'reqs':>5} {'secs':>7} {'req/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'loop blocked':>13} {'hedges':>6} {'fails':>5}  statuses")
+        results = []
+        limits = httpx.Limits(max_connections=max(args.levels) + 4)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{api_port}", timeout=args.timeout, limits=limits) as client:
+            for level in args.levels:
+                result = await run_level(client, payloads, level, args.requests or level * 4, not args.allow_coalescing)
+                results.append(result)
+                print(f"{result['concurrency']:>5} {result['requests']:>5} {result['seconds']:>7.2f} {result['rps']:>7.2f} "
+                      f"{result['p50']:>7.2f} {result['p95']:>7.2f} {result['p99']:>7.2f} {result['loop_blocked_seconds']:>12.3f}s "
+                      f"{result['hedges']:>6} {result['endpoint_failures']:>5}  {result['statuses']}")
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"config": {k: v for k, v in vars(args).items() if k != "json"}, "results": results}, f, indent=2)
+            print(f"Results written to {args.json}")
+    finally:
+        for process in [api] + stubs:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=0, help="Requests per level (default: 4 x concurrency)")
+    parser.add_argument("--stubs", type=int, default=1, help="Stub servers; the API uses the first and fails over / hedges to the rest")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the API")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request client timeout in seconds")
+    parser.add_argument("--allow-coalescing", action="store_true", help="Send payloads unchanged so identical in-flight requests may coalesce")
+    parser.add_argument("--api-env", action="append", default=[], metavar="KEY=VALUE", help="Extra environment for the API process (repeatable)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    args.levels = [int(x) for x in args.levels.split(",")]
+    asyncio.run(main(args))
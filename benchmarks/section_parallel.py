@@ -0,0 +1,118 @@
+"""
+Benchmark: Section-Parallel vs Single-Call Generation
+Drafts every template both ways against a stub LLM whose latency follows a real
+model's shape (time-to-first-token plus output tokens / token rate) and compares
+wall-clock time. No OpenAI calls are made; the stores the API writes (drafts, clause
+library, jobs) live in a temporary directory for the run.
+
+Usage:
+    python benchmarks/section_parallel.py --ttft 0.6 --tokens-per-second 60 --section-tokens 350
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import AsyncIterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import store_environment
+
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+# Set before `api` is imported, which opens the stores
+os.environ.update(store_environment(tempfile.mkdtemp(prefix="legal-drafts-sections-")))
+os.environ["JOB_WORKERS"] = "0"
+
+import api
+from backends import ChatChunk, ChatMessage
+from sections import TEMPLATE_STRUCTURES, parse_required_structure
+
+SAMPLE_COMPANY = {
+    "company_name": "TechCorp India Pvt Ltd",
+    "registration_number": "U72900KA2020PTC123456",
+    "registered_address": "123 Business Park, Whitefield, Bangalore, Karnataka 560066",
+    "directors": ["John Doe"],
+    "country": "India",
+    "corporate_context": "SaaS AI Platform"
+}
+
+BRIEF_TOKENS = 250
+_HEADING = re.compile(r'Start with exactly this header line: `([^`]+)`')
+_CLAUSE_HEADINGS = re.compile(r'Start each entry with exactly its header line: (.+)')
+
+
+class TokenRateStubBackend:
+    """
+    Generation backend (backends.GenerationBackend) whose latency is time-to-first-token
+    plus output length at a fixed token rate.
+    """
+
+    def __init__(self, ttft: float = 0.6, tokens_per_second: float = 60.0, section_tokens: int = 350):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.section_tokens = section_tokens
+
+    def _plan(self, messages: List[ChatMessage]):
+        task = messages[-1].content
+        clause_headings = _CLAUSE_HEADINGS.search(task)
+        if clause_headings:
+            headings = re.findall(r'`([^`]+)`', clause_headings.group(1))
+            return self.section_tokens * len(headings), "\n\n".join(h + "\n\nClause text." for h in headings)
+        if "DRAFTING BRIEF (at most" in task:
+            return BRIEF_TOKENS, "- Parties: the Company and the Counterparty"
+        heading = _HEADING.search(task)
+        if heading:
+            return self.section_tokens, heading.group(1) + "\n\nSection text."
+        # Whole document in one call: every structure entry except the title
+        sections = max(1, len(parse_required_structure(messages[0].content)) - 1)
+        return self.section_tokens * sections, "## DOCUMENT\n\nFull text."
+
+    async def astream(self, messages: List[ChatMessage], max_tokens: Optional[int] = None) -> AsyncIterator[ChatChunk]:
+        tokens, text = self._plan(messages)
+        await asyncio.sleep(self.ttft + tokens / self.tokens_per_second)
+        yield ChatChunk(text, {"input_tokens": 0, "output_tokens": tokens, "total_tokens": tokens},
+                        {"finish_reason": "stop"})
+
+    async def warm_up(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+def install_stub(stub):
+    """Serve every LLM call from `stub`: generation streams through the endpoint pool's backends."""
+    for endpoint in api.llm_pool.endpoints:
+        endpoint.backend = stub
+
+
+async def time_draft(template_type: str, mode: str) -> float:
+    request = api.LegalRequest(**SAMPLE_COMPANY, template_type=template_type)
+    started = time.perf_counter()
+    await api.produce_draft(request, no_cache=True, mode=mode)
+    return time.perf_counter() - started
+
+
+async def main(ttft: float, tokens_per_second: float, section_tokens: int):
+    install_stub(TokenRateStubBackend(ttft=ttft, tokens_per_second=tokens_per_second, section_tokens=section_tokens))
+    print(f"stub: ttft={ttft}s  rate={tokens_per_second} tok/s  {section_tokens} tokens/section  "
+          f"section parallelism={api.SECTION_PARALLELISM}")
+    print(f"{'template':>12} {'sections':>8} {'single (s)':>11} {'sections (s)':>13} {'speedup':>8}")
+    for template_type, items in TEMPLATE_STRUCTURES.items():
+        single = await time_draft(template_type, "single")
+        sectioned = await time_draft(template_type, "sections")
+        print(f"{template_type:>12} {len(items):>8} {single:>11.2f} {sectioned:>13.2f} {single / sectioned:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ttft", type=float, default=0.6, help="Stub time-to-first-token in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="Stub output token rate")
+    parser.add_argument("--section-tokens", type=int, default=350, help="Output tokens per document section")
+    args = parser.parse_args()
+    asyncio.run(main(args.ttft, args.tokens_per_second, args.section_tokens))
@@ -0,0 +1,149 @@
+"""
+Stub OpenAI-Compatible Server
+Serves POST /v1/chat/completions (streaming and non-streaming) with synthetic legal text
+at a configurable time-to-first-token and token rate, with optional error and stall injection.
+Point the API at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python benchmarks/stub_openai.py --port 9100 --ttft 0.5 --tokens-per-second 80 \
+        --completion-tokens 1500 --error-rate 0.02 --rate-limit-rate 0.01 --stall-rate 0.05 --stall-seconds 10
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+WORDS = ("the", "Party", "shall", "in", "accordance", "with", "this", "Agreement", "and", "any",
+         "Confidential", "Information", "pursuant", "to", "applicable", "law", "notwithstanding")
+TOKENS_PER_CHUNK = 8
+
+
+class StubConfig:
+    def __init__(self, ttft: float = 0.5, tokens_per_second: float = 80.0, completion_tokens: int = 1500,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0,
+                 stall_rate: float = 0.0, stall_seconds: float = 10.0):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.random = random.Random(seed)
+        self.requests = 0
+
+
+def _text(tokens: int, offset: int = 0) -> str:
+    """Deterministic filler, one word per token, with a markdown header every 120 tokens."""
+    out = []
+    for i in range(offset, offset + tokens):
+        if i % 120 == 0:
+            out.append(f"\n\n## SECTION {i // 120 + 1}: CLAUSE\n\n")
+        out.append(WORDS[i % len(WORDS)] + " ")
+    return "".join(out)
+
+
+def _prompt_tokens(body: dict) -> int:
+    return sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+
+
+def create_app(config: StubConfig) -> Starlette:
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        config.requests += 1
+
+        roll = config.random.random()
+        if roll < config.rate_limit_rate:
+            return JSONResponse({"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                                status_code=429, headers={"retry-after": "1"})
+        if roll < config.rate_limit_rate + config.error_rate:
+            return JSONResponse({"error": {"message": "Injected server error (stub)", "type": "server_error"}}, status_code=500)
+
+        model = body.get("model", "stub")
+        limit = body.get("max_completion_tokens") or body.get("max_tokens")
+        tokens = config.completion_tokens if not limit else min(config.completion_tokens, int(limit))
+        finish_reason = "length" if tokens < config.completion_tokens else "stop"
+        prompt_tokens = _prompt_tokens(body)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": tokens,
+            "total_tokens": prompt_tokens + tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        # A stalled request (slow upstream) waits this much longer for its first token
+        stall = config.stall_seconds if config.random.random() < config.stall_rate else 0.0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.ttft + stall + tokens / config.tokens_per_second)
+            return JSONResponse({
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": _text(tokens)}, "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: dict, finish=None, **extra) -> str:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            await asyncio.sleep(config.ttft + stall)
+            yield chunk({"role": "assistant", "content": ""})
+            sent = 0
+            while sent < tokens:
+                batch = min(TOKENS_PER_CHUNK, tokens - sent)
+                await asyncio.sleep(batch / config.tokens_per_second)
+                yield chunk({"content": _text(batch, sent)})
+                sent += batch
+            yield chunk({}, finish_reason)
+            if include_usage:
+                payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                           "model": model, "choices": [], "usage": usage}
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def health(request: Request):
+        return JSONResponse({"status": "ok", "requests": config.requests})
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/health", health),
+    ])
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--ttft", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Completion token rate")
+    parser.add_argument("--completion-tokens", type=int, default=1500, help="Tokens per completion (capped by max_tokens)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of requests whose first token is delayed by --stall-seconds")
+    parser.add_argument("--stall-seconds", type=float, default=10.0, help="Extra time to first token of a stalled request")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for error and stall injection")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    config = StubConfig(args.ttft, args.tokens_per_second, args.completion_tokens, args.error_rate, args.rate_limit_rate,
+                        args.seed, args.stall_rate, args.stall_seconds)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,147 @@
+"""
+Worker Scaling Benchmark
+Throughput of the API as the number of worker processes grows: for each count, starts
+`gunicorn api:app -c gunicorn.conf.py` (or `uvicorn --workers`) with a fresh shared-state
+file against one fast stub LLM, drives it at a fixed concurrency, and reports req/s and
+latency percentiles. Also checks the shared state: /metrics merged over the workers must
+count every request sent, and /health must list every worker.
+
+The stub answers quickly by default so the API's own CPU work (prompt assembly, cleanup,
+serialization) is what more workers spread out; gains are bounded by the host's cores.
+
+Usage:
+    python benchmarks/worker_scaling.py --workers 1,2,4 --concurrency 32 --requests 256
+    python benchmarks/worker_scaling.py --server uvicorn --api-env PROVIDER_REQUESTS_PER_MINUTE=600
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import free_port, load_sample_payloads, run_level, scrape_metric, start_stub, store_environment, wait_until_ready
+from stub_openai import add_stub_arguments
+
+
+# Other workers' metrics reach /metrics with their next heartbeat (SHARED_STATE_INTERVAL_SECONDS)
+HEARTBEAT_SETTLE_SECONDS = 2.5
+
+
+def start_server(args, workers: int, port: int, stub_port: int, workdir: str) -> subprocess.Popen:
+    """The API with `workers` processes, every store and the shared state in `workdir`."""
+    env = dict(os.environ)
+    env.update(store_environment(workdir))
+    env.update({
+        "OPENAI_API_KEY": "stub-key",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "SHARED_STATE_PATH": os.path.join(workdir, "shared_state.db"),
+        "JOB_WORKERS": "0",
+        "WEB_CONCURRENCY": str(workers),
+        "API_HOST": "127.0.0.1",
+        "PORT": str(port),
+    })
+    for assignment in args.api_env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+    if args.server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "api:app", "-c", "gunicorn.conf.py", "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+                   "--log-level", "warning", "--workers", str(workers)]
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+async def wait_for_workers(client: httpx.AsyncClient, workers: int, timeout: float = 30.0) -> int:
+    """Live workers in /health once all `workers` have sent a heartbeat (or the timeout passes)."""
+    deadline = time.time() + timeout
+    count = 0
+    while time.time() < deadline:
+        count = (await client.get("/health")).json().get("workers", {}).get("count", 0)
+        if count >= workers:
+            break
+        await asyncio.sleep(0.2)
+    return count
+
+
+async def measure(args, payloads, workers: int, stub_port: int) -> dict:
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="legal-drafts-workers-")
+    server = start_server(args, workers, port, stub_port, workdir)
+    try:
+        wait_until_ready(f"http://127.0.0.1:{port}/health", server, timeout=60.0)
+        limits = httpx.Limits(max_connections=args.concurrency + 4)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+            live = await wait_for_workers(client, workers)
+            # Warm every worker's connections and caches before timing
+            await run_level(client, payloads, args.concurrency, args.concurrency * 2, True)
+            await asyncio.sleep(HEARTBEAT_SETTLE_SECONDS)
+            before = (await client.get("/metrics")).text
+            result = await run_level(client, payloads, args.concurrency, args.requests, True)
+            await asyncio.sleep(HEARTBEAT_SETTLE_SECONDS)
+            after = (await client.get("/metrics")).text
+        counted = scrape_metric(after, "legal_draft_requests_total") - scrape_metric(before, "legal_draft_requests_total")
+        return {
+            "workers": workers,
+            "live_workers": live,
+            "rps": result["rps"],
+            "p50": result["p50"],
+            "p99": result["p99"],
+            "requests": result["requests"],
+            # Counted over every worker's metrics (the /metrics scrapes themselves are not draft requests)
+            "requests_counted": int(counted),
+            "statuses": result["statuses"],
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+async def main(args):
+    payloads = load_sample_payloads()
+    stub_port = free_port()
+    stub = start_stub(args, stub_port, args.seed)
+    try:
+        wait_until_ready(f"http://127.0.0.1:{stub_port}/health", stub)
+        print(f"{len(payloads)} payloads | {args.server} | stub ttft={args.ttft}s rate={args.tokens_per_second} tok/s "
+              f"tokens={args.completion_tokens} | concurrency={args.concurrency} requests={args.requests} | {os.cpu_count()} CPU(s)")
+        print(f"{'workers':>7} {'live':>5} {'req/s':>8} {'x1':>6} {'p50':>7} {'p99':>7} {'counted':>8}  statuses")
+        results = []
+        for workers in args.workers:
+            result = await measure(args, payloads, workers, stub_port)
+            result["speedup"] = round(result["rps"] / results[0]["rps"], 2) if results else 1.0
+            results.append(result)
+            print(f"{result['workers']:>7} {result['live_workers']:>5} {result['rps']:>8.2f} {result['speedup']:>6.2f} "
+                  f"{result['p50']:>7.3f} {result['p99']:>7.3f} {result['requests_counted']:>4}/{result['requests']:<4} {result['statuses']}")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"config": {k: v for k, v in vars(args).items() if k != "json"}, "results": results}, f, indent=2)
+            print(f"Results written to {args.json}")
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker process counts")
+    parser.add_argument("--server", choices=("gunicorn", "uvicorn"), default="gunicorn",
+                        help="gunicorn with preloaded uvicorn workers, or uvicorn --workers")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    parser.add_argument("--requests", type=int, default=256, help="Timed requests per worker count")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout in seconds")
+    parser.add_argument("--api-env", action="append", default=[], metavar="KEY=VALUE", help="Extra environment for the API (repeatable)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    add_stub_arguments(parser)
+    parser.set_defaults(ttft=0.02, tokens_per_second=100000.0, completion_tokens=800)
+    args = parser.parse_args()
+    args.workers = [int(x) for x in args.workers.split(",")]
+    asyncio.run(main(args))
@@ -0,0 +1,81 @@
+"""
+Client Disconnects & Request Deadlines
+Runs a request's generation as a task that is cancelled when the client disconnects or the
+request's deadline passes, so abandoned drafts stop consuming LLM tokens and generation slots.
+"""
+
+import asyncio
+from contextlib import suppress
+from typing import Awaitable, Optional
+
+from starlette.requests import Request
+
+from metrics import record_cancelled_request
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was ready."""
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before the response was ready."""
+
+    def __init__(self, timeout: float):
+        super().__init__(f"Request deadline of {timeout:g}s exceeded")
+        self.timeout = timeout
+
+
+def resolve_timeout(header_value: Optional[str], field_value: Optional[float], default: float) -> Optional[float]:
+    """
+    The request's deadline in seconds: the `X-Request-Timeout` header or the body field
+    (whichever is shorter), else the server default. None (or 0) means no deadline.
+    """
+    candidates = [v for v in (_seconds(header_value), field_value) if v and v > 0]
+    timeout = min(candidates) if candidates else default
+    return timeout if timeout and timeout > 0 else None
+
+
+def _seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+async def wait_for_disconnect(request: Request):
+    """Return once the ASGI server reports that the client disconnected."""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_cancellable(request: Request, work: Awaitable, timeout: Optional[float], endpoint: str):
+    """
+    Await `work`, cancelling it if the client disconnects or `timeout` seconds pass.
+
+    The request body must already have been read (FastAPI does so before calling the
+    endpoint), so the next ASGI message is the disconnect. Raises ClientDisconnected or
+    DeadlineExceeded after the work has been cancelled and has released its resources.
+    """
+    work_task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait({work_task, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work_task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if work_task in done:
+        return work_task.result()
+
+    work_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await work_task
+    if watcher in done and not watcher.cancelled():
+        record_cancelled_request(endpoint, "disconnect")
+        raise ClientDisconnected()
+    record_cancelled_request(endpoint, "deadline")
+    raise DeadlineExceeded(timeout)
@@ -0,0 +1,262 @@
+"""
+Boilerplate Clause Library
+The stable sections of each template (miscellaneous/boilerplate, general provisions,
+governing law) are drafted once per template, jurisdiction and business category, stored,
+and merged into later drafts, so the LLM only writes the bespoke sections.
+"""
+
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from backends import HumanMessage, SystemMessage
+from draft_cache import make_cache_key
+from markdown_cleaner import clean_markdown_output
+from sections import TEMPLATE_STRUCTURES, StructureItem
+from singleflight import SingleFlight
+
+# REQUIRED STRUCTURE entries whose text depends only on the jurisdiction and business category
+_LIBRARY_TITLE = re.compile(r'BOILERPLATE|MISCELLANEOUS|GENERAL PROVISIONS|GOVERNING LAW')
+
+CLAUSE_MARKER = "[[CLAUSE LIBRARY]]"
+
+# Business category of a corporate context, mirroring the CONTEXT ADAPTATION rules of CORE_LEGAL_BRAIN
+CONTEXT_CATEGORIES = (
+    ("tech", re.compile(r'\b(saas|software|tech\w*|platforms?|apps?|cloud|data|ai|fintech)\b')),
+    ("manufacturing", re.compile(r'\b(manufactur\w*|mfg|food|factory|production|suppl\w+|retail)\b')),
+    ("service", re.compile(r'\b(services?|consult\w*|agency|construction|logistics)\b')),
+)
+
+LIBRARY_ITEMS: Dict[str, List[StructureItem]] = {
+    template_type: [item for item in items if _LIBRARY_TITLE.search(item.title.upper())]
+    for template_type, items in TEMPLATE_STRUCTURES.items()
+}
+
+OMIT_INSTRUCTION = """**CLAUSE LIBRARY:** Do NOT write these entries of the REQUIRED STRUCTURE; they are inserted
+from the approved clause library:
+{titles}
+In their place output exactly one line containing `{marker}` (no header). Write every other entry
+in full, in order, with its numbering unchanged."""
+
+CLAUSE_INSTRUCTION = """**CLAUSE LIBRARY TASK:** Draft standard clauses that will be reused across many documents of
+this type for the same jurisdiction and business category.
+- <<Jurisdiction>>: {country}
+- Business category: {category}
+
+Write ONLY these entries of the REQUIRED STRUCTURE, in order:
+{items}
+
+- Start each entry with exactly its header line: {headings}
+- Between them, include Severability, Notices, Waiver, Entire Agreement and Force Majeure
+  (plus any jurisdiction-specific dispute resolution required above).
+- Refer to parties and details ONLY through references written verbatim, e.g. <<Company Name>>,
+  <<Registered Address>>, or generic terms such as "the Parties"; never invent names or addresses.
+- Full long-form legal text; no document title, preamble or signatures."""
+
+
+def context_category(context: Optional[str]) -> str:
+    """Coarse business category of a corporate context (tech, manufacturing, service or general)."""
+    text = (context or "").lower()
+    for category, pattern in CONTEXT_CATEGORIES:
+        if pattern.search(text):
+            return category
+    return "general"
+
+
+def has_library_sections(template_type: str) -> bool:
+    return bool(LIBRARY_ITEMS.get(template_type))
+
+
+def omit_instruction(template_type: str) -> str:
+    """User-prompt note telling the LLM to leave the library sections out (marker in their place)."""
+    titles = "\n".join(f"- {item.number}. {item.title}" for item in LIBRARY_ITEMS[template_type])
+    return OMIT_INSTRUCTION.format(titles=titles, marker=CLAUSE_MARKER)
+
+
+def is_complete_block(template_type: str, block: str) -> bool:
+    """Whether a generated clause block has a header line for every library entry of the template."""
+    lines = block.split("\n")
+    return all(any(_is_library_heading(line, [item]) for line in lines) for item in LIBRARY_ITEMS[template_type])
+
+
+def merge_clauses(content: str, template_type: str, clauses: str) -> str:
+    """
+    Insert the library `clauses` into an LLM draft written with `omit_instruction`.
+
+    Replaces the marker line (dropping any library header the LLM wrote above it). Without
+    a marker, the clauses go before the entry that follows the library sections (usually
+    SIGNATURES), or at the end of the document.
+    """
+    items = LIBRARY_ITEMS[template_type]
+    lines = content.split("\n")
+    marker_lines = [i for i, line in enumerate(lines) if CLAUSE_MARKER in line]
+    if marker_lines:
+        at = marker_lines[0]
+        start = at
+        while start > 0 and (not lines[start - 1].strip() or _is_library_heading(lines[start - 1], items)):
+            start -= 1
+        kept = [line for i, line in enumerate(lines[at + 1:], at + 1) if i not in marker_lines]
+        return "\n".join(lines[:start] + ["", clauses, ""] + kept)
+
+    structure = TEMPLATE_STRUCTURES[template_type]
+    following = [item for item in structure if item.number > items[-1].number and item not in items]
+    if following:
+        title = following[0].title.upper()
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped.startswith(("#", "**")) and title in stripped.upper():
+                return "\n".join(lines[:i] + [clauses, ""] + lines[i:])
+    return content.rstrip() + "\n\n" + clauses
+
+
+def _is_library_heading(line: str, items: List[StructureItem]) -> bool:
+    stripped = line.strip()
+    return stripped.startswith(("#", "**")) and any(item.title.upper() in stripped.upper() for item in items)
+
+
+def is_library_heading(template_type: str, heading: str) -> bool:
+    """Whether a draft's section header is one of the template's library sections."""
+    return _is_library_heading(heading, LIBRARY_ITEMS.get(template_type) or [])
+
+
+def prefilled_sections(template_type: str, clauses: str) -> Dict[int, str]:
+    """Section-parallel mode: the library text stands in for the first library entry, the rest are empty."""
+    items = LIBRARY_ITEMS[template_type]
+    return {item.number: (clauses if i == 0 else "") for i, item in enumerate(items)}
+
+
+class ClauseLibrary:
+    """
+    Generated clause blocks keyed by (template, jurisdiction, business category, version).
+
+    Blocks keep <<Field Name>> references for company-specific values; callers fill them
+    per request with `prompt_assembly.fill_references`. Held in memory and, with
+    `sqlite_path`, persisted across restarts. `version` should change with the model
+    settings and endpoints so blocks drafted elsewhere are not reused. Blocks expire after
+    `ttl_seconds` (0 = never); a generated block missing any library heading is not stored.
+    """
+
+    def __init__(self, sqlite_path: Optional[str] = None, version: str = "", ttl_seconds: float = 0):
+        self.sqlite_path = sqlite_path or None
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[str, float]] = {}  # key -> (text, created_at)
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._db = self._connect() if self.sqlite_path else None
+        self.hits = 0
+        self.generated = 0
+        self.rejected = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+        # WAL: several worker processes may read and write the library at once
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS clause_library ("
+            "key TEXT PRIMARY KEY, template_type TEXT NOT NULL, jurisdiction TEXT NOT NULL, "
+            "category TEXT NOT NULL, text TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        db.commit()
+        return db
+
+    def reconnect(self):
+        """Open a fresh connection (a connection must not be shared across fork)."""
+        self._lock = threading.Lock()
+        if self.sqlite_path:
+            self._db = self._connect()
+
+    def key(self, draft: dict, category: str) -> str:
+        return make_cache_key({
+            "template_type": draft["template_type"],
+            "jurisdiction": draft["country"].lower(),
+            "category": category,
+            "system_prompt": draft["system_prompt"],
+            "instruction": CLAUSE_INSTRUCTION,
+            "version": self.version,
+        })
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Blocking (SQLite tier): call it off the event loop."""
+        oldest = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT text, created_at FROM clause_library WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = self._entries[key] = (row[0], row[1])
+            if entry is None or entry[1] < oldest:
+                return None
+            return entry[0]
+
+    def store(self, key: str, draft: dict, category: str, text: str):
+        """Blocking (SQLite tier): call it off the event loop."""
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (text, now)
+            if self._db is not None:
+                if self.ttl_seconds:
+                    self._db.execute("DELETE FROM clause_library WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO clause_library (key, template_type, jurisdiction, category, text, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, draft["template_type"], draft["country"], category, text, now)
+                )
+                self._db.commit()
+
+    def clear(self):
+        """Drop every stored block (e.g. after a bad batch was generated)."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM clause_library")
+                self._db.commit()
+
+    async def get(self, draft: dict, complete: Callable[[list], Awaitable]) -> dict:
+        """
+        The clause block for a prepared draft, generating (once, coalesced) on first use.
+
+        `complete` takes a message list and returns the chat model's message. Returns
+        {"text": block with <<Field Name>> references, "generated": False on a library hit}.
+        """
+        category = context_category(draft["context"])
+        key = self.key(draft, category)
+        text = await asyncio.to_thread(self.lookup, key)
+        if text is not None:
+            self.hits += 1
+            return {"text": text, "generated": False}
+
+        async def generate() -> dict:
+            items = LIBRARY_ITEMS[draft["template_type"]]
+            prompt = CLAUSE_INSTRUCTION.format(
+                country=draft["country"],
+                category=category,
+                items="\n".join(item.text for item in items),
+                headings=", ".join(f"`{item.heading}`" for item in items)
+            )
+            message = await complete([SystemMessage(content=draft["system_prompt"]), HumanMessage(content=prompt)])
+            block = clean_markdown_output(message.content)
+            if not is_complete_block(draft["template_type"], block):
+                # Not reused: the caller falls back to drafting these sections itself
+                self.rejected += 1
+                return {"text": "", "generated": True}
+            await asyncio.to_thread(self.store, key, draft, category, block)
+            self.generated += 1
+            return {"text": block, "generated": True}
+
+        return await self._flights.run(key, generate)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "disk_tier": self.sqlite_path is not None,
+            "hits": self.hits,
+            "generated": self.generated,
+            "rejected": self.rejected,
+            "ttl_seconds": self.ttl_seconds,
+        }
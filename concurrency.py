@@ -0,0 +1,82 @@
+"""
+Generation Concurrency Control
+Caps how many LLM generations run at once in this process and how many may wait.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class QueueFullError(Exception):
+    """Raised when every generation slot is busy and the wait queue is full."""
+
+
+class GenerationLimiter:
+    """
+    Bounded concurrency gate for LLM calls.
+
+    Up to `max_concurrent` generations run at once; up to `max_queued` more wait
+    for a slot in FIFO order. Anything beyond that is rejected immediately so the
+    caller can answer 503 instead of piling up unbounded work.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.completed = 0
+
+    async def acquire(self):
+        """
+        Wait for a generation slot and return a callable that releases it.
+
+        The release callable is idempotent, so it can be wired to several cleanup
+        paths (e.g. a streaming generator's `finally` and a response background task).
+        """
+        if self.active >= self.max_concurrent and self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise QueueFullError(
+                f"{self.active} generations running and {self.waiting} queued"
+            )
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+        released = False
+
+        def release():
+            nonlocal released
+            if released:
+                return
+            released = True
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+        return release
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one generation slot for the duration of the `async with` block."""
+        release = await self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
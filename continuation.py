@@ -0,0 +1,146 @@
+"""
+Length-Limit Continuation
+Completions that stop on the output-token limit (finish_reason=length) are resumed from
+the cut point with follow-up calls and stitched back together without repeated text.
+"""
+
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+from backends import AIMessage, HumanMessage
+
+CONTINUE_INSTRUCTION = """Your previous answer was cut off by the output limit. Continue EXACTLY where it stopped,
+mid-sentence if necessary. Do not repeat any text already written, do not restart the section,
+and do not add any preamble or commentary."""
+
+# How far back to look for text the continuation repeated from the end of the previous part
+OVERLAP_WINDOW = 400
+# Shortest repeated run treated as overlap rather than a coincidence
+MIN_OVERLAP = 12
+
+
+def finish_reason(message) -> Optional[str]:
+    """The provider's finish reason of a (merged) chat message, e.g. 'stop' or 'length'."""
+    metadata = getattr(message, "response_metadata", None) or {}
+    return metadata.get("finish_reason")
+
+
+def continuation_messages(messages: list, partial: str) -> list:
+    """The original messages followed by the text so far and the instruction to carry on."""
+    return list(messages) + [AIMessage(content=partial), HumanMessage(content=CONTINUE_INSTRUCTION)]
+
+
+def trim_overlap(previous: str, continuation: str) -> str:
+    """
+    Drop the start of `continuation` when it repeats the end of `previous`.
+
+    Models resuming a cut-off answer often restate the last few words or the last line;
+    the longest suffix of `previous` (within OVERLAP_WINDOW) that the continuation starts
+    with is removed.
+    """
+    tail = previous[-OVERLAP_WINDOW:]
+    stripped = continuation.lstrip()
+    for size in range(min(len(tail), len(stripped)), MIN_OVERLAP - 1, -1):
+        if stripped.startswith(tail[-size:]):
+            return stripped[size:]
+    return continuation
+
+
+def token_budget(spent: int, budget: int, per_call: int) -> Optional[int]:
+    """
+    `max_tokens` for the next call: what is left of `budget`, at most `per_call`.
+    A budget of 0 means unlimited (None: the provider's default limit, or `per_call` if set).
+    """
+    if budget <= 0:
+        return per_call or None
+    remaining = budget - spent
+    return max(0, min(per_call, remaining) if per_call else remaining)
+
+
+def _should_continue(reason: Optional[str], continuations: int, max_continuations: int,
+                     spent: int, budget: int, per_call: int) -> bool:
+    return reason == "length" and continuations < max_continuations and token_budget(spent, budget, per_call) != 0
+
+
+async def complete_with_continuation(
+    complete: Callable[..., Awaitable],
+    messages: list,
+    budget: int,
+    per_call: int,
+    max_continuations: int = 2
+) -> dict:
+    """
+    Run `complete(messages, max_tokens=...)` and resume it while it stops on the token limit.
+
+    Continuations re-send the original messages (so the provider's prefix cache still
+    applies) plus the text so far, until the completion finishes, `max_continuations` is
+    reached or the `budget` of output tokens for the whole document is spent.
+
+    Returns {"content": stitched text, "usage": list of usage metadata per call,
+    "continuations": follow-up calls made, "truncated": still cut off at the end}.
+    """
+    parts: List[str] = []
+    usages = []
+    spent = 0
+    continuations = 0
+    while True:
+        call_messages = messages if not parts else continuation_messages(messages, "".join(parts))
+        message = await complete(call_messages, max_tokens=token_budget(spent, budget, per_call))
+        text = message.content if not parts else trim_overlap("".join(parts), message.content)
+        parts.append(text)
+        usages.append(message.usage_metadata)
+        spent += (message.usage_metadata or {}).get("output_tokens", 0)
+
+        reason = finish_reason(message)
+        if not _should_continue(reason, continuations, max_continuations, spent, budget, per_call):
+            return {"content": "".join(parts), "usage": usages, "continuations": continuations, "truncated": reason == "length"}
+        continuations += 1
+
+
+async def stream_with_continuation(
+    astream: Callable[..., AsyncIterator],
+    messages: list,
+    budget: int,
+    per_call: int,
+    max_continuations: int,
+    report: dict
+) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of `complete_with_continuation`: yields text as it arrives.
+
+    `astream(messages, max_tokens=...)` yields chat chunks. The start of each continuation
+    is held back until OVERLAP_WINDOW characters (or its end) have arrived, so repeated
+    text can be trimmed before it reaches the client. `report` receives "usage" (list
+    per call), "continuations" and "truncated".
+    """
+    report.update({"usage": [], "continuations": 0, "truncated": False})
+    written = ""
+    spent = 0
+    while True:
+        call_messages = messages if not written else continuation_messages(messages, written)
+        resuming = bool(written)
+        held = ""
+        reason = None
+        usage = None
+        async for chunk in astream(call_messages, max_tokens=token_budget(spent, budget, per_call)):
+            reason = (chunk.response_metadata or {}).get("finish_reason") or reason
+            usage = chunk.usage_metadata or usage
+            text = chunk.content
+            if resuming:
+                held += text
+                if len(held) < OVERLAP_WINDOW:
+                    continue
+                text, resuming = trim_overlap(written, held), False
+            if text:
+                written += text
+                yield text
+        if resuming and held:
+            text = trim_overlap(written, held)
+            written += text
+            yield text
+
+        report["usage"].append(usage)
+        spent += (usage or {}).get("output_tokens", 0)
+        report["truncated"] = reason == "length"
+        if not _should_continue(reason, report["continuations"], max_continuations, spent, budget, per_call):
+            return
+        report["continuations"] += 1
@@ -0,0 +1,156 @@
+"""
+Content-Addressed Draft Cache
+In-memory LRU (with TTL) in front of an optional SQLite tier that survives restarts.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _normalize(value):
+    """Collapse whitespace in strings (recursively) so cosmetic differences share a key."""
+    if isinstance(value, str):
+        return _WHITESPACE.sub(' ', value).strip()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def make_cache_key(fields: dict) -> str:
+    """SHA-256 over the normalized, key-sorted JSON form of `fields`."""
+    canonical = json.dumps(_normalize(fields), sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class DraftCache:
+    """
+    Two-tier cache of generated drafts keyed by `make_cache_key`.
+
+    - Memory tier: LRU bounded by `max_entries`, entries expire after `ttl_seconds`.
+    - Disk tier (optional): SQLite file at `sqlite_path`, same TTL, promoted to memory on hit.
+
+    `max_entries=0` disables the memory tier; no `sqlite_path` disables the disk tier.
+    With the disk tier, `get`/`set` block on SQLite: async code uses `aget`/`aset`.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 86400, sqlite_path: Optional[str] = None):
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path or None
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._db = self._connect() if self.sqlite_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+        # WAL: several worker processes may read and write the cache at once
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS draft_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        db.commit()
+        return db
+
+    def reconnect(self):
+        """Open a fresh connection (a connection must not be shared across fork)."""
+        self._lock = threading.Lock()
+        if self.sqlite_path:
+            self._db = self._connect()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, stored_at FROM draft_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, stored_at = row
+                    if now - stored_at < self.ttl_seconds:
+                        self._remember(key, stored_at, value)
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM draft_cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO draft_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, value, now)
+                )
+                self._db.commit()
+            self.stores += 1
+
+    async def aget(self, key: str) -> Optional[str]:
+        """`get` for the event loop: the disk tier is read in a worker thread."""
+        if self._db is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str):
+        """`set` for the event loop: the disk tier is written in a worker thread."""
+        if self._db is None:
+            self.set(key, value)
+        else:
+            await asyncio.to_thread(self.set, key, value)
+
+    def _remember(self, key: str, stored_at: float, value: str):
+        if self.max_entries == 0:
+            return
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_tier": self.sqlite_path is not None,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,147 @@
+"""
+Draft Store & Section Index
+Generated drafts are stored with their inputs and an index of their `##` sections, each
+recording the inputs it depends on, so a later redraft only regenerates what changed.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from prompt_assembly import INPUT_LABELS
+from sections import TEMPLATE_STRUCTURES
+
+_REFERENCE = re.compile(r'<<([^<>]+)>>')
+_FIELD_BY_LABEL = {label: field for field, label in INPUT_LABELS.items()}
+
+
+def split_sections(content: str) -> List[dict]:
+    """
+    Split a markdown draft on its `## ` headers.
+
+    The text before the first header (document title, preamble) is the first entry, with
+    an empty heading. Joining every entry's `text` with blank lines restores the document.
+    """
+    sections: List[dict] = []
+    heading, lines = "", []
+    for line in content.split("\n"):
+        if line.startswith("## "):
+            if heading or "".join(lines).strip():
+                sections.append({"heading": heading, "text": "\n".join(lines).strip()})
+            heading, lines = line.strip(), [line]
+        else:
+            lines.append(line)
+    if heading or "".join(lines).strip():
+        sections.append({"heading": heading, "text": "\n".join(lines).strip()})
+    return sections
+
+
+def join_sections(sections: List[dict]) -> str:
+    return "\n\n".join(section["text"] for section in sections if section["text"])
+
+
+def section_dependencies(template_type: str, section: dict, input_values: Dict[str, object]) -> List[str]:
+    """
+    Inputs a section depends on: the <<Field>> references (and Context notes) of its
+    REQUIRED STRUCTURE entry, plus every input whose value appears verbatim in its text.
+    """
+    fields = set()
+    heading = section["heading"].upper()
+    for item in TEMPLATE_STRUCTURES.get(template_type) or []:
+        matches = item.title.upper() in heading if heading else item.is_title
+        if matches:
+            fields.update(_FIELD_BY_LABEL[label] for label in _REFERENCE.findall(item.text) if label in _FIELD_BY_LABEL)
+            if "CONTEXT" in item.text.upper():
+                fields.add("corporate_context")
+    for field, value in input_values.items():
+        if str(value).strip() and str(value) in section["text"]:
+            fields.add(field)
+    return sorted(fields)
+
+
+def index_sections(template_type: str, content: str, input_values: Dict[str, object]) -> List[dict]:
+    """The section index stored with a draft: heading, text and `depends_on` per section."""
+    return [
+        {**section, "depends_on": section_dependencies(template_type, section, input_values)}
+        for section in split_sections(content)
+    ]
+
+
+class DraftStore:
+    """
+    Generated drafts in SQLite, keyed by a SHA-256 of their request and exact text.
+
+    Each record holds the request, the resolved input values, the markdown content and
+    its section index; `parent_id` links a redraft to the draft it was derived from.
+    Drafts older than `ttl_seconds` (0 = kept forever) are deleted as new ones are saved.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS drafts ("
+            "id TEXT PRIMARY KEY, parent_id TEXT, template_type TEXT NOT NULL, mode TEXT NOT NULL, "
+            "request TEXT NOT NULL, input_values TEXT NOT NULL, content TEXT NOT NULL, "
+            "sections TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS drafts_created ON drafts (created_at)")
+        db.commit()
+        return db
+
+    def reconnect(self):
+        """Open a fresh connection (a connection must not be shared across fork)."""
+        self._lock = threading.Lock()
+        self._db = self._connect()
+
+    def save(self, template_type: str, mode: str, request: dict, input_values: Dict[str, object],
+             content: str, parent_id: Optional[str] = None) -> str:
+        """Store a draft (idempotent for identical request and content) and return its id."""
+        # Hashed verbatim: content differing only in whitespace is a different draft
+        canonical = json.dumps({"template_type": template_type, "request": request, "content": content},
+                               sort_keys=True, ensure_ascii=False, default=str)
+        draft_id = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+        sections = index_sections(template_type, content, input_values)
+        now = time.time()
+        with self._lock:
+            if self.ttl_seconds:
+                self._db.execute("DELETE FROM drafts WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._db.execute(
+                "INSERT OR IGNORE INTO drafts (id, parent_id, template_type, mode, request, input_values, content, sections, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (draft_id, parent_id, template_type, mode, json.dumps(request), json.dumps(input_values, default=str),
+                 content, json.dumps(sections), now)
+            )
+            self._db.commit()
+        return draft_id
+
+    def get(self, draft_id: str) -> Optional[dict]:
+        oldest = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, parent_id, template_type, mode, request, input_values, content, sections, created_at "
+                "FROM drafts WHERE id = ? AND created_at >= ?", (draft_id, oldest)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "parent_id": row[1],
+            "template_type": row[2],
+            "mode": row[3],
+            "request": json.loads(row[4]),
+            "input_values": json.loads(row[5]),
+            "content": row[6],
+            "sections": json.loads(row[7]),
+            "created_at": row[8],
+        }
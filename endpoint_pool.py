@@ -0,0 +1,246 @@
+"""
+Hedged Requests & Endpoint Failover
+Streams chat completions from a pool of OpenAI-compatible endpoints (or models): a call
+that shows no first token within the hedging threshold gets a duplicate on the next
+healthiest endpoint, the first to stream wins and the other is cancelled, and 429/5xx
+or connection errors fail over to the next endpoint before any text has been sent.
+"""
+
+import asyncio
+import math
+import time
+from contextlib import suppress
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+import httpx
+
+from metrics import record_endpoint_ttft, record_endpoint_failure, record_hedge
+
+# HTTP statuses worth retrying on another endpoint (rate limits, overload, gateway failures)
+RETRYABLE_STATUS = {408, 409, 429}
+# Weight of the newest time-to-first-token in an endpoint's moving average
+TTFT_SMOOTHING = 0.2
+# Longest an endpoint is skipped after repeated failures, as a multiple of the base cooldown
+MAX_COOLDOWN_FACTOR = 8
+
+
+def parse_endpoints(value: str, default_model: str, default_base_url: Optional[str]) -> List[Tuple[str, Optional[str]]]:
+    """
+    (model, base_url) pairs from a comma-separated list of `model@base_url` entries.
+    An entry with only a URL uses the default model; one with only a model name uses the
+    default base URL.
+    """
+    endpoints = []
+    for entry in (e.strip() for e in value.split(",")):
+        if not entry:
+            continue
+        if "@" in entry:
+            model, base_url = entry.split("@", 1)
+        elif "://" in entry:
+            model, base_url = default_model, entry
+        else:
+            model, base_url = entry, default_base_url
+        endpoints.append((model.strip() or default_model, base_url.strip() or default_base_url))
+    return endpoints
+
+
+def failure_reason(error: BaseException) -> Optional[str]:
+    """'429', '503', 'connection', ... for errors another endpoint may not have; None otherwise."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return str(status) if status in RETRYABLE_STATUS or status >= 500 else None
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ConnectionError)):
+        return "connection"
+    # The LangChain backend raises the openai SDK's errors (imported only with that backend)
+    if type(error).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return "connection"
+    return None
+
+
+class Endpoint:
+    """One generation backend in the pool, with the health record used to rank it."""
+
+    def __init__(self, name: str, backend):
+        self.name = name
+        self.backend = backend
+        self.ttft: Optional[float] = None  # moving average, seconds
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def score(self, now: float) -> float:
+        """Lower is better: typical time to first token, inflated by recent failures."""
+        if now < self.cooldown_until:
+            return math.inf
+        return (self.ttft or 0.0) * (1 + self.consecutive_failures)
+
+    def observe_ttft(self, seconds: float):
+        self.ttft = seconds if self.ttft is None else self.ttft + TTFT_SMOOTHING * (seconds - self.ttft)
+        record_endpoint_ttft(self.name, self.ttft)
+
+    def succeeded(self, ttft: float):
+        self.consecutive_failures = 0
+        self.observe_ttft(ttft)
+
+    def failed(self, cooldown: float):
+        self.failures += 1
+        self.consecutive_failures += 1
+        factor = min(2 ** (self.consecutive_failures - 1), MAX_COOLDOWN_FACTOR)
+        self.cooldown_until = time.monotonic() + cooldown * factor
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "ttft_seconds": round(self.ttft, 3) if self.ttft is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "cooling_down": time.monotonic() < self.cooldown_until,
+        }
+
+
+async def _close(stream):
+    with suppress(Exception):
+        await stream.aclose()
+
+
+class EndpointPool:
+    """
+    Backend pool with hedging and failover, used like a single backend's `astream`.
+
+    `hedge_after` is the time-to-first-token threshold (0 disables hedging); one hedge is
+    in flight at a time, sent to the next-ranked endpoint (or the best one again once
+    every endpoint has been tried), and a failed hedge re-arms the threshold. A failed
+    endpoint is skipped for `cooldown` seconds, doubling with each consecutive failure,
+    and `on_rate_limited` is called on every 429. Once the first chunk has arrived the
+    call is committed to its endpoint, so a later error propagates as usual.
+    """
+
+    def __init__(self, endpoints: List[Endpoint], hedge_after: float = 0.0, cooldown: float = 5.0,
+                 on_rate_limited: Optional[Callable[[], None]] = None):
+        self.endpoints = endpoints
+        self.hedge_after = hedge_after
+        self.cooldown = cooldown
+        self.on_rate_limited = on_rate_limited
+        self.hedges = 0
+        self.hedges_won = 0
+        self.failovers = 0
+
+    def ranked(self) -> List[Endpoint]:
+        now = time.monotonic()
+        return sorted(self.endpoints, key=lambda endpoint: endpoint.score(now))
+
+    async def _open(self, endpoint: Endpoint, messages: list, kwargs: dict):
+        """Start a stream on `endpoint` and wait for its first chunk."""
+        endpoint.requests += 1
+        started = time.monotonic()
+        stream = endpoint.backend.astream(messages, **kwargs).__aiter__()
+        try:
+            chunk = await anext(stream, None)
+        except asyncio.CancelledError:
+            # Lost the race (or the caller went away); a slow loser still counts against it
+            elapsed = time.monotonic() - started
+            if self.hedge_after and elapsed >= self.hedge_after:
+                endpoint.observe_ttft(elapsed)
+            await _close(stream)
+            raise
+        except Exception:
+            await _close(stream)
+            raise
+        endpoint.succeeded(time.monotonic() - started)
+        return endpoint, stream, chunk
+
+    async def _first_chunk(self, messages: list, kwargs: dict):
+        """Race the primary (and a hedge, if it is slow) to the first chunk, failing over on errors."""
+        queue = self.ranked()
+        tasks = {}  # task -> (endpoint, is_hedge)
+        hedged = False
+
+        def launch(endpoint: Endpoint, is_hedge: bool = False):
+            tasks[asyncio.ensure_future(self._open(endpoint, messages, kwargs))] = (endpoint, is_hedge)
+
+        launch(queue.pop(0))
+        try:
+            while tasks:
+                wait = self.hedge_after if self.hedge_after and not hedged else None
+                done, _ = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # No first token within the threshold: send a duplicate
+                    hedged = True
+                    self.hedges += 1
+                    launch(queue.pop(0) if queue else self.ranked()[0], is_hedge=True)
+                    continue
+                # Primary and hedge may finish together: a success wins over a sibling's error.
+                # Any other stream left in `tasks` is closed on the way out.
+                winner = next((task for task in done if task.exception() is None), None)
+                for task in done:
+                    if task is winner:
+                        continue
+                    endpoint, _ = tasks.pop(task)
+                    error = task.exception()
+                    reason = failure_reason(error)
+                    if reason is None:
+                        if winner is None:
+                            raise error
+                        continue
+                    endpoint.failed(self.cooldown)
+                    record_endpoint_failure(endpoint.name, reason)
+                    if reason == "429" and self.on_rate_limited is not None:
+                        self.on_rate_limited()
+                    if winner is not None:
+                        continue
+                    if not queue and not tasks:
+                        raise error
+                    if queue and not tasks:
+                        self.failovers += 1
+                        launch(queue.pop(0))
+                    elif tasks:
+                        # The request still running may be the slow one: allow another hedge
+                        hedged = False
+                if winner is not None:
+                    _, is_hedge = tasks.pop(winner)
+                    if hedged:
+                        self.hedges_won += is_hedge
+                        record_hedge("hedge" if is_hedge else "primary")
+                    return winner.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                with suppress(BaseException):
+                    # A loser that got its first chunk in the same instant still holds a stream
+                    _, stream, _ = await task
+                    await _close(stream)
+
+    async def astream(self, messages: list, **kwargs) -> AsyncIterator:
+        """Yield chat chunks from whichever endpoint streams first."""
+        endpoint, stream, chunk = await self._first_chunk(messages, kwargs)
+        try:
+            if chunk is None:
+                return
+            yield chunk
+            async for chunk in stream:
+                yield chunk
+        except Exception as e:
+            if failure_reason(e) is not None:
+                endpoint.failed(self.cooldown)
+            raise
+        finally:
+            await _close(stream)
+
+    async def warm_up(self):
+        """Let every backend open its connections (or load its client) ahead of the first request."""
+        await asyncio.gather(*[endpoint.backend.warm_up() for endpoint in self.endpoints])
+
+    async def aclose(self):
+        for endpoint in self.endpoints:
+            await endpoint.backend.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "hedge_after_seconds": self.hedge_after,
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+            "failovers": self.failovers,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+        }
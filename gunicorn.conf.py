@@ -0,0 +1,32 @@
+"""
+Gunicorn Configuration
+Multi-process deployment: WEB_CONCURRENCY uvicorn workers forked from one preloaded app
+(prompts compiled and gazetteer built once, pages shared copy-on-write). The workers
+share the provider rate-limit budget, in-flight counts and metrics through
+SHARED_STATE_PATH (see shared_state.py).
+
+Usage:
+    gunicorn api:app -c gunicorn.conf.py
+    WEB_CONCURRENCY=4 gunicorn api:app -c gunicorn.conf.py
+"""
+
+import os
+
+# Worker processes (each runs its own event loop, generation limiter and JOB_WORKERS)
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('PORT', os.getenv('API_PORT', '8000'))}"
+# Import the app once in the master; workers are forked from it
+preload_app = True
+# Seconds a worker gets on shutdown to finish requests and hand its jobs back
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30"))
+
+# Several workers need the shared state; set before the preloaded app reads its config
+if workers > 1:
+    os.environ.setdefault("SHARED_STATE_PATH", "shared_state.db")
+
+
+def post_fork(server, worker):
+    """Reopen the SQLite connections the preloaded app opened in the master."""
+    import api
+    api.after_fork()
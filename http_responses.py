@@ -0,0 +1,165 @@
+"""
+Cacheable Responses
+Strong ETags with If-None-Match (304), gzip/brotli compression negotiated from
+Accept-Encoding, and fast JSON serialization for large draft payloads. orjson and
+brotli are used when installed; without them responses fall back to `json` and gzip.
+"""
+
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed (headers would eat the saving)
+MIN_COMPRESS_BYTES = 1024
+# Brotli quality 5 / gzip level 6: most of the size reduction at a fraction of the CPU of the maximum
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+# Preferred first when the client accepts several equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+_ETAG_SUFFIX = {"br": "-br", "gzip": "-gz"}
+# Content-addressed: the bytes under an ETag never change (private: drafts are client data).
+# Longest lifetime promised to caches, for representations that never expire (seconds)
+IMMUTABLE_MAX_AGE_SECONDS = 31536000
+
+
+def dumps(content) -> bytes:
+    """JSON bytes of `content` (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def json_response(content, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serialize once with `dumps` instead of FastAPI's encoder + `json.dumps`."""
+    return Response(dumps(content), status_code=status_code, headers=headers, media_type="application/json")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best of ENCODINGS the client accepts ('br', 'gzip'), or None for identity."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for this header)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class RepresentationCache:
+    """Encoded bodies of immutable representations, keyed by version and coding; LRU of `max_entries`."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, body: bytes, encoding: Optional[str]):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (body, encoding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def immutable_response(request: Request, version: str, render: Callable[[], bytes], media_type: str,
+                       cache: Optional[RepresentationCache] = None,
+                       headers: Optional[Dict[str, str]] = None,
+                       max_age: Optional[float] = None) -> Response:
+    """
+    Response for a representation that never changes under `version` (e.g. a content hash).
+
+    `render()` produces the identity bytes, compressed with the negotiated coding when at
+    least MIN_COMPRESS_BYTES; the strong ETag is `version` plus the coding actually sent, so
+    each encoding has its own validator. Encoded bodies are kept in `cache`, keyed by
+    version and negotiated coding. A matching If-None-Match gets 304; it is answered
+    without rendering when the client holds the negotiated variant's ETag. `max_age` is
+    how long the representation remains available (e.g. until the stored draft expires);
+    caches are never told to keep it longer.
+    """
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    max_age = IMMUTABLE_MAX_AGE_SECONDS if max_age is None else max(0, min(int(max_age), IMMUTABLE_MAX_AGE_SECONDS))
+    headers = {**(headers or {}), "Vary": "Accept-Encoding", "Cache-Control": f"private, max-age={max_age}, immutable"}
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, _etag(version, encoding)):
+        return _not_modified(_etag(version, encoding), headers)
+
+    key = f"{version}{_ETAG_SUFFIX.get(encoding, '')}"
+    entry = cache.get(key) if cache is not None else None
+    if entry is None:
+        body = render()
+        sent = encoding if encoding and len(body) >= MIN_COMPRESS_BYTES else None
+        entry = (compress(body, sent), sent)
+        if cache is not None:
+            cache.put(key, *entry)
+    body, content_encoding = entry
+    etag = _etag(version, content_encoding)
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag, headers)
+    headers["ETag"] = etag
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return Response(body, headers=headers, media_type=media_type)
+
+
+def _etag(version: str, encoding: Optional[str]) -> str:
+    return f'"{version}{_ETAG_SUFFIX.get(encoding, "")}"'
+
+
+def _not_modified(etag: str, headers: Dict[str, str]) -> Response:
+    headers = {key: value for key, value in headers.items() if key != "Content-Disposition"}
+    return Response(status_code=304, headers={**headers, "ETag": etag})
@@ -0,0 +1,261 @@
+"""
+Asynchronous Draft Jobs
+SQLite-backed job store and worker loop for submit/poll document generation.
+
+Jobs survive restarts and can be processed by workers embedded in the web process
+or by a separate `python worker.py` process pointed at the same database file.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Delay before a counted retry, doubling with each one (seconds), and its ceiling
+RETRY_BACKOFF_SECONDS = 5.0
+MAX_RETRY_BACKOFF_SECONDS = 300.0
+
+
+class RetryJob(Exception):
+    """
+    Raised by a job handler to put the job back in the queue. Transient local conditions
+    (server at capacity) retry freely; `counted=True` (e.g. a provider rate limit) retries
+    with backoff and fails the job with `detail` after the store's `max_retries`.
+    """
+
+    def __init__(self, counted: bool = False, detail: str = ""):
+        super().__init__(detail)
+        self.counted = counted
+        self.detail = detail
+
+
+class JobStore:
+    """
+    Persistent job table.
+
+    Workers claim jobs with a lease, renewed while the job runs; a job whose worker died
+    is reclaimed once its lease expires, up to `max_attempts` times before it is marked
+    failed. Given the `worker`, completing, failing or requeueing a job only applies while
+    that worker still holds it. Counted retries (see RetryJob) are capped at `max_retries`.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 600, max_attempts: int = 3, max_retries: int = 6):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._db = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, "
+            "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL, lease_until REAL, "
+            "retries INTEGER NOT NULL DEFAULT 0, available_at REAL)"
+        )
+        # Job tables created before counted retries
+        columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+        if "retries" not in columns:
+            db.execute("ALTER TABLE jobs ADD COLUMN retries INTEGER NOT NULL DEFAULT 0")
+        if "available_at" not in columns:
+            db.execute("ALTER TABLE jobs ADD COLUMN available_at REAL")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+        db.commit()
+        return db
+
+    def reconnect(self):
+        """Open a fresh connection (a connection must not be shared across fork)."""
+        self._lock = threading.Lock()
+        self._db = self._connect()
+
+    def submit(self, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(payload), time.time())
+            )
+            self._db.commit()
+        return job_id
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Atomically take the oldest queued (or lease-expired) job that is due, or return None."""
+        now = time.time()
+        with self._lock:
+            # Jobs whose worker vanished too many times are given up on
+            error = {"status_code": 500, "detail": "Worker stopped responding too many times"}
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, json.dumps(error), now, RUNNING, now, self.max_attempts)
+            )
+            row = self._db.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                "started_at = ?, lease_until = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE (status = ? AND coalesce(available_at, 0) <= ?) "
+                "OR (status = ? AND lease_until < ?) ORDER BY created_at LIMIT 1) "
+                "RETURNING id, payload, attempts, retries",
+                (RUNNING, worker, now, now + self.lease_seconds, QUEUED, now, RUNNING, now)
+            ).fetchone()
+            self._db.commit()
+        if row is None:
+            return None
+        return {"id": row["id"], "payload": json.loads(row["payload"]), "attempts": row["attempts"], "retries": row["retries"]}
+
+    def renew(self, job_id: str, worker: str) -> bool:
+        """Extend a running job's lease; False once `worker` no longer holds it."""
+        with self._lock:
+            row = self._db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ? AND worker = ? RETURNING id",
+                (time.time() + self.lease_seconds, job_id, RUNNING, worker)
+            ).fetchone()
+            self._db.commit()
+        return row is not None
+
+    def complete(self, job_id: str, result: dict, worker: Optional[str] = None) -> bool:
+        return self._finish(job_id, SUCCEEDED, worker, result=json.dumps(result))
+
+    def fail(self, job_id: str, error: dict, worker: Optional[str] = None) -> bool:
+        return self._finish(job_id, FAILED, worker, error=json.dumps(error))
+
+    def requeue(self, job_id: str, counted: bool = False, delay: float = 0.0, worker: Optional[str] = None) -> bool:
+        """
+        Return a claimed job to the queue without counting the attempt, due after `delay`
+        seconds. A `counted` retry beyond `max_retries` is refused (returns False).
+        """
+        with self._lock:
+            row = self._db.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, attempts = attempts - 1, "
+                "retries = retries + ?, available_at = ? "
+                "WHERE id = ? AND status = ? AND retries + ? <= ? AND (? IS NULL OR worker = ?) RETURNING id",
+                (QUEUED, int(counted), time.time() + delay, job_id, RUNNING, int(counted), self.max_retries,
+                 worker, worker)
+            ).fetchone()
+            self._db.commit()
+        return row is not None
+
+    def _finish(self, job_id: str, status: str, worker: Optional[str] = None,
+                result: Optional[str] = None, error: Optional[str] = None) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND (? IS NULL OR (status = ? AND worker = ?)) RETURNING id",
+                (status, result, error, time.time(), job_id, worker, RUNNING, worker)
+            ).fetchone()
+            self._db.commit()
+        return row is not None
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": json.loads(row["error"]) if row["error"] else None,
+        }
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+
+async def run_worker(
+    store: JobStore,
+    handler: Callable[[dict], Awaitable[dict]],
+    worker: str,
+    stop: asyncio.Event,
+    poll_interval: float = 1.0
+):
+    """
+    Claim and process jobs until `stop` is set.
+
+    `handler` receives the job payload and returns the result dict. It may raise
+    RetryJob to requeue the job (counted retries back off exponentially); any other
+    exception fails the job, using the exception's `status_code`/`detail` attributes
+    when present (e.g. HTTPException). The job's lease is renewed every third of
+    `store.lease_seconds` while the handler runs; a job that another worker has since
+    reclaimed is not overwritten.
+    """
+    while not stop.is_set():
+        job = await asyncio.to_thread(store.claim, worker)
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        lease = asyncio.ensure_future(_keep_leased(store, job["id"], worker))
+        try:
+            result = await handler(job["payload"])
+        except RetryJob as e:
+            delay = min(RETRY_BACKOFF_SECONDS * 2 ** job["retries"], MAX_RETRY_BACKOFF_SECONDS) if e.counted else 0.0
+            if await asyncio.to_thread(store.requeue, job["id"], e.counted, delay, worker):
+                await asyncio.sleep(poll_interval)
+            else:
+                error = {"status_code": 503, "detail": f"{e.detail} (gave up after {store.max_retries} retries)"}
+                await asyncio.to_thread(store.fail, job["id"], error, worker)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back so another worker picks it up
+            await asyncio.to_thread(store.requeue, job["id"], worker=worker)
+            raise
+        except Exception as e:
+            error = {
+                "status_code": getattr(e, "status_code", 500),
+                "detail": getattr(e, "detail", None) or f"Error generating document: {str(e)}"
+            }
+            await asyncio.to_thread(store.fail, job["id"], error, worker)
+        else:
+            await asyncio.to_thread(store.complete, job["id"], result, worker)
+        finally:
+            lease.cancel()
+
+
+async def _keep_leased(store: JobStore, job_id: str, worker: str):
+    """Renew a running job's lease until cancelled or the lease is lost."""
+    while True:
+        await asyncio.sleep(store.lease_seconds / 3)
+        try:
+            renewed = await asyncio.to_thread(store.renew, job_id, worker)
+        except sqlite3.Error:
+            continue  # try again at the next renewal; the lease has two more periods to run
+        if not renewed:
+            return
+
+
+async def run_workers(
+    store: JobStore,
+    handler: Callable[[dict], Awaitable[dict]],
+    concurrency: int,
+    stop: asyncio.Event,
+    name: str = "worker",
+    poll_interval: float = 1.0
+):
+    """Run `concurrency` workers against `store` until `stop` is set."""
+    await asyncio.gather(*[
+        run_worker(store, handler, f"{name}-{i}", stop, poll_interval)
+        for i in range(max(1, concurrency))
+    ])
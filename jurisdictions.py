@@ -0,0 +1,353 @@
+"""
+Jurisdiction & Signer Resolution
+Resolves the governing jurisdiction of a draft from the request's `country` or its
+registered address. A data-driven gazetteer (country names, ISO codes, regions, region
+codes and major cities) is compiled once into a phrase index that is matched token by
+token in a single pass over the address, longest phrase first, so "uk" never matches
+inside "Duke" and adding jurisdictions does not add scans per request.
+"""
+
+import json
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple, Union
+
+DEFAULT_JURISDICTION = "International Jurisdiction"
+DEFAULT_SIGNER = "Authorized Signatory"
+
+# Evidence each kind of match contributes to its country
+KIND_WEIGHTS = {
+    "name": 1.0,         # "India", "United Kingdom", "USA"
+    "region": 0.8,       # "Karnataka", "California", "North Holland"
+    "city": 0.7,         # "Bangalore", "London", "Amsterdam"
+    "code": 0.6,         # "IN", "GBR": upper-case only
+    "region_code": 0.5,  # "CA", "NY", "NSW": upper-case only
+    "postcode": 0.4,     # "SW1A 2AA", "1012 AB", "560066"
+}
+# A region code followed by a number ("NY 10001", "NSW 2000") is read as a region only
+REGION_CODE_WITH_POSTCODE = 0.9
+# Later matches weigh up to this much more (countries and states come last in an address)
+POSITION_BONUS = 0.25
+
+# Jurisdiction label -> phrases. Labels are what the prompts and metrics see.
+GAZETTEER: Dict[str, Dict[str, List[str]]] = {
+    "India": {
+        "names": ["india", "bharat", "republic of india"],
+        "codes": ["IN", "IND"],
+        "regions": ["karnataka", "maharashtra", "tamil nadu", "telangana", "andhra pradesh", "kerala",
+                    "uttar pradesh", "west bengal", "gujarat", "rajasthan", "haryana", "punjab", "delhi",
+                    "madhya pradesh", "bihar", "odisha", "goa", "assam", "uttarakhand", "jharkhand"],
+        "cities": ["bangalore", "bengaluru", "mumbai", "bombay", "new delhi", "hyderabad", "chennai", "madras",
+                   "kolkata", "calcutta", "pune", "noida", "gurgaon", "gurugram", "ahmedabad", "jaipur",
+                   "kochi", "chandigarh", "lucknow", "indore", "coimbatore", "mysore", "mysuru", "navi mumbai"],
+    },
+    "USA": {
+        "names": ["usa", "u s a", "united states", "united states of america"],
+        "codes": ["US", "USA"],
+        "regions": ["alabama", "alaska", "arizona", "arkansas", "california", "colorado", "connecticut",
+                    "delaware", "florida", "georgia", "hawaii", "idaho", "illinois", "indiana", "iowa", "kansas",
+                    "kentucky", "louisiana", "maine", "maryland", "massachusetts", "michigan", "minnesota",
+                    "mississippi", "missouri", "montana", "nebraska", "nevada", "new hampshire", "new jersey",
+                    "new mexico", "new york", "north carolina", "north dakota", "ohio", "oklahoma", "oregon",
+                    "pennsylvania", "rhode island", "south carolina", "south dakota", "tennessee", "texas", "utah",
+                    "vermont", "virginia", "washington", "west virginia", "wisconsin", "wyoming",
+                    "district of columbia", "washington dc", "new england", "silicon valley"],
+        "region_codes": ["AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA", "HI", "ID", "IL", "IN", "IA",
+                         "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ",
+                         "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT",
+                         "VA", "WA", "WV", "WI", "WY", "DC"],
+        "cities": ["new york city", "nyc", "manhattan", "brooklyn", "los angeles", "san francisco", "san jose",
+                   "san diego", "palo alto", "mountain view", "chicago", "houston", "dallas", "austin", "seattle",
+                   "boston", "detroit", "miami", "atlanta", "denver", "phoenix", "philadelphia", "wilmington",
+                   "las vegas", "pittsburgh", "minneapolis", "indianapolis", "nashville", "baltimore"],
+    },
+    "UK": {
+        "names": ["uk", "u k", "united kingdom", "great britain", "britain", "england", "scotland", "wales",
+                  "northern ireland"],
+        "codes": ["UK", "GB", "GBR"],
+        "regions": ["greater london", "greater manchester", "west midlands", "yorkshire", "kent", "surrey",
+                    "essex", "lancashire", "merseyside", "midlothian"],
+        "cities": ["london", "manchester", "birmingham", "edinburgh", "glasgow", "leeds", "liverpool", "bristol",
+                   "cambridge", "oxford", "cardiff", "belfast", "sheffield", "newcastle upon tyne", "nottingham",
+                   "milton keynes"],
+    },
+    "Netherlands": {
+        "names": ["netherlands", "the netherlands", "holland", "nederland", "kingdom of the netherlands"],
+        "codes": ["NL", "NLD"],
+        "regions": ["north holland", "noord holland", "south holland", "zuid holland", "north brabant",
+                    "noord brabant", "gelderland", "overijssel", "limburg", "friesland", "flevoland", "drenthe",
+                    "zeeland"],
+        "cities": ["amsterdam", "rotterdam", "the hague", "den haag", "s gravenhage", "utrecht", "eindhoven",
+                   "leiden", "delft", "haarlem", "tilburg", "groningen", "almere", "breda", "nijmegen",
+                   "maastricht", "amstelveen", "hoofddorp"],
+    },
+    "Germany": {
+        "names": ["germany", "deutschland", "federal republic of germany"],
+        "codes": ["DE", "DEU"],
+        "regions": ["bavaria", "bayern", "hesse", "hessen", "north rhine westphalia", "nordrhein westfalen",
+                    "baden wurttemberg", "saxony", "sachsen", "lower saxony", "niedersachsen"],
+        "cities": ["berlin", "munich", "munchen", "frankfurt", "frankfurt am main", "hamburg", "cologne", "koln",
+                   "stuttgart", "dusseldorf", "leipzig", "dresden", "hanover", "hannover"],
+    },
+    "France": {
+        "names": ["france", "french republic"],
+        "codes": ["FR", "FRA"],
+        "regions": ["ile de france", "provence", "normandy", "normandie", "brittany", "bretagne", "occitanie"],
+        "cities": ["paris", "lyon", "marseille", "toulouse", "bordeaux", "lille", "nantes", "strasbourg",
+                   "montpellier", "la defense"],
+    },
+    "Ireland": {
+        "names": ["ireland", "republic of ireland", "eire"],
+        "codes": ["IE", "IRL"],
+        "regions": ["county dublin", "co dublin", "county cork", "co cork", "county galway", "co galway"],
+        "cities": ["dublin", "cork", "galway", "limerick", "waterford"],
+    },
+    "Canada": {
+        "names": ["canada"],
+        "codes": ["CA", "CAN"],
+        "regions": ["ontario", "quebec", "british columbia", "alberta", "manitoba", "saskatchewan", "nova scotia",
+                    "new brunswick", "newfoundland"],
+        "region_codes": ["ON", "QC", "BC", "AB", "MB", "SK", "NS", "NB", "NL", "PE"],
+        "cities": ["toronto", "montreal", "vancouver", "ottawa", "calgary", "edmonton", "winnipeg", "mississauga",
+                   "waterloo"],
+    },
+    "Australia": {
+        "names": ["australia", "commonwealth of australia"],
+        "codes": ["AU", "AUS"],
+        "regions": ["new south wales", "victoria", "queensland", "western australia", "south australia",
+                    "tasmania", "australian capital territory"],
+        "region_codes": ["NSW", "VIC", "QLD", "WA", "SA", "TAS", "ACT", "NT"],
+        "cities": ["sydney", "melbourne", "brisbane", "perth", "adelaide", "canberra", "hobart", "gold coast"],
+    },
+    "Singapore": {
+        "names": ["singapore", "republic of singapore"],
+        "codes": ["SG", "SGP"],
+        "regions": [],
+        "cities": [],
+    },
+    "UAE": {
+        "names": ["uae", "u a e", "united arab emirates", "emirates"],
+        "codes": ["AE", "ARE"],
+        "regions": ["dubai", "abu dhabi", "sharjah", "ajman"],
+        "cities": [],
+    },
+}
+
+# Postcode shapes distinctive enough to count as (weak) evidence, matched against the
+# lower-cased address (their letters must be upper case in the original)
+POSTCODES = [
+    ("UK", r"[a-z]{1,2}\d[a-z\d]?[ \t]+\d[a-z]{2}"),     # SW1A 2AA
+    ("Canada", r"[a-z]\d[a-z][ \t]?\d[a-z]\d"),          # M5V 2T6
+    ("Netherlands", r"\d{4}[ \t]?[a-z]{2}"),              # 1012 AB
+    ("India", r"\d{6}"),                                 # 560066
+]
+
+# A place name followed by one of these is a street name ("Victoria Street"), not a location
+STREET_WORDS = ["street", "st", "road", "rd", "avenue", "ave", "lane", "ln", "boulevard", "blvd", "way", "drive",
+                "dr", "place", "pl", "square", "sq", "court", "ct", "terrace", "crescent", "close", "highway",
+                "hwy", "marg"]
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def _fold(text: str) -> str:
+    """Strip accents ("München" -> "Munchen") so phrases match however they were typed."""
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _phrase(text: str) -> str:
+    return " ".join(_TOKEN.findall(_fold(text).lower()))
+
+
+# Object-form address fields in the one-line address the prompt carries
+ADDRESS_FIELDS = ("line", "city", "postal_code", "country")
+# The resolver also reads the state / region, which the prompt's address leaves out
+_SCAN_FIELDS = ("line", "city", "state", "postal_code", "country")
+
+
+def address_text(address: Union[str, dict, None], fields: Tuple[str, ...] = ADDRESS_FIELDS) -> str:
+    """A registered address as one line; the object form's `fields` are joined in postal order."""
+    if isinstance(address, dict):
+        parts = [address.get(key) for key in fields]
+        return ", ".join(str(p) for p in parts if p)
+    return str(address or "")
+
+
+def resolve_signer(directors) -> str:
+    """The first listed director, else a generic signatory."""
+    if isinstance(directors, list) and directors:
+        return directors[0]
+    return DEFAULT_SIGNER
+
+
+class Resolution:
+    """A resolved jurisdiction: `source` is 'input', 'address' or 'default'."""
+
+    def __init__(self, country: str, confidence: float, source: str, matches: Optional[List[Tuple[str, str, str]]] = None):
+        self.country = country
+        self.confidence = confidence
+        self.source = source
+        self.matches = matches or []  # (matched text, jurisdiction, kind)
+
+    def as_dict(self) -> dict:
+        return {
+            "country": self.country,
+            "confidence": self.confidence,
+            "source": self.source,
+            "matched": [f"{text} ({kind})" for text, country, kind in self.matches if country == self.country],
+        }
+
+    def __repr__(self):
+        return f"Resolution({self.country!r}, {self.confidence}, {self.source!r})"
+
+
+def _trie_pattern(phrases: List[str]) -> str:
+    """
+    Regex alternation of `phrases` factored on common prefixes ("new (?:delhi|york|...)"),
+    so the engine tests each position against a few branches instead of every phrase.
+    Greedy optional tails try the longest phrase first.
+    """
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [
+            (r"[\W_]+" if char == " " else re.escape(char)) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return (group if len(branches) > 1 or len(branches[0]) == 1 else "(?:" + group + ")") + "?"
+        return group
+
+    return build(trie)
+
+
+class Gazetteer:
+    """
+    GAZETTEER-shaped data compiled into one regex and its lookup tables.
+
+    One `finditer` over the lower-cased address finds every match. Phrases (names,
+    regions, cities) count in any case on whole words; codes, region codes and postcode
+    letters only where the original is upper case, so "in" and "us" in running text are
+    never read as India or the USA.
+    """
+
+    def __init__(self, data: Dict[str, Dict[str, List[str]]]):
+        self.labels = list(data)
+        self._phrases: Dict[str, List[Tuple[str, str]]] = {}
+        self._codes: Dict[str, List[Tuple[str, str]]] = {}
+        self._canonical: Dict[str, str] = {}
+        for label, entry in data.items():
+            self._canonical[_phrase(label)] = label
+            for kind, key in (("name", "names"), ("region", "regions"), ("city", "cities")):
+                for phrase in entry.get(key) or []:
+                    self._add(self._phrases, _phrase(phrase), label, kind)
+            for kind, key in (("code", "codes"), ("region_code", "region_codes")):
+                for code in entry.get(key) or []:
+                    self._add(self._codes, code.upper(), label, kind)
+            for value in (entry.get("names") or []) + (entry.get("codes") or []):
+                self._canonical.setdefault(_phrase(value), label)
+
+        region_codes = [code.lower() for code, entries in self._codes.items() if any(k == "region_code" for _, k in entries)]
+        streets = "|".join(STREET_WORDS)
+        alternatives = [
+            rf"(?P<phrase>{_trie_pattern(list(self._phrases))}(?![\W_]+(?:{streets})\b))",
+            # "NY 10001", "NSW 2000": a region, not the country code it may collide with
+            rf"(?P<region_code>{_trie_pattern(region_codes)})(?=[ \t,]+\d)",
+            rf"(?P<code>{_trie_pattern([code.lower() for code in self._codes])})",
+        ] + [rf"(?P<postcode{i}>{pattern})" for i, (_, pattern) in enumerate(POSTCODES)]
+        self._pattern = re.compile(r"(?<![^\W_])(?:" + "|".join(alternatives) + r")(?![^\W_])")
+
+    @staticmethod
+    def _add(table: dict, key: str, label: str, kind: str):
+        if key and (label, kind) not in table.setdefault(key, []):
+            table[key].append((label, kind))
+
+    def canonical(self, value: Optional[str]) -> Optional[str]:
+        """The label of a country given by name or code ("IN", "United States" -> "USA"); else None."""
+        return self._canonical.get(_phrase(value)) if value else None
+
+    def scan(self, text: str) -> Tuple[Dict[str, float], List[Tuple[str, str, str]]]:
+        """Evidence per jurisdiction and the matches behind it, from one pass over `text`."""
+        text = _fold(text)
+        evidence: Dict[str, float] = {}
+        matches: List[Tuple[str, str, str]] = []
+        seen = set()
+        length = max(1, len(text))
+        for match in self._pattern.finditer(text.lower()):
+            group, matched = match.lastgroup, text[match.start():match.end()]
+            if group != "phrase" and not matched.isupper() and not matched.isdigit():
+                continue
+            if group == "phrase":
+                key = _phrase(matched)
+                entries = self._phrases[key]
+            elif group == "region_code":
+                key, weight = matched, REGION_CODE_WITH_POSTCODE
+                entries = [entry for entry in self._codes[matched] if entry[1] == "region_code"]
+            elif group == "code":
+                key, entries = matched, self._codes[matched]
+            else:
+                key, entries = matched, [(POSTCODES[int(group[8:])][0], "postcode")]
+            bonus = 1 + POSITION_BONUS * match.start() / length
+            for label, kind in entries:
+                if (key, label) in seen:
+                    continue  # "London Road, London" is one piece of evidence
+                seen.add((key, label))
+                evidence[label] = evidence.get(label, 0.0) + (
+                    weight if group == "region_code" else KIND_WEIGHTS[kind]) * bonus
+                matches.append((matched, label, kind))
+        return evidence, matches
+
+    def resolve(self, country: Optional[str] = None, address: Union[str, dict, None] = None,
+                default: str = DEFAULT_JURISDICTION) -> Resolution:
+        """
+        Priority: the request's `country` > the registered address > `default`.
+
+        A given country is kept as typed unless it names a known jurisdiction, which is
+        then reported by its label. From an address, the best-supported jurisdiction
+        wins; confidence is its share of all evidence, scaled down when the evidence
+        itself is thin (a lone postcode or city).
+        """
+        if country and country.strip():
+            return Resolution(self.canonical(country) or country.strip(), 1.0, "input")
+
+        if isinstance(address, dict):
+            evidence, matches = self.scan(address_text({**address, "country": None}, _SCAN_FIELDS))
+            label = self.canonical(str(address.get("country") or ""))
+            if label:
+                evidence[label] = evidence.get(label, 0.0) + KIND_WEIGHTS["name"] * (1 + POSITION_BONUS)
+                matches.append((str(address["country"]), label, "name"))
+        else:
+            evidence, matches = self.scan(address_text(address))
+
+        if not evidence:
+            return Resolution(default, 0.0, "default")
+        best = max(evidence, key=evidence.get)
+        confidence = evidence[best] / sum(evidence.values()) * min(1.0, evidence[best])
+        return Resolution(best, round(confidence, 2), "address", matches)
+
+
+def load_gazetteer(path: Optional[str] = None) -> Gazetteer:
+    """
+    The built-in GAZETTEER, extended from a JSON file of the same shape when `path` is set.
+    Phrases for an existing label are added to it; a new label adds a jurisdiction.
+    """
+    data = {label: {key: list(values) for key, values in entry.items()} for label, entry in GAZETTEER.items()}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            extra = json.load(f)
+        for label, entry in extra.items():
+            target = data.setdefault(label, {})
+            for key, values in entry.items():
+                target[key] = (target.get(key) or []) + list(values)
+    return Gazetteer(data)
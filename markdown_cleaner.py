@@ -0,0 +1,122 @@
+"""
+Markdown Output Cleaning
+Post-processing for AI-generated legal documents, for whole texts and token streams.
+"""
+
+import re
+
+# Trailing whitespace and backticks are held back while streaming: they may turn out
+# to be the end of the document (to be stripped) or a closing code fence.
+_TRAILING_HOLD = re.compile(r'[\s`]*\Z')
+_BLANK_RUNS = re.compile(r'\n{3,}')
+
+
+def clean_markdown_output(text: str) -> str:
+    """
+    Clean and format the markdown output from the AI.
+    Removes code block wrappers, normalizes whitespace, and ensures clean formatting.
+    """
+    if not text:
+        return text
+
+    # Ensure consistent line endings
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+    # Remove markdown code block wrappers if AI wrapped the entire document
+    # Handles cases like: ```markdown\n...\n``` or ```\n...\n```
+    text = text.strip()
+
+    # Remove leading/trailing code block markers
+    if text.startswith("```"):
+        # Find the first newline after ```
+        first_newline = text.find("\n")
+        if first_newline != -1:
+            # Check if it says "markdown" or just ```
+            marker = text[:first_newline].lower()
+            if "markdown" in marker or marker == "```":
+                text = text[first_newline + 1:]
+
+    if text.endswith("```"):
+        text = text[:-3]
+
+    # Remove any remaining leading/trailing whitespace
+    text = text.strip()
+
+    # Normalize multiple consecutive newlines to maximum of 2
+    text = _BLANK_RUNS.sub('\n\n', text)
+
+    return text
+
+
+class StreamingMarkdownCleaner:
+    """
+    Incremental version of `clean_markdown_output` for token streams.
+
+    Feed chunks as they arrive and forward whatever `feed()` returns; call `finish()`
+    once at the end of the stream. Only the opening fence line and any trailing
+    whitespace/backticks are ever held back, never the whole document.
+    """
+
+    def __init__(self):
+        self._head = ""             # Text seen before the opening fence has been resolved
+        self._head_done = False
+        self._started = False       # First non-whitespace character has been emitted
+        self._tail = ""             # Held-back trailing whitespace/backticks
+        self._pending_cr = False    # Chunk ended in '\r' that may be half of '\r\n'
+
+    def feed(self, chunk: str) -> str:
+        """Consume one chunk and return the cleaned text that is safe to emit now."""
+        if not chunk:
+            return ""
+        chunk = self._normalize_line_endings(chunk)
+
+        if not self._head_done:
+            self._head += chunk
+            stripped = self._head.lstrip()
+            if not stripped:
+                return ""
+            if stripped.startswith("```"):
+                first_newline = stripped.find("\n")
+                if first_newline == -1:
+                    return ""  # Need the full fence line to decide whether to drop it
+                marker = stripped[:first_newline].lower()
+                if "markdown" in marker or marker == "```":
+                    stripped = stripped[first_newline + 1:]
+            elif len(stripped) < 3 and "```".startswith(stripped):
+                return ""  # Could still become an opening fence
+            self._head_done = True
+            self._head = ""
+            chunk = stripped
+
+        if not self._started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return ""
+            self._started = True
+
+        text = self._tail + chunk
+        hold_from = _TRAILING_HOLD.search(text).start()
+        self._tail = text[hold_from:]
+        return _BLANK_RUNS.sub('\n\n', text[:hold_from])
+
+    def finish(self) -> str:
+        """Flush the held-back tail, dropping a closing code fence and trailing whitespace."""
+        if not self._head_done:
+            head, self._head = self._head, ""
+            return clean_markdown_output(head) or ""
+
+        tail, self._tail = self._tail, ""
+        self._pending_cr = False
+        tail = tail.rstrip()
+        if tail.endswith("```"):
+            tail = tail[:-3]
+        return _BLANK_RUNS.sub('\n\n', tail.rstrip())
+
+    def _normalize_line_endings(self, chunk: str) -> str:
+        if self._pending_cr:
+            chunk = "\r" + chunk
+            self._pending_cr = False
+        if chunk.endswith("\r"):
+            chunk = chunk[:-1]
+            self._pending_cr = True
+        return chunk.replace('\r\n', '\n').replace('\r', '\n')
@@ -0,0 +1,424 @@
+"""
+Metrics & Request Timing
+Minimal Prometheus-compatible metrics (counters, gauges, histograms) rendered in the
+text exposition format, plus per-stage timing of the draft generation path. Snapshots
+from several worker processes can be merged into one exposition.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds: covers sub-millisecond prep stages up to multi-minute long-form generations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# Optional structured per-request timing log (one JSON line per request)
+LOG_REQUEST_TIMINGS = os.getenv("LOG_REQUEST_TIMINGS", "false").lower() in ("1", "true", "yes")
+
+timing_logger = logging.getLogger("legal_drafts.timing")
+if LOG_REQUEST_TIMINGS and not timing_logger.handlers:
+    timing_logger.setLevel(logging.INFO)
+    timing_logger.addHandler(logging.StreamHandler())
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def values(self) -> dict:
+        with self._lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+
+    def combine(self, a, b):
+        """One value from the same series' values in two processes."""
+        return a + b
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def render(self, values: Optional[dict] = None) -> List[str]:
+        samples = self.samples() if values is None else [(self.name, key, value) for key, value in values.items()]
+        return self.header() + [
+            f"{name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for name, key, value in samples
+        ]
+
+
+class Gauge(Counter):
+    """`aggregate` is how worker processes' values combine: "sum" (counts) or "max" (levels)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), aggregate: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.aggregate = aggregate
+
+    def combine(self, a, b):
+        return max(a, b) if self.aggregate == "max" else a + b
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def combine(self, a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def render(self, values: Optional[dict] = None) -> List[str]:
+        lines = self.header()
+        items = (self.values() if values is None else values).items()
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and scrape-time collectors; renders the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, float]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect: Callable[[], Iterable[Tuple[str, str, float]]]):
+        """`collect()` returns (name, help, value) gauges sampled at scrape time."""
+        self._collectors.append(collect)
+
+    def snapshot(self) -> dict:
+        """This process's metric and collector values, JSON-serializable (see `merge`)."""
+        return {
+            "metrics": {metric.name: [[list(key), value] for key, value in metric.values().items()] for metric in self._metrics},
+            "collected": {name: value for collect in self._collectors for name, _, value in collect()},
+        }
+
+    def merge(self, snapshots: List[dict], gauges: bool = True) -> dict:
+        """
+        One snapshot from several processes' snapshots: counters and histograms add up,
+        gauges combine by their `aggregate` and collector values add up. `gauges=False`
+        keeps only counters and histograms (the totals of processes that have exited).
+        """
+        merged = {"metrics": {}, "collected": {}}
+        for metric in self._metrics:
+            if isinstance(metric, Gauge) and not gauges:
+                continue
+            series = {}
+            for snapshot in snapshots:
+                for key, value in snapshot.get("metrics", {}).get(metric.name, []):
+                    key = tuple(key)
+                    series[key] = metric.combine(series[key], value) if key in series else value
+            merged["metrics"][metric.name] = [[list(key), value] for key, value in series.items()]
+        if gauges:
+            for snapshot in snapshots:
+                for name, value in snapshot.get("collected", {}).items():
+                    merged["collected"][name] = merged["collected"].get(name, 0) + value
+        return merged
+
+    def render(self, snapshots: Optional[List[dict]] = None) -> str:
+        """The text exposition of this process, or of `snapshots` merged (one per worker process)."""
+        merged = self.merge(snapshots) if snapshots is not None else None
+        lines = []
+        for metric in self._metrics:
+            if merged is None:
+                lines.extend(metric.render())
+            else:
+                lines.extend(metric.render({tuple(key): value for key, value in merged["metrics"].get(metric.name, [])}))
+        for collect in self._collectors:
+            for name, documentation, value in collect():
+                if merged is not None:
+                    value = merged["collected"].get(name, value)
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"])
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "legal_draft_stage_seconds", "Time spent in each stage of draft generation.", ["stage"]
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "legal_draft_request_seconds", "End-to-end handling time per endpoint.", ["endpoint"]
+))
+REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "legal_draft_requests_total", "Draft requests by endpoint, template and outcome.", ["endpoint", "template_type", "outcome"]
+))
+TOKENS_TOTAL = REGISTRY.register(Counter(
+    "legal_draft_tokens_total", "LLM tokens by template, jurisdiction and kind (prompt, cached_prompt, completion).",
+    ["template_type", "jurisdiction", "kind"]
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "legal_draft_in_flight", "Requests currently being handled, per endpoint.", ["endpoint"]
+))
+ERRORS_TOTAL = REGISTRY.register(Counter(
+    "legal_draft_errors_total", "Failed draft requests by error type.", ["endpoint", "type"]
+))
+STRUCTURE_PROBLEMS_TOTAL = REGISTRY.register(Counter(
+    "legal_draft_structure_problems_total", "REQUIRED STRUCTURE entries found missing or truncated in generated drafts.",
+    ["template_type", "kind"]
+))
+STRUCTURE_REPAIRS_TOTAL = REGISTRY.register(Counter(
+    "legal_draft_structure_repairs_total", "Sections drafted separately and spliced into generated drafts.", ["template_type"]
+))
+CANCELLED_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "legal_draft_cancelled_requests_total", "Requests whose generation was cancelled, by reason (disconnect, deadline).",
+    ["endpoint", "reason"]
+))
+LLM_CALLS_CANCELLED_TOTAL = REGISTRY.register(Counter(
+    "legal_draft_llm_calls_cancelled_total", "LLM calls aborted before completion.", ["template_type"]
+))
+OUTPUT_TOKENS_SAVED_TOTAL = REGISTRY.register(Counter(
+    "legal_draft_output_tokens_saved_total",
+    "Estimated output tokens not generated thanks to cancelled LLM calls (typical completion length minus tokens received).",
+    ["template_type"]
+))
+LLM_HEDGES_TOTAL = REGISTRY.register(Counter(
+    "legal_draft_llm_hedges_total", "LLM calls that sent a hedged duplicate, by which request streamed first (primary, hedge).",
+    ["winner"]
+))
+LLM_ENDPOINT_FAILURES_TOTAL = REGISTRY.register(Counter(
+    "legal_draft_llm_endpoint_failures_total", "LLM endpoint failures (calls retried elsewhere when possible), by endpoint and reason (HTTP status or connection).",
+    ["endpoint", "reason"]
+))
+LLM_ENDPOINT_TTFT_SECONDS = REGISTRY.register(Gauge(
+    "legal_draft_llm_endpoint_ttft_seconds", "Moving average of each LLM endpoint's time to first token.", ["endpoint"],
+    aggregate="max"
+))
+EVENT_LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    "legal_draft_event_loop_lag_seconds", "Delay of periodic event-loop wake-ups beyond their schedule.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+))
+EVENT_LOOP_BLOCKED_SECONDS = REGISTRY.register(Counter(
+    "legal_draft_event_loop_blocked_seconds_total", "Accumulated event-loop lag: time the loop could not run ready tasks."
+))
+
+_current_timing: ContextVar[Optional["RequestTiming"]] = ContextVar("current_timing", default=None)
+
+
+class RequestTiming:
+    """Stage durations and attributes of one request, for the structured timing log."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.stages: Dict[str, float] = {}
+        self.fields: Dict[str, object] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = round(self.stages.get(stage, 0.0) + seconds, 6)
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration in the histogram and the current request's timing."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.add(stage, seconds)
+
+
+@contextmanager
+def timed_stage(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def annotate(**fields):
+    """Attach attributes (template, jurisdiction, cache hit...) to the current request's timing."""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.fields.update(fields)
+
+
+def error_type(error: BaseException) -> str:
+    status_code = getattr(error, "status_code", None)
+    return f"http_{status_code}" if status_code else type(error).__name__
+
+
+@contextmanager
+def request_timing(endpoint: str):
+    """
+    Track one request: in-flight gauge, end-to-end histogram, outcome and error counters,
+    and (with LOG_REQUEST_TIMINGS=true) one JSON log line with every stage's duration.
+    """
+    timing = RequestTiming(endpoint)
+    token = _current_timing.set(timing)
+    IN_FLIGHT.inc(endpoint=endpoint)
+    started = time.perf_counter()
+    outcome = "success"
+    try:
+        yield timing
+    except BaseException as e:
+        outcome = "error"
+        ERRORS_TOTAL.inc(endpoint=endpoint, type=error_type(e))
+        timing.fields["error"] = error_type(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        _current_timing.reset(token)
+        IN_FLIGHT.dec(endpoint=endpoint)
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+        REQUESTS_TOTAL.inc(endpoint=endpoint, template_type=timing.fields.get("template_type", "unknown"), outcome=outcome)
+        if LOG_REQUEST_TIMINGS:
+            timing_logger.info(json.dumps({
+                "endpoint": endpoint, "outcome": outcome, "total_seconds": round(elapsed, 6),
+                "stages": timing.stages, **timing.fields
+            }, default=str))
+
+
+def record_tokens(template_type: str, jurisdiction: str, usage: Optional[dict]):
+    """Count a generation's tokens; `usage` is the API's usage summary (see api.usage_summary)."""
+    if not usage:
+        return
+    TOKENS_TOTAL.inc(usage.get("input_tokens", 0), template_type=template_type, jurisdiction=jurisdiction, kind="prompt")
+    TOKENS_TOTAL.inc(usage.get("cached_input_tokens", 0), template_type=template_type, jurisdiction=jurisdiction, kind="cached_prompt")
+    TOKENS_TOTAL.inc(usage.get("output_tokens", 0), template_type=template_type, jurisdiction=jurisdiction, kind="completion")
+
+
+def record_structure(template_type: str, report: dict):
+    """Count the structure problems found in a generated draft and the sections repaired."""
+    for kind in ("missing", "truncated"):
+        if report[kind]:
+            STRUCTURE_PROBLEMS_TOTAL.inc(len(report[kind]), template_type=template_type, kind=kind)
+    if report["repaired"]:
+        STRUCTURE_REPAIRS_TOTAL.inc(report["repaired"], template_type=template_type)
+    annotate(structure_complete=report["complete"], structure_repaired=report["repaired"])
+
+
+# Typical output tokens of a completed LLM call per template (moving average), for the savings estimate
+_typical_output_tokens: Dict[str, float] = {}
+TYPICAL_OUTPUT_SMOOTHING = 0.2
+
+
+def _current_template() -> str:
+    timing = _current_timing.get()
+    return str(timing.fields.get("template_type", "unknown")) if timing is not None else "unknown"
+
+
+def observe_call_output(output_tokens: int):
+    """Fold a completed LLM call's output length into its template's typical length."""
+    template_type = _current_template()
+    previous = _typical_output_tokens.get(template_type)
+    _typical_output_tokens[template_type] = output_tokens if previous is None else (
+        previous + TYPICAL_OUTPUT_SMOOTHING * (output_tokens - previous)
+    )
+
+
+def record_cancelled_call(received_tokens: int):
+    """Count an aborted LLM call and the output tokens it is estimated not to have generated."""
+    template_type = _current_template()
+    LLM_CALLS_CANCELLED_TOTAL.inc(template_type=template_type)
+    saved = _typical_output_tokens.get(template_type, 0) - received_tokens
+    if saved > 0:
+        OUTPUT_TOKENS_SAVED_TOTAL.inc(round(saved), template_type=template_type)
+
+
+def record_cancelled_request(endpoint: str, reason: str):
+    CANCELLED_REQUESTS_TOTAL.inc(endpoint=endpoint, reason=reason)
+    annotate(cancelled=reason)
+
+
+def record_hedge(winner: str):
+    LLM_HEDGES_TOTAL.inc(winner=winner)
+
+
+def record_endpoint_failure(endpoint: str, reason: str):
+    LLM_ENDPOINT_FAILURES_TOTAL.inc(endpoint=endpoint, reason=reason)
+
+
+def record_endpoint_ttft(endpoint: str, seconds: float):
+    LLM_ENDPOINT_TTFT_SECONDS.set(seconds, endpoint=endpoint)
+
+
+async def monitor_event_loop(stop: asyncio.Event, interval: float = 0.05):
+    """
+    Sample event-loop responsiveness until `stop` is set.
+
+    Sleeps `interval` seconds repeatedly; any extra delay before waking up is time the loop
+    spent blocked (synchronous work in a handler, CPU-heavy parsing, blocking I/O).
+    """
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - started - interval)
+        EVENT_LOOP_LAG_SECONDS.observe(lag)
+        EVENT_LOOP_BLOCKED_SECONDS.inc(lag)
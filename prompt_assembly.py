@@ -0,0 +1,77 @@
+"""
+Prompt Assembly Layer
+Precompiles PROMPT_MAP into a byte-identical system prefix per template plus a short
+trailing message carrying the per-request inputs.
+
+OpenAI caches prompt prefixes automatically (1024+ identical leading tokens). Formatting
+customer data straight into the templates puts the company name and address near the
+top, so no two requests share a prefix. Here every placeholder in the template body is
+replaced by a stable reference such as <<Company Name>> and the actual values travel in
+the user message, so CORE_LEGAL_BRAIN and the REQUIRED STRUCTURE block are cacheable.
+"""
+
+from string import Formatter
+from typing import Dict, Tuple
+
+from prompts import PROMPT_MAP, CORE_LEGAL_BRAIN
+
+# Template placeholder -> reference label used in the static prefix
+INPUT_LABELS = {
+    "company_name": "Company Name",
+    "registration_number": "Registration Number",
+    "registered_address": "Registered Address",
+    "signer": "Signer",
+    "country": "Jurisdiction",
+    "corporate_context": "Corporate Context",
+    "date_today": "Date",
+}
+
+GENERATE_CUE = "Generate the document now."
+
+INPUT_REFERENCE_NOTE = """
+**INPUT REFERENCES:** Values written as <<Field Name>> in these instructions are supplied in the
+INPUTS message that follows. Substitute them verbatim wherever they appear in the document.
+"""
+
+
+def _reference(field: str) -> str:
+    return f"<<{INPUT_LABELS[field]}>>"
+
+
+class CompiledPrompt:
+    """A template split into a static, cache-friendly system prefix and its input fields."""
+
+    def __init__(self, template_type: str, raw_template: str):
+        self.template_type = template_type
+        self.fields: Tuple[str, ...] = tuple(dict.fromkeys(
+            name for _, name, _, _ in Formatter().parse(raw_template)
+            if name and name != "core_instructions"
+        ))
+        unknown = [f for f in self.fields if f not in INPUT_LABELS]
+        if unknown:
+            raise ValueError(f"Template '{template_type}' uses unknown inputs: {', '.join(unknown)}")
+
+        self.system_prompt = raw_template.format(
+            core_instructions=CORE_LEGAL_BRAIN + INPUT_REFERENCE_NOTE,
+            **{field: _reference(field) for field in self.fields}
+        )
+
+    def render_inputs(self, values: Dict[str, object]) -> str:
+        """The INPUTS block of the trailing user message: this request's value for each reference."""
+        lines = [f"- {_reference(field)}: {values[field]}" for field in self.fields]
+        return "**INPUTS:**\n" + "\n".join(lines)
+
+
+def fill_references(text: str, values: Dict[str, object]) -> str:
+    """Replace <<Field Name>> references in `text` with the request's actual values."""
+    for field, label in INPUT_LABELS.items():
+        if field in values:
+            text = text.replace(f"<<{label}>>", str(values[field]))
+    return text
+
+
+# Compiled once at import; the system prompts are identical for every request of a template
+COMPILED_PROMPTS: Dict[str, CompiledPrompt] = {
+    template_type: CompiledPrompt(template_type, raw_template)
+    for template_type, raw_template in PROMPT_MAP.items()
+}
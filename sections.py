@@ -0,0 +1,206 @@
+"""
+Document Structure & Section-Parallel Generation
+Parses each template's numbered REQUIRED STRUCTURE and drafts long-form documents
+section by section, concurrently, instead of in one long serial completion. Also rewrites
+individual sections of an existing draft when its inputs change.
+"""
+
+import asyncio
+import inspect
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from backends import HumanMessage, SystemMessage
+from markdown_cleaner import clean_markdown_output
+from prompt_assembly import COMPILED_PROMPTS, fill_references
+
+# "3. **SECTION 1: DEFINITIONS:** - Define ..." -> number, title, inline text
+_ITEM = re.compile(r'^(\d+)\.\s+\*\*(.+?):?\*\*:?\s*(.*)$')
+_QUOTED = re.compile(r'"([^"]+)"')
+
+
+class StructureItem:
+    """One numbered entry of a template's REQUIRED STRUCTURE."""
+
+    def __init__(self, number: int, title: str, text: str):
+        self.number = number
+        self.title = title.strip().rstrip(':')
+        self.text = text.rstrip()
+
+    @property
+    def is_title(self) -> bool:
+        """The document title entry (`HEADER: "..."`), which needs no LLM call."""
+        return self.title.upper() == "HEADER" and _QUOTED.search(self.text) is not None
+
+    @property
+    def heading(self) -> str:
+        """The markdown header this entry must appear under."""
+        if self.is_title:
+            return "# " + _QUOTED.search(self.text).group(1)
+        return "## " + self.title
+
+    def __repr__(self):
+        return f"StructureItem({self.number}, {self.title!r})"
+
+
+def parse_required_structure(prompt: str) -> List[StructureItem]:
+    """Split the REQUIRED STRUCTURE block of a prompt into its numbered entries, in order."""
+    marker = prompt.find("**REQUIRED STRUCTURE:**")
+    if marker == -1:
+        return []
+    items: List[StructureItem] = []
+    for line in prompt[marker:].splitlines()[1:]:
+        match = _ITEM.match(line.strip())
+        if match:
+            number, title, _ = match.groups()
+            items.append(StructureItem(int(number), title, line.strip()))
+        elif items and line.strip():
+            items[-1].text += "\n" + line.rstrip()
+    return items
+
+
+# Parsed once from the compiled prompts (field values appear as <<Field Name>> references)
+TEMPLATE_STRUCTURES: Dict[str, List[StructureItem]] = {
+    template_type: parse_required_structure(compiled.system_prompt)
+    for template_type, compiled in COMPILED_PROMPTS.items()
+}
+
+BRIEF_INSTRUCTION = """This document will be drafted section by section in parallel, so every section
+needs the same shared context. Write a short DRAFTING BRIEF (at most 250 words, plain markdown list) with:
+1. **Parties:** full names and the defined short names every section must use (e.g. "the Company").
+2. **Jurisdiction:** governing law and the statutes to cite.
+3. **Defined Terms:** each capitalized term used across sections, with a one-line definition.
+Output ONLY the brief."""
+
+SECTION_INSTRUCTION = """**DRAFTING BRIEF (shared by all sections):**
+{brief}
+
+**YOUR TASK:** The document is being drafted section by section in parallel. Write ONLY this entry
+of the REQUIRED STRUCTURE:
+{item_text}
+
+- Start with exactly this header line: `{heading}`
+- Keep the section number shown in the header; do not renumber or add other sections.
+- Use the parties' short names and the Defined Terms from the brief exactly as written; do not
+  redefine them{definitions_note}.
+- Write full long-form legal text for this entry only: no document title, preamble, signatures
+  or closing remarks unless this entry is one of those."""
+
+
+async def generate_sectioned(
+    draft: dict,
+    complete: Callable[[list], Awaitable],
+    parallelism: int = 4,
+    prefilled: Union[Dict[int, str], Awaitable[Optional[Dict[int, str]]], None] = None
+) -> dict:
+    """
+    Draft a document one REQUIRED STRUCTURE entry at a time.
+
+    A short drafting brief (parties, jurisdiction, defined terms) is generated first and
+    shared by every section call; sections then run concurrently (at most `parallelism`
+    at once) and are stitched back in structure order. `complete` takes a message list
+    and returns the chat model's message. Every call reuses the template's static system
+    prompt, so the provider's prefix cache applies across sections. Entries in `prefilled`
+    (structure number -> ready text, e.g. from the clause library) are used as-is; it may
+    be an awaitable, resolved while the brief is drafted.
+
+    Returns {"content": cleaned markdown, "usage": summed usage metadata or None}.
+    """
+    items = TEMPLATE_STRUCTURES.get(draft["template_type"]) or []
+    system = SystemMessage(content=draft["system_prompt"])
+    usages = []
+
+    brief_call = complete([system, HumanMessage(content=draft["inputs"] + "\n\n" + BRIEF_INSTRUCTION)])
+    if inspect.isawaitable(prefilled):
+        brief_message, prefilled = await asyncio.gather(brief_call, prefilled)
+    else:
+        brief_message = await brief_call
+    usages.append(brief_message.usage_metadata)
+    brief = clean_markdown_output(brief_message.content)
+
+    gate = asyncio.Semaphore(max(1, parallelism))
+
+    async def draft_item(item: StructureItem) -> str:
+        if prefilled and item.number in prefilled:
+            return prefilled[item.number]
+        heading = fill_references(item.heading, draft["input_values"])
+        if item.is_title:
+            return heading
+        is_definitions = "DEFINITION" in item.title.upper()
+        prompt = SECTION_INSTRUCTION.format(
+            brief=brief,
+            item_text=item.text,
+            heading=heading,
+            definitions_note=" (this is the DEFINITIONS section: state them in full here)" if is_definitions else ""
+        )
+        async with gate:
+            message = await complete([system, HumanMessage(content=draft["inputs"] + "\n\n" + prompt)])
+        usages.append(message.usage_metadata)
+        return clean_markdown_output(message.content)
+
+    parts = await asyncio.gather(*[draft_item(item) for item in items])
+    return {"content": clean_markdown_output("\n\n".join(p for p in parts if p)), "usage": sum_usage(usages)}
+
+
+REDRAFT_CONTEXT = """**CURRENT DRAFT (written with the previous inputs):**
+{document}
+
+**CHANGED INPUTS:**
+{changes}
+
+"""
+
+REDRAFT_TASK = """**YOUR TASK:** Some inputs changed since the draft above was written. Rewrite ONLY {target} so it
+reflects the INPUTS above.
+{header_rule}- Change only what the new inputs require; keep the remaining wording, numbering, defined terms and
+  party short names consistent with the rest of the document.
+- Output ONLY this part of the document."""
+
+
+async def redraft_sections(
+    draft: dict,
+    document: str,
+    headings: List[str],
+    changes: str,
+    complete: Callable[[list], Awaitable],
+    parallelism: int = 4
+) -> dict:
+    """
+    Rewrite selected sections of an existing document for changed inputs.
+
+    `headings` are the `## ` header lines to rewrite ("" is the part before the first
+    header). Each call carries the template's static system prompt, the new INPUTS, the
+    whole current `document` and the `changes` summary ahead of the section-specific task,
+    so the long shared prefix is cacheable across the concurrent calls.
+
+    Returns {"sections": cleaned markdown per heading (same order), "usage": summed usage metadata or None}.
+    """
+    system = SystemMessage(content=draft["system_prompt"])
+    shared = draft["inputs"] + "\n\n" + REDRAFT_CONTEXT.format(document=document, changes=changes)
+    gate = asyncio.Semaphore(max(1, parallelism))
+    usages = []
+
+    async def rewrite(heading: str) -> str:
+        if heading:
+            prompt = REDRAFT_TASK.format(target=f"the section headed `{heading}`", header_rule=f"- Start with exactly this header line: `{heading}`\n")
+        else:
+            prompt = REDRAFT_TASK.format(target="the opening of the document (title and any text before the first `##` header)", header_rule="")
+        async with gate:
+            message = await complete([system, HumanMessage(content=shared + prompt)])
+        usages.append(message.usage_metadata)
+        return clean_markdown_output(message.content)
+
+    rewritten = await asyncio.gather(*[rewrite(heading) for heading in headings])
+    return {"sections": list(rewritten), "usage": sum_usage(usages)}
+
+
+def sum_usage(usages: list):
+    usages = [u for u in usages if u]
+    if not usages:
+        return None
+    total = {"input_tokens": 0, "output_tokens": 0, "input_token_details": {"cache_read": 0}}
+    for usage in usages:
+        total["input_tokens"] += usage.get("input_tokens", 0)
+        total["output_tokens"] += usage.get("output_tokens", 0)
+        total["input_token_details"]["cache_read"] += (usage.get("input_token_details") or {}).get("cache_read", 0)
+    return total
@@ -0,0 +1,296 @@
+"""
+Shared Worker State
+State that must hold across worker processes when the API runs as several processes on
+one host: the provider rate-limit buckets every worker draws on, and each worker's
+heartbeat with its in-flight counts and metrics snapshot, in one SQLite file (WAL).
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, suppress
+from typing import Callable, List, Optional
+
+# Worker row holding the combined metrics of workers that have stopped (counters stay monotonic)
+RETIRED = "retired"
+# Unused leased allowance goes back to the shared row after this long (seconds)
+LEASE_SECONDS = 1.0
+# Shortest wait reported while a lease is being fetched (the scheduler retries after it)
+LEASE_POLL_SECONDS = 0.02
+
+
+class SharedState:
+    """
+    Cross-process state in the SQLite file at `path`.
+
+    Every worker opens the same file; writes are short `BEGIN IMMEDIATE` transactions.
+    A worker whose heartbeat is older than `stale_after` seconds is treated as gone.
+    After a fork, call `reconnect()` in the child before use.
+    """
+
+    def __init__(self, path: str, stale_after: float = 15.0):
+        self.path = path
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._buckets: List["SharedBucket"] = []
+        self._db = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, timeout=5, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, capacity REAL NOT NULL, rate REAL NOT NULL, "
+            "available REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS workers ("
+            "worker TEXT PRIMARY KEY, started REAL NOT NULL, heartbeat REAL NOT NULL, "
+            "state TEXT NOT NULL, metrics TEXT)"
+        )
+        return db
+
+    def reconnect(self):
+        """Open a fresh connection (a connection must not be shared across fork)."""
+        self._lock = threading.Lock()
+        self._db = self._connect()
+        for bucket in self._buckets:
+            bucket._reset_locks()
+
+    @property
+    def worker(self) -> str:
+        return f"{socket.gethostname()}-{os.getpid()}"
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    # --- Rate-limit buckets ---
+
+    def bucket(self, name: str, per_minute: int) -> "SharedBucket":
+        bucket = SharedBucket(self, name, per_minute)
+        self._buckets.append(bucket)
+        return bucket
+
+    def _init_bucket(self, name: str, capacity: float, rate: float):
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO buckets (name, capacity, rate, available, updated) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET capacity = excluded.capacity, rate = excluded.rate, "
+                "available = min(available, excluded.capacity)",
+                (name, capacity, rate, capacity, time.time())
+            )
+
+    def _level(self, db: sqlite3.Connection, name: str, now: float) -> float:
+        row = db.execute(
+            "SELECT min(capacity, available + (? - updated) * rate) FROM buckets WHERE name = ?", (now, name)
+        ).fetchone()
+        return row[0] if row else 0.0
+
+    def _set_level(self, db: sqlite3.Connection, name: str, available: float, now: float):
+        db.execute("UPDATE buckets SET available = ?, updated = ? WHERE name = ?", (available, now, name))
+
+    # --- Workers ---
+
+    def publish(self, state: dict, metrics: Optional[dict] = None):
+        """Heartbeat: this worker's current `state` (in-flight counts...) and metrics snapshot; settles bucket leases."""
+        for bucket in self._buckets:
+            bucket.sync()
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO workers (worker, started, heartbeat, state, metrics) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(worker) DO UPDATE SET heartbeat = excluded.heartbeat, state = excluded.state, "
+                "metrics = coalesce(excluded.metrics, metrics)",
+                (self.worker, now, now, json.dumps(state), json.dumps(metrics) if metrics is not None else None)
+            )
+
+    def retire(self):
+        """Mark this worker as stopped; its counters are folded into the retired totals."""
+        with self._transaction() as db:
+            db.execute("UPDATE workers SET heartbeat = 0 WHERE worker = ?", (self.worker,))
+
+    def workers(self) -> List[dict]:
+        """Live workers with their published state, oldest first."""
+        cutoff = time.time() - self.stale_after
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT worker, started, heartbeat, state FROM workers WHERE heartbeat >= ? AND worker != ? "
+                "ORDER BY started", (cutoff, RETIRED)
+            ).fetchall()
+        return [{"worker": w, "started": s, "heartbeat": h, **json.loads(state)} for w, s, h, state in rows]
+
+    def metrics_snapshots(self, fold: Callable[[List[dict]], dict]) -> List[dict]:
+        """
+        Metrics snapshots of the live workers, plus the retired totals.
+
+        Snapshots of workers that stopped (or stopped sending heartbeats) are combined
+        with `fold` into the single RETIRED row, so the table does not grow with restarts.
+        """
+        cutoff = time.time() - self.stale_after
+        with self._transaction() as db:
+            rows = db.execute("SELECT worker, heartbeat, metrics FROM workers WHERE metrics IS NOT NULL").fetchall()
+            retired = [json.loads(m) for w, h, m in rows if w == RETIRED]
+            stale = [(w, json.loads(m)) for w, h, m in rows if w != RETIRED and h < cutoff]
+            if stale:
+                combined = fold(retired + [snapshot for _, snapshot in stale])
+                db.executemany("DELETE FROM workers WHERE worker = ?", [(w,) for w, _ in stale])
+                db.execute(
+                    "INSERT INTO workers (worker, started, heartbeat, state, metrics) VALUES (?, 0, 0, '{}', ?) "
+                    "ON CONFLICT(worker) DO UPDATE SET metrics = excluded.metrics",
+                    (RETIRED, json.dumps(combined))
+                )
+                retired = [combined]
+        return retired + [json.loads(m) for w, h, m in rows if w != RETIRED and h >= cutoff]
+
+
+class SharedBucket:
+    """
+    A per-minute allowance (see admission._Bucket) shared by every worker through SharedState.
+
+    The event loop only touches this worker's lease: `try_take` draws on it, and when it
+    falls short the amount is leased from the shared row on a worker thread while the
+    caller retries after `seconds_until`. Refunds, debts and drains are settled with the
+    shared row by the next `sync` (each heartbeat, or the next lease). `available`, used
+    for wait estimates, sees other workers' use as of this worker's last sync.
+    """
+
+    def __init__(self, state: SharedState, name: str, per_minute: int):
+        self._state = state
+        self.name = name
+        self.capacity = max(0, per_minute)
+        self.rate = self.capacity / 60.0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._lease = 0.0  # allowance held by this worker (negative: debt not yet charged)
+        self._wanted = 0.0  # largest amount a caller is waiting to lease
+        self._drained = False
+        self._syncing = False
+        self._granted_at = 0.0
+        self._shared = float(self.capacity)  # shared level at the last sync
+        self._synced_at = time.time()
+        if self.capacity:
+            state._init_bucket(name, self.capacity, self.rate)
+
+    def _reset_locks(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._syncing = False
+
+    @property
+    def available(self) -> float:
+        """This worker's lease plus the shared level as of the last sync, refilled since."""
+        if not self.capacity:
+            return 0.0
+        shared = min(self.capacity, self._shared + (time.time() - self._synced_at) * self.rate)
+        return shared + self._lease
+
+    def refill(self):
+        pass  # the shared row refills; it is read on `sync`, off the event loop
+
+    def fits(self, amount: float) -> bool:
+        return not self.capacity or self._lease >= min(amount, self.capacity)
+
+    def seconds_until(self, amount: float) -> float:
+        if not self.capacity:
+            return 0.0
+        wait = (min(amount, self.capacity) - self.available) / self.rate
+        return max(wait, LEASE_POLL_SECONDS if self._syncing else 0.0)
+
+    def try_take(self, amount: float) -> bool:
+        if not self.capacity:
+            return True
+        need = min(amount, self.capacity)
+        with self._lock:
+            if self._lease >= need:
+                self._lease -= amount
+                return True
+            self._wanted = max(self._wanted, need)
+        self._sync_soon()
+        return False
+
+    def adjust(self, amount: float):
+        if not self.capacity:
+            return
+        with self._lock:
+            self._lease += amount
+
+    def drain(self):
+        if not self.capacity:
+            return
+        now = time.time()
+        with self._lock:
+            self._lease = min(self._lease, 0.0)
+            self._drained = True
+            self._shared, self._synced_at = min(self._shared, 0.0), now
+        self._sync_soon()
+
+    def _sync_soon(self):
+        """Run `sync` on a worker thread, one at a time."""
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._sync_quietly()
+            return
+        loop.run_in_executor(None, self._sync_quietly)
+
+    def _sync_quietly(self):
+        # A failed sync leaves the lease as it was; waiting callers retry
+        with suppress(sqlite3.Error):
+            self.sync()
+        self._syncing = False
+
+    def sync(self):
+        """
+        Settle this worker's lease with the shared row (return unused allowance older than
+        LEASE_SECONDS, charge debts, apply a drain) and lease what callers are waiting for.
+        Blocking: call it off the event loop.
+        """
+        if not self.capacity:
+            return
+        with self._sync_lock:
+            now = time.time()
+            with self._lock:
+                held, wanted, drained = self._lease, self._wanted, self._drained
+                if held > 0 and now - self._granted_at < LEASE_SECONDS:
+                    held = 0.0  # just leased for a waiting caller: keep it
+                self._lease -= held
+                self._wanted, self._drained = 0.0, False
+            granted = 0.0
+            try:
+                with self._state._transaction() as db:
+                    level = self._state._level(db, self.name, now)
+                    if drained:
+                        level = min(level, 0.0)
+                    level = min(self.capacity, level + held)
+                    if wanted and level >= wanted:
+                        level -= wanted
+                        granted = wanted
+                    self._state._set_level(db, self.name, level, now)
+            except BaseException:
+                with self._lock:
+                    self._lease += held
+                    self._wanted = max(self._wanted, wanted)
+                    self._drained = self._drained or drained
+                raise
+            with self._lock:
+                self._lease += granted
+                if granted:
+                    self._granted_at = now
+                self._shared, self._synced_at = level, now
@@ -0,0 +1,66 @@
+"""
+Single-Flight Request Coalescing
+Identical concurrent calls share one underlying generation instead of each hitting the LLM.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplicates in-flight async work by key.
+
+    The first caller for a key (the leader) starts the work as a separate task;
+    callers arriving while it runs await the same task. Because the task is not
+    owned by any one caller, a cancelled caller (e.g. a disconnected client) only
+    stops waiting. The work itself is cancelled only once every caller has gone.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def run(self, key: str, work: Callable[[], Awaitable]):
+        """Await `work()` for `key`, joining an identical in-flight call if there is one."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(work()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _task, key=key, flight=flight: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+                # Forget it now: a caller arriving before the task unwinds must start afresh
+                self._forget(key, flight)
+                self.abandoned += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
@@ -0,0 +1,192 @@
+"""
+Structural Completeness Check & Targeted Repair
+Checks a cleaned draft against its template's REQUIRED STRUCTURE and, when entries are
+missing or cut short, drafts just those entries and splices them into the document.
+"""
+
+import asyncio
+import re
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from backends import HumanMessage, SystemMessage
+from markdown_cleaner import clean_markdown_output
+from prompt_assembly import fill_references
+from sections import TEMPLATE_STRUCTURES, StructureItem, sum_usage
+
+_MARKDOWN_HEADING = re.compile(r'^\s*#{1,6}\s')
+_BOLD_LINE = re.compile(r'^\s*\*\*')
+_SECTION_PREFIX = re.compile(r'^SECTION\s+\d+\s*:\s*')
+_WORD = re.compile(r'[A-Z]{4,}')
+
+# A section body shorter than this (non-space characters) counts as truncated
+MIN_SECTION_CHARS = 20
+# A final line of at least this many words without closing punctuation was cut off mid-sentence
+MIN_PROSE_WORDS = 8
+
+REPAIR_CONTEXT = """**CURRENT DRAFT:**
+{document}
+
+"""
+
+REPAIR_TASK = """**YOUR TASK:** The draft above {problem} this entry of the REQUIRED STRUCTURE:
+{item_text}
+
+- Start with exactly this header line: `{heading}`
+- Use the party names, defined terms and section numbering already used in the draft.
+- Write full long-form legal text for this entry only; output nothing else."""
+
+
+def _keyword(item: StructureItem) -> str:
+    """The word a heading must contain to count as this entry (e.g. MISCELLANEOUS, SIGNATURE)."""
+    title = _SECTION_PREFIX.sub('', item.title.upper())
+    if item.is_title:
+        title = item.heading.lstrip('# ').upper()
+    words = _WORD.findall(title)
+    word = words[0] if words else title
+    return word[:-1] if word.endswith("S") and len(word) > 5 else word
+
+
+def locate_sections(template_type: str, content: str) -> Dict[int, int]:
+    """
+    Line index of each REQUIRED STRUCTURE entry's heading, keyed by its position in the structure.
+
+    Entries are matched in order (searching on from the previous match), preferring `#`
+    headings over bold lines, and falling back to the whole document for sections the
+    model reordered. Missing entries are absent.
+    """
+    lines = content.split("\n")
+    markdown = [i for i, line in enumerate(lines) if _MARKDOWN_HEADING.match(line)]
+    bold = [i for i, line in enumerate(lines) if _BOLD_LINE.match(line)]
+    located: Dict[int, int] = {}
+    used = set()
+    cursor = -1
+    for position, item in enumerate(TEMPLATE_STRUCTURES.get(template_type) or []):
+        keyword = _keyword(item)
+        candidates = (
+            [i for i in markdown if i > cursor] + [i for i in bold if i > cursor]
+            + [i for i in markdown if i <= cursor] + [i for i in bold if i <= cursor]
+        )
+        for i in (i for i in candidates if i not in used):
+            if keyword in lines[i].upper():
+                located[position] = i
+                used.add(i)
+                cursor = max(cursor, i)
+                break
+    return located
+
+
+def check_structure(template_type: str, content: str) -> dict:
+    """
+    Compare a cleaned draft with its template's REQUIRED STRUCTURE.
+
+    Returns {"complete", "missing": [titles], "truncated": [titles]}. An entry is truncated
+    when its body is (nearly) empty, or when it ends the document mid-sentence.
+    """
+    items = TEMPLATE_STRUCTURES.get(template_type) or []
+    located = locate_sections(template_type, content)
+    problems = _problems(items, located, content.split("\n"))
+    missing = [items[p].title for p, kind in problems.items() if kind == "missing"]
+    truncated = [items[p].title for p, kind in problems.items() if kind == "truncated"]
+    return {"complete": not missing and not truncated, "missing": missing, "truncated": truncated}
+
+
+def _problems(items: List[StructureItem], located: Dict[int, int], lines: List[str]) -> Dict[int, str]:
+    """Structure position -> 'missing' or 'truncated', in structure order."""
+    problems: Dict[int, str] = {}
+    starts = sorted(located.values())
+    for position, item in enumerate(items):
+        if position not in located:
+            problems[position] = "missing"
+            continue
+        if item.is_title:
+            continue
+        start = located[position]
+        following = [s for s in starts if s > start]
+        end = following[0] if following else len(lines)
+        body = "\n".join(lines[start + 1:end])
+        if len("".join(body.split())) < MIN_SECTION_CHARS:
+            problems[position] = "truncated"
+        elif not following:
+            last = next((line.strip() for line in reversed(lines[start + 1:end]) if line.strip()), "")
+            if len(last.split()) >= MIN_PROSE_WORDS and not re.search(r'[.:;!?)\]"*_|]$', last):
+                problems[position] = "truncated"
+    return problems
+
+
+def _splice(lines: List[str], located: Dict[int, int], problems: Dict[int, str], texts: Dict[int, str]) -> str:
+    """Replace truncated entries and insert missing ones after their nearest preceding entry."""
+    order = sorted(located, key=located.get)
+    prefix = lines[:located[order[0]]] if order else lines
+    blocks = []  # (structure position, text) in document order
+    for k, position in enumerate(order):
+        end = located[order[k + 1]] if k + 1 < len(order) else len(lines)
+        text = "\n".join(lines[located[position]:end]).strip()
+        blocks.append((position, texts.get(position, text) if problems.get(position) == "truncated" else text))
+
+    for position, kind in problems.items():
+        if kind != "missing" or position not in texts:
+            continue
+        preceding = [i for i, (p, _) in enumerate(blocks) if p < position]
+        at = max(preceding) + 1 if preceding else 0
+        blocks.insert(at, (position, texts[position]))
+
+    parts = ["\n".join(prefix).strip()] + [text for _, text in blocks]
+    return "\n\n".join(part for part in parts if part)
+
+
+async def repair_structure(
+    draft: dict,
+    content: str,
+    complete: Callable[[list], Awaitable],
+    parallelism: int = 4,
+    max_sections: int = 4
+) -> dict:
+    """
+    Check a cleaned draft and draft only its missing or truncated entries.
+
+    Each repair call carries the template's static system prompt, the INPUTS and the
+    current document, then the entry to write; the calls run concurrently (at most
+    `parallelism`). A missing document title is restored without an LLM call. More than
+    `max_sections` problems is treated as a failed generation and left unrepaired.
+
+    Returns {"content", "usage": summed usage metadata or None, "structure": check result
+    plus `repaired` (entries spliced in) and `complete_after_repair`}.
+    """
+    template_type = draft["template_type"]
+    items = TEMPLATE_STRUCTURES.get(template_type) or []
+    lines = content.split("\n")
+    located = locate_sections(template_type, content)
+    problems = _problems(items, located, lines)
+    report = check_structure(template_type, content)
+    report.update({"repaired": 0, "complete_after_repair": report["complete"]})
+    if not problems or len(problems) > max_sections:
+        return {"content": content, "usage": None, "structure": report}
+
+    system = SystemMessage(content=draft["system_prompt"])
+    shared = draft["inputs"] + "\n\n" + REPAIR_CONTEXT.format(document=content)
+    gate = asyncio.Semaphore(max(1, parallelism))
+    usages = []
+
+    async def write(position: int) -> Optional[str]:
+        item = items[position]
+        heading = fill_references(item.heading, draft["input_values"])
+        if item.is_title:
+            return heading
+        prompt = REPAIR_TASK.format(
+            problem="is missing" if problems[position] == "missing" else "cuts off (or leaves empty)",
+            item_text=item.text,
+            heading=heading
+        )
+        async with gate:
+            message = await complete([system, HumanMessage(content=shared + prompt)])
+        usages.append(message.usage_metadata)
+        return clean_markdown_output(message.content) or None
+
+    positions = list(problems)
+    written = await asyncio.gather(*[write(position) for position in positions])
+    texts = {position: text for position, text in zip(positions, written) if text}
+
+    repaired = clean_markdown_output(_splice(lines, located, problems, texts))
+    report["repaired"] = len(texts)
+    report["complete_after_repair"] = check_structure(template_type, repaired)["complete"]
+    return {"content": repaired, "usage": sum_usage(usages), "structure": report}
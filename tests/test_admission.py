@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionRejected, TokenEstimator, TokenScheduler, client_scope
+
+COST = 100
+
+
+def scheduler(**kwargs) -> TokenScheduler:
+    # One draft's worth of tokens per minute: a second draft waits for the first to finish
+    return TokenScheduler(TokenEstimator({"nda": COST}), tokens_per_minute=COST, **kwargs)
+
+
+async def admit(tokens: TokenScheduler, client: str, admitted: list):
+    with client_scope(client):
+        ticket = await tokens.admit("nda", 0)
+    admitted.append((client, ticket))
+    return ticket
+
+
+async def settle_turns():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_clients_are_served_fairly():
+    async def main():
+        tokens = scheduler(max_wait=3600)
+        admitted = []
+        tasks = [asyncio.ensure_future(admit(tokens, "burst", admitted)) for _ in range(3)]
+        await settle_turns()
+        tasks.append(asyncio.ensure_future(admit(tokens, "other", admitted)))
+        while len(admitted) < len(tasks):
+            await settle_turns()
+            admitted[-1][1].release()
+        await asyncio.gather(*tasks)
+        return [client for client, _ in admitted]
+
+    # The other client's only draft is not queued behind the whole burst
+    assert asyncio.run(main()) == ["burst", "burst", "other", "burst"]
+
+
+def test_priority_class_goes_first():
+    async def main():
+        tokens = scheduler(max_wait=3600)
+        admitted = []
+
+        async def background():
+            with client_scope("jobs", "background"):
+                admitted.append(("background", await tokens.admit("nda", 0)))
+
+        first = await admit(tokens, "first", admitted)
+        tasks = [asyncio.ensure_future(background())]
+        await settle_turns()
+        tasks.append(asyncio.ensure_future(admit(tokens, "interactive", admitted)))
+        await settle_turns()
+        first.release()
+        await settle_turns()
+        admitted[-1][1].release()
+        await asyncio.gather(*tasks)
+        return [client for client, _ in admitted]
+
+    assert asyncio.run(main()) == ["first", "interactive", "background"]
+
+
+def test_release_refunds_the_reservation():
+    async def main():
+        tokens = scheduler()
+        ticket = await tokens.admit("nda", 0)
+        assert tokens.tokens.available < 1
+        ticket.release()
+        ticket.release()  # idempotent
+        return tokens.tokens.available
+
+    assert asyncio.run(main()) == pytest.approx(COST)
+
+
+def test_settle_charges_actual_usage():
+    async def main():
+        tokens = scheduler()
+        ticket = await tokens.admit("nda", 0)
+        ticket.settle({"input_tokens": 10, "output_tokens": 30})
+        ticket.release()  # already settled: nothing more is refunded
+        return tokens.tokens.available
+
+    assert asyncio.run(main()) == pytest.approx(COST - 40, abs=1)
+
+
+def test_no_refund_after_rate_limit():
+    async def main():
+        tokens = scheduler()
+        ticket = await tokens.admit("nda", 0)
+        tokens.penalize()
+        ticket.release()
+        return tokens.tokens.available
+
+    assert asyncio.run(main()) < 1
+
+
+def test_cancelled_waiter_is_not_charged():
+    async def main():
+        tokens = scheduler(max_wait=3600)
+        holder = await tokens.admit("nda", 0)
+        waiting = asyncio.ensure_future(admit(tokens, "impatient", []))
+        await settle_turns()
+        assert "impatient" in tokens._client_tags
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        # Its fair-queue tag is rolled back and the budget is untouched
+        assert "impatient" not in tokens._client_tags
+        assert tokens.stats()["waiting"] == 0
+        holder.release()
+        return tokens.tokens.available
+
+    assert asyncio.run(main()) == pytest.approx(COST)
+
+
+def test_rejects_waits_beyond_max_wait():
+    async def main():
+        tokens = scheduler(max_wait=1)
+        await tokens.admit("nda", 0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await tokens.admit("nda", 0)
+        return rejected.value.retry_after, tokens.rejected
+
+    retry_after, rejected = asyncio.run(main())
+    assert retry_after > 1
+    assert rejected == 1
@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from drafts import DraftStore, join_sections, split_sections
+
+REQUEST = {"template_type": "nda", "company": {"name": "Acme Ltd"}}
+CONTENT = "# Mutual NDA\n\nBetween Acme Ltd and the Recipient.\n\n## 1. Definitions\n\nText.\n\n## 2. Term\n\nTwo years."
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DraftStore(str(tmp_path / "drafts.db"))
+
+
+def test_id_is_stable_per_content(store, tmp_path):
+    draft_id = store.save("nda", "full", REQUEST, {"company_name": "Acme Ltd"}, CONTENT)
+    assert store.save("nda", "full", REQUEST, {"company_name": "Acme Ltd"}, CONTENT) == draft_id
+    # Independent of the store instance and of the request's key order
+    other = DraftStore(str(tmp_path / "other.db"))
+    reordered = dict(reversed(list(REQUEST.items())))
+    assert other.save("nda", "full", reordered, {"company_name": "Acme Ltd"}, CONTENT) == draft_id
+
+
+def test_id_changes_with_content(store):
+    draft_id = store.save("nda", "full", REQUEST, {}, CONTENT)
+    assert store.save("nda", "full", REQUEST, {}, CONTENT + " ") != draft_id
+    assert store.save("nda", "full", REQUEST, {}, CONTENT.replace("\n\n", "\n\n\n", 1)) != draft_id
+    assert store.save("board_resolution", "full", REQUEST, {}, CONTENT) != draft_id
+
+
+def test_saved_draft_round_trips(store):
+    draft_id = store.save("nda", "full", REQUEST, {"company_name": "Acme Ltd"}, CONTENT)
+    draft = store.get(draft_id)
+    assert draft["content"] == CONTENT
+    assert draft["request"] == REQUEST
+    assert [section["heading"] for section in draft["sections"]] == ["", "## 1. Definitions", "## 2. Term"]
+    assert "company_name" in draft["sections"][0]["depends_on"]
+    assert store.get("missing") is None
+
+
+def test_expired_drafts_are_not_returned(tmp_path):
+    store = DraftStore(str(tmp_path / "drafts.db"), ttl_seconds=0.1)
+    draft_id = store.save("nda", "full", REQUEST, {}, CONTENT)
+    assert store.get(draft_id) is not None
+    time.sleep(0.15)
+    assert store.get(draft_id) is None
+
+
+def test_sections_rejoin_to_the_document():
+    assert join_sections(split_sections(CONTENT)) == CONTENT
@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+import pytest
+
+import jobs
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobStore, RetryJob, run_worker
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"), lease_seconds=0.3, max_retries=1)
+
+
+def available_at(store: JobStore, job_id: str) -> float:
+    return store._db.execute("SELECT available_at FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+
+def test_expired_lease_is_reclaimed_and_only_the_owner_finishes(store):
+    job_id = store.submit({"n": 1})
+    assert store.claim("a")["id"] == job_id
+    assert store.claim("b") is None
+    time.sleep(0.35)
+    claimed = store.claim("b")
+    assert claimed["id"] == job_id and claimed["attempts"] == 2
+    assert not store.renew(job_id, "a")
+    assert not store.complete(job_id, {"from": "a"}, worker="a")
+    assert store.complete(job_id, {"from": "b"}, worker="b")
+    assert store.get(job_id)["result"] == {"from": "b"}
+
+
+def test_renewed_lease_is_not_reclaimed(store):
+    job_id = store.submit({})
+    store.claim("a")
+    for _ in range(3):
+        time.sleep(0.15)
+        assert store.renew(job_id, "a")
+    assert store.claim("b") is None
+    assert store.get(job_id)["status"] == RUNNING
+
+
+def test_worker_that_keeps_dying_fails_the_job(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), lease_seconds=0.05, max_attempts=2)
+    job_id = store.submit({})
+    for worker in ("a", "b"):
+        assert store.claim(worker)["id"] == job_id
+        time.sleep(0.06)
+    assert store.claim("c") is None
+    job = store.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"]["detail"] == "Worker stopped responding too many times"
+
+
+def test_counted_retries_are_capped(store):
+    job_id = store.submit({})
+    store.claim("a")
+    assert store.requeue(job_id, counted=True, worker="a")
+    store.claim("a")
+    assert not store.requeue(job_id, counted=True, worker="a")
+    # Uncounted retries (local back-pressure) are not capped
+    assert store.requeue(job_id, worker="a")
+    assert store.get(job_id)["attempts"] == 0
+
+
+def test_requeued_job_waits_for_its_delay(store):
+    job_id = store.submit({})
+    store.claim("a")
+    store.requeue(job_id, counted=True, delay=0.2, worker="a")
+    assert store.claim("a") is None
+    time.sleep(0.25)
+    assert store.claim("a")["id"] == job_id
+
+
+def run_until(store: JobStore, handler, done, timeout: float = 5.0):
+    async def main():
+        stop = asyncio.Event()
+        worker = asyncio.ensure_future(run_worker(store, handler, "w", stop, poll_interval=0.01))
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await worker
+
+    asyncio.run(main())
+
+
+def test_rate_limited_job_backs_off_then_fails(store, monkeypatch):
+    monkeypatch.setattr(jobs, "RETRY_BACKOFF_SECONDS", 0.05)
+    job_id = store.submit({})
+    delays = []
+
+    async def handler(payload):
+        raise RetryJob(counted=True, detail="Provider rate limit")
+
+    def done():
+        job = store.get(job_id)
+        if job["status"] == QUEUED and available_at(store, job_id) and not delays:
+            delays.append(available_at(store, job_id) - time.time())
+        return job["status"] == FAILED
+
+    run_until(store, handler, done)
+    job = store.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"]["status_code"] == 503
+    assert "gave up after 1 retries" in job["error"]["detail"]
+    assert delays[0] <= 0.05  # the first retry waits RETRY_BACKOFF_SECONDS
+
+
+def test_backoff_doubles_up_to_its_ceiling(store, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_RETRY_BACKOFF_SECONDS", 12.0)
+    store.max_retries = 10
+    job_id = store.submit({})
+    store._db.execute("UPDATE jobs SET retries = 5 WHERE id = ?", (job_id,))
+    store._db.commit()
+
+    async def handler(payload):
+        raise RetryJob(counted=True)
+
+    run_until(store, handler, lambda: store.get(job_id)["status"] == QUEUED and available_at(store, job_id))
+    assert available_at(store, job_id) - time.time() == pytest.approx(12.0, abs=1)
+
+
+def test_long_job_runs_once_with_lease_renewed(store):
+    job_id = store.submit({})
+    runs = []
+
+    async def handler(payload):
+        runs.append(1)
+        await asyncio.sleep(1.0)  # several lease periods
+        return {"ok": True}
+
+    async def main():
+        stop = asyncio.Event()
+        workers = [asyncio.ensure_future(run_worker(store, handler, f"w{i}", stop, poll_interval=0.05)) for i in range(2)]
+        while store.get(job_id)["status"] != SUCCEEDED:
+            await asyncio.sleep(0.05)
+        stop.set()
+        await asyncio.gather(*workers)
+
+    asyncio.run(main())
+    assert runs == [1]
+    assert store.get(job_id)["result"] == {"ok": True}
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from jurisdiction_resolver import HARD_CASES, sample_corpus
+from jurisdictions import address_text, load_gazetteer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GAZETTEER = load_gazetteer()
+SAMPLE_CASES = sample_corpus(os.path.join(ROOT, "SAMPLE_INPUTS.md"))
+
+
+def test_sample_corpus_is_not_empty():
+    assert SAMPLE_CASES
+
+
+@pytest.mark.parametrize("address, expected", SAMPLE_CASES + HARD_CASES)
+def test_resolves_jurisdiction(address, expected):
+    assert GAZETTEER.resolve(None, address).country == expected
+
+
+def test_explicit_jurisdiction_wins():
+    assert GAZETTEER.resolve("UK", "1 Infinite Loop, Cupertino, CA 95014").country == "UK"
+
+
+def test_address_text_keeps_prompt_fields():
+    address = {"line": "1 Infinite Loop", "city": "Cupertino", "state": "CA", "postal_code": "95014", "country": "US"}
+    assert address_text(address) == "1 Infinite Loop, Cupertino, 95014, US"
+    assert address_text("12 Duke Street") == "12 Duke Street"
+    assert address_text(None) == ""
@@ -0,0 +1,27 @@
+import pytest
+
+from markdown_cleaner import StreamingMarkdownCleaner, clean_markdown_output
+
+DOCUMENTS = [
+    "# NDA\n\nThis Agreement is made between the parties.\n",
+    "```markdown\n# NDA\n\n## 1. Definitions\n\nText.\n```\n",
+    "```\n# Board Resolution\n\nRESOLVED that...\n```",
+    "\n\n  # Title\r\n\r\n\r\n\r\nBody with `code` and ```inline``` fences.\r\n\r\n",
+    "# Title\n\n\n\n\nToo many blank lines\n\n\n## Next\n\nEnd```",
+    "```json\n{\"not\": \"markdown\"}\n```",
+    "   \n\n",
+    "",
+]
+
+
+def stream(text: str, size: int) -> str:
+    cleaner = StreamingMarkdownCleaner()
+    out = [cleaner.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    out.append(cleaner.finish())
+    return "".join(out)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10000])
+@pytest.mark.parametrize("text", DOCUMENTS)
+def test_streaming_matches_batch(text, size):
+    assert stream(text, size) == (clean_markdown_output(text) or "")
@@ -0,0 +1,40 @@
+"""
+Standalone Draft Worker
+Processes queued draft jobs from the shared SQLite job store, independently of the web tier.
+
+Run alongside the API with JOB_WORKERS=0 on the web process and the same JOB_STORE_PATH:
+    python worker.py --concurrency 4
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+
+import api
+from jobs import run_workers
+
+
+async def main(concurrency: int):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    name = f"{socket.gethostname()}-{os.getpid()}"
+    print(f"Worker {name}: {concurrency} concurrent jobs from {api.JOB_STORE_PATH}")
+    await run_workers(
+        api.job_store, api.process_job, concurrency, stop,
+        name=name, poll_interval=api.JOB_POLL_INTERVAL_SECONDS
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued legal draft jobs.")
+    parser.add_argument(
+        "--concurrency", type=int, default=int(os.getenv("WORKER_CONCURRENCY", "4")),
+        help="Jobs processed at once by this worker process"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))